@@ -8,6 +8,9 @@ import tempfile
 from kivy.clock import Clock
 from kivy.utils import platform as _kivy_platform
 
+from app import motion_runtime
+from services import session_recorder
+
 
 def on_ai_action(app, instance, action, emotion):
     if "face" in app.root_widget.ids:
@@ -20,40 +23,14 @@ def on_ai_action(app, instance, action, emotion):
     action = str(action or "none").strip().lower()
     if action in ("", "none"):
         return
+    session_recorder.record_action(action, source="ai")
 
     motion = getattr(app, "motion_controller", None)
     if not motion:
         print("AI action skipped: motion_controller is not ready")
         return
 
-    def _run_motion():
-        try:
-            if hasattr(motion, "run_action"):
-                motion.run_action(action)
-                return
-
-            if action == "walk" and hasattr(motion, "walk"):
-                motion.walk(steps=2)
-            elif action == "stop" and hasattr(motion, "stop"):
-                motion.stop()
-            elif action == "nod" and hasattr(motion, "nod"):
-                motion.nod(times=1)
-            elif action == "shake_head" and hasattr(motion, "shake_head"):
-                motion.shake_head(times=1)
-            elif action == "wave" and hasattr(motion, "wave"):
-                motion.wave(side="right", times=1)
-            elif action == "sit" and hasattr(motion, "sit"):
-                motion.sit()
-            elif action == "stand" and hasattr(motion, "stand"):
-                motion.stand()
-            elif action == "twist" and hasattr(motion, "twist"):
-                motion.twist(angle_deg=25)
-            else:
-                print(f"AI action not supported by motion controller: {action}")
-        except Exception as e:
-            print(f"AI action execution failed: {action}, err={e}")
-
-    threading.Thread(target=_run_motion, daemon=True).start()
+    motion_runtime.submit_action(app, action, source="ai")
 
 
 def on_ai_speech(app, instance, text):
@@ -81,6 +58,25 @@ def on_ai_speech(app, instance, text):
         pass
 
 
+def on_ai_turn_cancelled(app, instance):
+    """用户打断（barge-in）：丢弃尚未播报的旧回答。"""
+    try:
+        app._ai_speech_buf = ""
+        if app._ai_speech_clear_ev:
+            app._ai_speech_clear_ev.cancel()
+        app._ai_speech_clear_ev = None
+    except Exception:
+        pass
+    q = getattr(app, "_tts_queue", None)
+    if q is not None:
+        while True:
+            try:
+                q.get_nowait()
+            except Exception:
+                break
+        app._tts_pending = set()
+
+
 def ai_speak_final(app, dt):
     txt = app._ai_speech_buf.strip()
     app._ai_speech_buf = ""
@@ -187,6 +183,16 @@ def _speak_once(app, txt):
     print(f"AI says: {txt}")
 
 
+def _mark_audio_out(app):
+    """TTS 开始出声，通知 AI 轮次追踪器（first_audio 阶段）。"""
+    try:
+        ai_core = getattr(app, "ai_core", None)
+        if ai_core is not None and hasattr(ai_core, "mark_audio_out"):
+            ai_core.mark_audio_out()
+    except Exception:
+        pass
+
+
 def _try_android_tts(app, txt):
     if _kivy_platform != "android":
         return False
@@ -196,6 +202,7 @@ def _try_android_tts(app, txt):
         from plyer import tts
 
         tts.speak(txt)
+        _mark_audio_out(app)
 
         # plyer/Android TTS 为异步接口，按文本长度做阻塞估计，避免队列语音重叠
         estimate_sec = min(9.0, max(1.2, len(str(txt or "")) / 5.0))
@@ -244,6 +251,7 @@ def _try_edge_tts(app, txt):
                 pygame.mixer.init()
             pygame.mixer.music.load(out_path)
             pygame.mixer.music.play()
+            _mark_audio_out(app)
             while pygame.mixer.music.get_busy():
                 time.sleep(0.05)
             pygame.mixer.music.unload()
@@ -14,6 +14,7 @@ from widgets.debug_panel import DebugPanel
 from widgets.servo_status import ServoStatus
 from widgets.runtime_status import RuntimeStatusPanel, RuntimeStatusLogger
 from services import usb_otg
+from services.servo_sync import SYNC_TIME_MS
 from app import usb_runtime
 from app import device_runtime
 from app import bootstrap_runtime
@@ -22,6 +23,9 @@ from app import android_ui_runtime
 from app import ui_runtime
 from app import balance_runtime
 from app import platform_runtime
+from app import motion_runtime
+from app import recording_runtime
+from app import vision_runtime
 
 try:
     # 用于枚举串口设备以便自动检测 CH340 等适配器
@@ -36,26 +40,6 @@ run_on_ui_thread = platform_runtime.get_run_on_ui_thread()
 
 
 class RobotDashboardApp(App):
-    def _targets_changed(self, new_targets, old_targets, threshold=3):
-        try:
-            if not isinstance(new_targets, dict) or not isinstance(old_targets, dict):
-                return True
-            if new_targets.keys() != old_targets.keys():
-                return True
-            th = int(max(0, threshold))
-            for sid, new_pos in new_targets.items():
-                old_pos = old_targets.get(sid)
-                if old_pos is None:
-                    return True
-                try:
-                    if abs(int(new_pos) - int(old_pos)) > th:
-                        return True
-                except Exception:
-                    return True
-            return False
-        except Exception:
-            return True
-
     # ================== UI / 状态代理 ==================
     def _update_usb_state(self, **kwargs):
         ui_runtime.update_usb_state(self, **kwargs)
@@ -179,8 +163,35 @@ class RobotDashboardApp(App):
     def _safe_refresh_ui(self, dt=0):
         ui_runtime.safe_refresh_ui(self, dt=dt)
 
-    def _get_gyro_data(self):
-        return device_runtime.get_gyro_data(self, gyroscope)
+    def _get_gyro_data(self, horizon=0.0):
+        return device_runtime.get_gyro_data(self, gyroscope, horizon=horizon)
+
+    def get_imu_filter_stats(self):
+        return device_runtime.get_imu_filter_stats(self)
+
+    def calibrate_imu(self):
+        return device_runtime.calibrate_imu(self)
+
+    def toggle_session_recording(self):
+        return recording_runtime.toggle_session_recording(self)
+
+    def get_recording_status(self):
+        return recording_runtime.get_recording_status(self)
+
+    def start_color_tracking(self, **kwargs):
+        return vision_runtime.start_color_tracking(self, **kwargs)
+
+    def stop_color_tracking(self):
+        vision_runtime.stop_color_tracking(self)
+
+    def start_head_tracking(self, **kwargs):
+        return vision_runtime.start_head_tracking(self, **kwargs)
+
+    def stop_head_tracking(self):
+        vision_runtime.stop_head_tracking(self)
+
+    def get_vision_stats(self):
+        return vision_runtime.get_vision_stats(self)
 
     # ================== 主循环 ==================
     def _update_loop(self, dt):
@@ -200,9 +211,12 @@ class RobotDashboardApp(App):
 
             # 硬件同步
             if self.servo_bus and not getattr(self.servo_bus, "is_mock", True):
-                # 手机端默认关闭连续同步写，避免 USB 连接后主线程明显卡顿
-                if not bool(getattr(self, "_enable_live_servo_sync", False)):
+                # 手机端默认关闭连续同步写，避免 USB 连接后主线程明显卡顿；
+                # 步行时步态偏移只能由本循环下发，即使未开启连续同步也要写
+                if not balance_runtime.loop_writes_servos(self):
                     return
+                gait = getattr(self, "gait_engine", None)
+                gait_active = bool(gait is not None and gait.is_active)
 
                 # 调试读取/自检期间可临时暂停主循环同步写，避免读写争用导致读回 0%
                 suspend_sync_until = float(getattr(self, "_suspend_servo_sync_until", 0.0) or 0.0)
@@ -214,64 +228,24 @@ class RobotDashboardApp(App):
                 if now < usb_busy_until or bool(getattr(self, "_servo_scan_in_progress", False)):
                     return
 
-                active_period = float(getattr(self, "_sync_active_period", 0.1) or 0.1)
-                idle_period = float(getattr(self, "_sync_idle_period", 0.22) or 0.22)
-                pose_threshold = float(getattr(self, "_sync_pose_threshold_deg", 0.5) or 0.5)
-                target_threshold = int(getattr(self, "_sync_target_threshold", 3) or 3)
-                compute_pose_threshold = float(
-                    getattr(self, "_sync_compute_pose_threshold_deg", 0.2) or 0.2
-                )
-                compute_idle_period = float(
-                    getattr(self, "_sync_compute_idle_period", idle_period) or idle_period
-                )
-
-                last_compute_t = float(getattr(self, "_last_sync_compute_time", 0.0) or 0.0)
-                last_compute_pitch = float(getattr(self, "_last_sync_compute_pitch", 0.0) or 0.0)
-                last_compute_roll = float(getattr(self, "_last_sync_compute_roll", 0.0) or 0.0)
-                last_targets = getattr(self, "_last_sync_targets", None)
-
-                compute_due = (now - last_compute_t) >= max(0.05, compute_idle_period)
-                compute_pose_changed = (
-                    last_targets is None
-                    or abs(float(p) - last_compute_pitch) >= compute_pose_threshold
-                    or abs(float(r) - last_compute_roll) >= compute_pose_threshold
-                )
-
-                if compute_pose_changed or compute_due:
-                    targets = self.balance_ctrl.compute(p, r, y)
-                    self._last_sync_compute_time = now
-                    self._last_sync_compute_pitch = float(p)
-                    self._last_sync_compute_roll = float(r)
-                else:
-                    targets = last_targets
-                    if not isinstance(targets, dict):
-                        targets = None
-
-                last_send_t = float(getattr(self, "_last_sync_send_time", 0.0) or 0.0)
-                last_pitch = float(getattr(self, "_last_sync_pitch", 0.0) or 0.0)
-                last_roll = float(getattr(self, "_last_sync_roll", 0.0) or 0.0)
-
-                pose_changed = (
-                    abs(float(p) - last_pitch) >= pose_threshold
-                    or abs(float(r) - last_roll) >= pose_threshold
+                # 平衡补偿使用按舵机执行延迟外推的姿态，对准指令真正生效的时刻
+                latency = float(getattr(self.balance_ctrl, "actuation_latency_s", 0.0) or 0.0)
+                if latency > 0:
+                    p, r, y = self._get_gyro_data(horizon=latency)
+
+                sync = balance_runtime.get_servo_sync(self)
+                targets = sync.update(
+                    now,
+                    p,
+                    r,
+                    y,
+                    self.balance_ctrl.compute,
+                    gait=gait if gait_active else None,
+                    dt=dt,
+                    overlay=vision_runtime.head_overlay(self),
                 )
-                target_changed = self._targets_changed(targets, last_targets, threshold=target_threshold)
-                elapsed = now - last_send_t
-
-                should_send = False
-                if last_targets is None:
-                    should_send = True
-                elif pose_changed or target_changed:
-                    should_send = elapsed >= active_period
-                else:
-                    should_send = elapsed >= idle_period
-
-                if should_send:
-                    self.servo_bus.move_sync(targets, time_ms=100)
-                    self._last_sync_send_time = now
-                    self._last_sync_targets = dict(targets or {})
-                    self._last_sync_pitch = float(p)
-                    self._last_sync_roll = float(r)
+                if targets is not None:
+                    self.servo_bus.move_sync(targets, time_ms=SYNC_TIME_MS)
         except Exception as e:
             try:
                 now = time.time()
@@ -323,6 +297,9 @@ class RobotDashboardApp(App):
                 face.stop_talking()
 
     def _demo_eye_move(self, dt):
+        # 头部视觉跟随时眼睛由跟踪器驱动
+        if vision_runtime.is_head_tracking(self):
+            return
         face = self.root_widget.ids.get("face")
         if not face:
             return
@@ -336,9 +313,24 @@ class RobotDashboardApp(App):
     def _on_ai_speech(self, instance, text):
         ai_runtime.on_ai_speech(self, instance, text)
 
+    def _on_ai_turn_cancelled(self, instance):
+        ai_runtime.on_ai_turn_cancelled(self, instance)
+
     def _ai_speak_final(self, dt):
         ai_runtime.ai_speak_final(self, dt)
 
+    def get_action_queue_status(self):
+        return motion_runtime.get_action_queue_status(self)
+
+    def start_gait(self):
+        return motion_runtime.start_gait(self)
+
+    def stop_gait(self):
+        motion_runtime.stop_gait(self)
+
+    def set_gait_command(self, forward=0.0, turn=0.0):
+        return motion_runtime.set_gait_command(self, forward=forward, turn=turn)
+
     def set_ai_model(self, profile_name, api_key=None):
         if not self.ai_core:
             return False
@@ -348,16 +340,26 @@ class RobotDashboardApp(App):
         except Exception:
             return False
 
-    def save_ai_settings(self, profile_name, api_key):
+    def save_ai_settings(self, profile_name, api_key, hedge_enabled=None, hedge_secondary=None):
         try:
             cfg_path = Path(getattr(self, "user_data_dir", ".")) / "ai_settings.json"
             cfg_path.parent.mkdir(parents=True, exist_ok=True)
-            data = {
-                "profile_name": str(profile_name or "deepseek"),
-                "api_key": str(api_key or ""),
-            }
+            data = self.load_ai_settings()
+            profile_name = str(profile_name or "deepseek")
+            api_key = str(api_key or "")
+            # 每个 profile 单独保存 Key，对冲备用 profile 从这里取 Key
+            api_keys = dict(data.get("api_keys") or {})
+            if api_key:
+                api_keys[profile_name] = api_key
+            data.update({"profile_name": profile_name, "api_key": api_key, "api_keys": api_keys})
+            if hedge_enabled is not None:
+                data["hedge_enabled"] = bool(hedge_enabled)
+            if hedge_secondary is not None:
+                data["hedge_secondary"] = str(hedge_secondary or "")
             with open(cfg_path, "w", encoding="utf-8") as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+            if self.ai_core:
+                self.ai_core.set_profile_keys(api_keys)
             return True
         except Exception:
             return False
@@ -372,6 +374,23 @@ class RobotDashboardApp(App):
         except Exception:
             return {}
 
+    def set_ai_hedging(self, enabled, secondary=None):
+        if not self.ai_core:
+            return False
+        try:
+            self.ai_core.set_hedging(enabled, secondary=secondary)
+            return True
+        except Exception:
+            return False
+
+    def get_ai_hedge_stats(self):
+        if not self.ai_core:
+            return {}
+        try:
+            return self.ai_core.get_hedge_stats()
+        except Exception:
+            return {}
+
     def test_ai_chat(self, text):
         if not self.ai_core:
             return False
@@ -442,14 +461,24 @@ class RobotDashboardApp(App):
         stt_wait = 0
         stt_rec = 0
         llm_first = 0
+        llm_connect = 0
+        llm_ttft = 0
         llm_total = 0
+        cache_hits = 0
+        cache_misses = 0
+        prompt_tokens = 0
         try:
             if self.ai_core and hasattr(self.ai_core, "get_latency_snapshot"):
                 snap = dict(self.ai_core.get_latency_snapshot() or {})
                 stt_wait = int(snap.get("stt_wait_ms") or 0)
                 stt_rec = int(snap.get("stt_rec_ms") or 0)
                 llm_first = int(snap.get("llm_first_ms") or 0)
+                llm_connect = int(snap.get("llm_connect_ms") or 0)
+                llm_ttft = int(snap.get("llm_ttft_ms") or 0)
                 llm_total = int(snap.get("llm_total_ms") or 0)
+                cache_hits = int(snap.get("cache_hits") or 0)
+                cache_misses = int(snap.get("cache_misses") or 0)
+                prompt_tokens = int(snap.get("prompt_tokens") or 0)
         except Exception:
             pass
 
@@ -459,14 +488,61 @@ class RobotDashboardApp(App):
         except Exception:
             tts_ms = 0
 
+        queue_stats = {}
+        try:
+            if self.ai_core and hasattr(self.ai_core, "get_queue_stats"):
+                queue_stats = dict(self.ai_core.get_queue_stats() or {})
+        except Exception:
+            queue_stats = {}
+
+        intent = {}
+        try:
+            if self.ai_core and hasattr(self.ai_core, "get_intent_stats"):
+                intent = dict(self.ai_core.get_intent_stats() or {})
+        except Exception:
+            intent = {}
+
         return {
             "stt_wait_ms": stt_wait,
             "stt_rec_ms": stt_rec,
             "llm_first_ms": llm_first,
+            "llm_connect_ms": llm_connect,
+            "llm_ttft_ms": llm_ttft,
             "llm_total_ms": llm_total,
             "tts_ms": tts_ms,
+            "intent_hit_rate": float(intent.get("hit_rate") or 0.0),
+            "intent_saved_ms": int(intent.get("saved_ms_avg") or 0),
+            "cache_hits": cache_hits,
+            "cache_misses": cache_misses,
+            "prompt_tokens": prompt_tokens,
+            "queue_depth": int(queue_stats.get("depth") or 0),
+            "queue_merged": int(queue_stats.get("merged_text") or 0),
+            "queue_dropped": int(queue_stats.get("dropped_stale") or 0),
         }
 
+    def get_ai_trace_stats(self):
+        """当前 profile 各阶段累计耗时的 p50/p90/p99：{stage: {n, p50, p90, p99}}。"""
+        try:
+            if self.ai_core and hasattr(self.ai_core, "get_trace_stats"):
+                profile = str(getattr(self.ai_core, "profile_name", "") or "")
+                stats = dict(self.ai_core.get_trace_stats(profile) or {})
+                return dict(stats.get(profile) or {})
+        except Exception:
+            pass
+        return {}
+
+    def export_ai_trace(self):
+        """导出全部 profile 的轮次追踪直方图，返回 (ok, 路径或错误)。"""
+        try:
+            if not self.ai_core or not hasattr(self.ai_core, "export_trace"):
+                return False, "AI 未就绪"
+            path = Path(getattr(self, "user_data_dir", ".")) / "ai_trace.json"
+            if self.ai_core.export_trace(str(path)):
+                return True, str(path)
+            return False, "写入失败"
+        except Exception as e:
+            return False, str(e)
+
     # ================== 退出清理 ==================
     def on_stop(self):
         """应用退出时清理 OTG 回调与 USB 重试任务，避免重复注册与残留任务。"""
@@ -485,6 +561,20 @@ class RobotDashboardApp(App):
             self._android_usb_reconnect_ev = None
         except Exception:
             pass
+        motion_runtime.shutdown_action_executor(self)
+        try:
+            if self.ai_core and hasattr(self.ai_core, "close"):
+                self.ai_core.close()
+        except Exception:
+            pass
+        recording_runtime.stop_session_recording(self)
+        vision_runtime.shutdown_vision_pipeline(self)
+        try:
+            imu = getattr(self, "imu_reader", None)
+            if imu is not None:
+                imu.stop()
+        except Exception:
+            pass
 
     # ================== 外部接口 ==================
     def set_emotion(self, emo):
@@ -1,9 +1,21 @@
 import json
 import pathlib
 
+from services.servo_sync import ServoSyncThrottle
 from widgets.runtime_status import RuntimeStatusLogger
 
 
+def loop_writes_servos(app):
+    """主循环当前是否在同步写舵机（开启连续同步或步态运行中）。"""
+    bus = getattr(app, "servo_bus", None)
+    if not bus or getattr(bus, "is_mock", True):
+        return False
+    gait = getattr(app, "gait_engine", None)
+    if gait is not None and gait.is_active:
+        return True
+    return bool(getattr(app, "_enable_live_servo_sync", False))
+
+
 def balance_tuning_file(app):
     try:
         return pathlib.Path(app.user_data_dir) / "balance_tuning.json"
@@ -25,6 +37,7 @@ def save_balance_tuning(app):
         data = {
             "gain_p": float(getattr(bc, "gain_p", 5.5)),
             "gain_r": float(getattr(bc, "gain_r", 4.2)),
+            "actuation_latency_s": float(getattr(bc, "actuation_latency_s", 0.04)),
             "gyro_axis_mode": axis_mode,
             "gyro_ui_period": float(getattr(app, "_gyro_ui_period", 0.2) or 0.2),
             "sync_compute_pose_threshold_deg": float(
@@ -63,6 +76,11 @@ def load_balance_tuning(app):
         gr = max(0.0, min(20.0, gr))
         bc.gain_p = gp
         bc.gain_r = gr
+        try:
+            latency = float(obj.get("actuation_latency_s", getattr(bc, "actuation_latency_s", 0.04)))
+            bc.actuation_latency_s = max(0.0, min(0.1, latency))
+        except Exception:
+            pass
         app._gyro_axis_mode = axis_mode
         app._gyro_axis_mode_logged = axis_mode
         app._gyro_ui_period = float(obj.get("gyro_ui_period", getattr(app, "_gyro_ui_period", 0.2)) or 0.2)
@@ -94,3 +112,19 @@ def load_balance_tuning(app):
         return True
     except Exception:
         return False
+
+
+def get_servo_sync(app):
+    """主循环同步写节流器；每次取用时同步面板/预设修改过的 _sync_* 参数。"""
+    sync = getattr(app, "_servo_sync", None)
+    if sync is None:
+        sync = ServoSyncThrottle()
+        app._servo_sync = sync
+    idle_period = float(getattr(app, "_sync_idle_period", 0.22) or 0.22)
+    sync.active_period = float(getattr(app, "_sync_active_period", 0.1) or 0.1)
+    sync.idle_period = idle_period
+    sync.pose_threshold_deg = float(getattr(app, "_sync_pose_threshold_deg", 0.5) or 0.5)
+    sync.target_threshold = int(getattr(app, "_sync_target_threshold", 3) or 3)
+    sync.compute_pose_threshold_deg = float(getattr(app, "_sync_compute_pose_threshold_deg", 0.2) or 0.2)
+    sync.compute_idle_period = float(getattr(app, "_sync_compute_idle_period", idle_period) or idle_period)
+    return sync
@@ -11,7 +11,8 @@ from widgets.runtime_status import RuntimeStatusLogger
 from services.servo_bus import ServoBus
 from services.balance_ctrl import BalanceController
 from services.motion_controller import MotionController
-from services.imu import IMUReader
+from app import device_runtime
+from app import vision_runtime
 from services.neutral import load_neutral
 from services import usb_otg
 from services.ai_core import AICore
@@ -208,14 +209,20 @@ def init_balance_and_gyro(app):
     except Exception:
         pass
 
+    if platform == "android":
+        # 本机传感器融合在 IMUReader 的独立线程中完成，主循环只读取结果
+        try:
+            device_runtime.get_imu_reader(app)
+        except Exception:
+            logging.exception("IMU reader init failed")
+
     return neutral
 
 
 def init_motion_controller(app, neutral):
     try:
         if app.servo_bus and not getattr(app.servo_bus, "is_mock", True):
-            imu = IMUReader(simulate=False)
-            imu.start()
+            imu = device_runtime.get_imu_reader(app)
             app.motion_controller = MotionController(
                 app.servo_bus.manager,
                 balance_ctrl=app.balance_ctrl,
@@ -297,6 +304,7 @@ def init_ai_core(app):
     try:
         profile_name = os.environ.get("ROBOTBRAIN_LLM_PROFILE") or "deepseek"
         api_key = os.environ.get("ROBOTBRAIN_LLM_API_KEY")
+        saved = {}
 
         try:
             cfg_path = pathlib.Path(getattr(app, "user_data_dir", ".")) / "ai_settings.json"
@@ -308,11 +316,20 @@ def init_ai_core(app):
         except Exception as e:
             RuntimeStatusLogger.log_info(f"AI 配置读取失败，使用环境变量: {e}")
 
-        app.ai_core = AICore(api_key=api_key, profile_name=profile_name)
+        cache_path = pathlib.Path(getattr(app, "user_data_dir", ".")) / "ai_cache.json"
+        app.ai_core = AICore(api_key=api_key, profile_name=profile_name, cache_path=str(cache_path))
+        app.ai_core.set_profile_keys(saved.get("api_keys"))
+        if "hedge_enabled" in saved:
+            try:
+                app.ai_core.set_hedging(saved.get("hedge_enabled"), secondary=str(saved.get("hedge_secondary") or ""))
+            except ValueError as e:
+                RuntimeStatusLogger.log_info(f"AI 对冲配置无效，已忽略: {e}")
         app.ai_core.bind(
             on_action_command=app._on_ai_action,
             on_speech_output=app._on_ai_speech,
+            on_turn_cancelled=app._on_ai_turn_cancelled,
         )
+        vision_runtime.attach_ai_snapshot(app)
         RuntimeStatusLogger.log_info(
             f"AI 已初始化: profile={app.ai_core.profile_name}, online={app.ai_core.enabled}"
         )
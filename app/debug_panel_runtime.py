@@ -9,11 +9,13 @@ from kivy.clock import Clock
 
 from widgets.universal_tip import UniversalTip
 from widgets.debug_ui_components import ServoStatusCard
+from app import motion_runtime
 
 
 def start_demo_thread(owner):
-    t = threading.Thread(target=lambda: run_demo_motion(owner), daemon=True)
-    t.start()
+    # Demo 与其他动作共用统一执行队列，避免多个动作序列交错写总线
+    app = App.get_running_app()
+    motion_runtime.submit_action(app, "demo", source="ui", fn=lambda: run_demo_motion(owner))
 
 
 def run_demo_motion(owner):
@@ -46,20 +48,26 @@ def run_demo_motion(owner):
             RuntimeStatusLogger.log_error(f"Demo 模块导入失败: {e}")
         return
 
-    servo_mgr = app.servo_bus.manager
-    neutral = (
-        {i: 2048 for i in servo_mgr.servo_info_dict.keys()}
-        if hasattr(servo_mgr, "servo_info_dict")
-        else {i: 2048 for i in range(1, 26)}
-    )
-    imu = IMUReader(simulate=True)
-    imu.start()
-    mc = MotionController(
-        servo_mgr,
-        balance_ctrl=app.balance_ctrl,
-        imu_reader=imu,
-        neutral_positions=neutral,
-    )
+    # 优先复用全局控制器，使 stop 能抢占 Demo
+    imu = None
+    mc = getattr(app, "motion_controller", None)
+    if mc is None:
+        servo_mgr = app.servo_bus.manager
+        neutral = (
+            {i: 2048 for i in servo_mgr.servo_info_dict.keys()}
+            if hasattr(servo_mgr, "servo_info_dict")
+            else {i: 2048 for i in range(1, 26)}
+        )
+        imu = IMUReader(simulate=True)
+        imu.start()
+        mc = MotionController(
+            servo_mgr,
+            balance_ctrl=app.balance_ctrl,
+            imu_reader=imu,
+            neutral_positions=neutral,
+        )
+    if hasattr(mc, "reset_cancel"):
+        mc.reset_cancel()
 
     show_msg("开始 Demo: 站立")
     if RuntimeStatusLogger:
@@ -91,7 +99,13 @@ def run_demo_motion(owner):
     mc.stand()
     time.sleep(0.8)
 
-    imu.stop()
+    if imu is not None:
+        imu.stop()
+    if hasattr(mc, "is_cancelled") and mc.is_cancelled():
+        show_msg("Demo 已被中断")
+        if RuntimeStatusLogger:
+            RuntimeStatusLogger.log_action("Demo 已被中断")
+        return
     show_msg("Demo 完成")
     if RuntimeStatusLogger:
         RuntimeStatusLogger.log_action("Demo 完成")
@@ -429,49 +443,57 @@ def call_motion(owner, action):
         owner._show_info_popup("MotionController 未初始化或为 MOCK 模式")
         return
 
-    try:
-        if (
-            hasattr(app, "servo_bus")
-            and app.servo_bus
-            and not getattr(app.servo_bus, "is_mock", True)
-        ):
-            try:
-                app.servo_bus.set_torque(True)
-            except Exception:
-                pass
-    except Exception:
-        pass
-
     try:
         from widgets.runtime_status import RuntimeStatusLogger
     except Exception:
         RuntimeStatusLogger = None
 
-    try:
-        if RuntimeStatusLogger:
-            RuntimeStatusLogger.log_action(action)
-
-        if action == "stand":
-            mc.stand()
-        elif action == "sit":
-            mc.sit()
-        elif action == "walk":
-            mc.walk(steps=2, step_length=120, step_height=120, time_per_step_ms=350)
-        elif action == "wave":
-            mc.wave(side="right", times=3)
-        elif action == "dance":
-            mc.dance() if hasattr(mc, "dance") else None
-        elif action == "jump":
-            mc.jump() if hasattr(mc, "jump") else None
-        elif action == "turn":
-            mc.turn(angle=360) if hasattr(mc, "turn") else None
-        elif action == "squat":
-            mc.squat() if hasattr(mc, "squat") else None
-        elif action == "kick":
-            mc.kick() if hasattr(mc, "kick") else None
+    def _run():
+        mc = getattr(app, "motion_controller", None)
+        if not mc:
+            return
+        try:
+            if (
+                hasattr(app, "servo_bus")
+                and app.servo_bus
+                and not getattr(app.servo_bus, "is_mock", True)
+            ):
+                try:
+                    app.servo_bus.set_torque(True)
+                except Exception:
+                    pass
+        except Exception:
+            pass
+
+        try:
+            if hasattr(mc, "reset_cancel"):
+                mc.reset_cancel()
+            if action == "stand":
+                mc.stand()
+            elif action == "sit":
+                mc.sit()
+            elif action == "walk":
+                mc.walk(steps=2, step_length=120, step_height=120, time_per_step_ms=350)
+            elif action == "wave":
+                mc.wave(side="right", times=3)
+            elif action == "dance":
+                mc.dance() if hasattr(mc, "dance") else mc.run_action("dance")
+            elif action == "jump":
+                mc.jump() if hasattr(mc, "jump") else mc.run_action("jump")
+            elif action == "turn":
+                mc.turn(angle=360) if hasattr(mc, "turn") else mc.run_action("turn")
+            elif action == "squat":
+                mc.squat() if hasattr(mc, "squat") else mc.run_action("squat")
+            elif action == "kick":
+                mc.kick() if hasattr(mc, "kick") else mc.run_action("kick")
+        except Exception as e:
+            if RuntimeStatusLogger:
+                RuntimeStatusLogger.log_error(f"动作 {action} 执行失败: {e}")
+            owner._show_info_popup(f"动作执行失败: {e}")
 
+    if RuntimeStatusLogger:
+        RuntimeStatusLogger.log_action(action)
+    if motion_runtime.submit_action(app, action, source="ui", fn=_run):
         owner._show_info_popup(f"动作 {action} 已发送")
-    except Exception as e:
-        if RuntimeStatusLogger:
-            RuntimeStatusLogger.log_error(f"动作 {action} 执行失败: {e}")
-        owner._show_info_popup(f"动作执行失败: {e}")
+    else:
+        owner._show_info_popup(f"动作 {action} 已在队列中")
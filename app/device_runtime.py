@@ -4,6 +4,8 @@ import random
 from kivy.clock import Clock
 from kivy.utils import platform
 
+from services.imu import IMUReader
+from services.orientation_filter import map_axes
 from widgets.runtime_status import RuntimeStatusLogger
 from widgets.startup_tip import StartupTip
 
@@ -101,47 +103,115 @@ def start_permission_watcher(app):
         RuntimeStatusLogger.log_info("权限检查通过")
 
 
-def get_gyro_data(app, gyroscope_module):
-    """读取并转换陀螺仪数据；无可用传感器时回退模拟数据。"""
-    p, r, y = 0.0, 0.0, 0.0
-    if platform == "android" and gyroscope_module:
+def get_imu_reader(app):
+    """返回全局共享的 IMUReader（首次调用时创建并启动）。
+
+    Android 上读取本机陀螺仪 + 加速度计并做互补滤波；桌面端监听 UDP。
+    主循环、MotionController 与平衡控制共用同一实例，避免重复开启传感器/端口。
+    """
+    imu = getattr(app, "imu_reader", None)
+    if imu is None:
+        imu = IMUReader(simulate=False)
         try:
-            val = gyroscope_module.rotation
-            if val[0] is not None:
-                dx, dy, dz = val[0], val[1], val[2]
-
-                mode = getattr(app, "_gyro_axis_mode", "normal")
-                if mode == "auto":
-                    try:
-                        ax, ay = abs(dx), abs(dy)
-                        if max(ax, ay) > 0.8:
-                            if ay > ax * 1.8:
-                                app._gyro_axis_mode = "swapped"
-                            elif ax > ay * 1.8:
-                                app._gyro_axis_mode = "normal"
-                        app._gyro_axis_samples = getattr(app, "_gyro_axis_samples", 0) + 1
-                        if getattr(app, "_gyro_axis_mode", "auto") == "auto" and app._gyro_axis_samples > 120:
-                            app._gyro_axis_mode = "normal"
-                        mode = getattr(app, "_gyro_axis_mode", "normal")
-                        if mode != "auto":
-                            try:
-                                if getattr(app, "_gyro_axis_mode_logged", None) != mode:
-                                    RuntimeStatusLogger.log_info(f"陀螺仪轴映射已设置: {mode}")
-                                    app._gyro_axis_mode_logged = mode
-                            except Exception:
-                                pass
-                    except Exception:
-                        mode = "normal"
-
-                if mode == "swapped":
-                    p = -dx
-                    r = dy
-                else:
-                    p = dy
-                    r = -dx
-                y = dz
+            imu.start()
+        except Exception as e:
+            try:
+                RuntimeStatusLogger.log_error(f"IMU 启动失败: {e}")
+            except Exception:
+                pass
+        app.imu_reader = imu
+    return imu
+
+
+def get_imu_filter_stats(app):
+    imu = getattr(app, "imu_reader", None)
+    if imu is None or not hasattr(imu, "get_filter_stats"):
+        return {}
+    try:
+        stats = imu.get_filter_stats()
+        if hasattr(imu, "get_stream_stats"):
+            stats["stream"] = imu.get_stream_stats()
+        if hasattr(imu, "get_udp_stats") and not stats.get("fused"):
+            stats["udp"] = imu.get_udp_stats()
+        return stats
+    except Exception:
+        return {}
+
+
+def calibrate_imu(app):
+    """机器人摆正后调用：以当前姿态为参考，平衡控制输入归零。"""
+    imu = getattr(app, "imu_reader", None)
+    if imu is None or not hasattr(imu, "calibrate_level"):
+        return False
+    try:
+        ok = bool(imu.calibrate_level())
+    except Exception:
+        ok = False
+    if ok:
+        try:
+            RuntimeStatusLogger.log_info("IMU 参考姿态已重新校准")
         except Exception:
             pass
+    return ok
+
+
+def _update_gyro_axis_mode(app, dx, dy):
+    """auto 模式下根据角速度主轴判断屏幕横竖安装方向。"""
+    mode = getattr(app, "_gyro_axis_mode", "normal")
+    if mode != "auto":
+        return mode
+    try:
+        ax, ay = abs(dx), abs(dy)
+        if max(ax, ay) > 0.8:
+            if ay > ax * 1.8:
+                app._gyro_axis_mode = "swapped"
+            elif ax > ay * 1.8:
+                app._gyro_axis_mode = "normal"
+        app._gyro_axis_samples = getattr(app, "_gyro_axis_samples", 0) + 1
+        if getattr(app, "_gyro_axis_mode", "auto") == "auto" and app._gyro_axis_samples > 120:
+            app._gyro_axis_mode = "normal"
+        mode = getattr(app, "_gyro_axis_mode", "normal")
+        if mode != "auto":
+            try:
+                if getattr(app, "_gyro_axis_mode_logged", None) != mode:
+                    RuntimeStatusLogger.log_info(f"陀螺仪轴映射已设置: {mode}")
+                    app._gyro_axis_mode_logged = mode
+            except Exception:
+                pass
+    except Exception:
+        mode = "normal"
+    return mode
+
+
+def get_gyro_data(app, gyroscope_module, horizon=0.0):
+    """读取姿态角（度）；优先使用共享 IMUReader 的融合结果，无可用传感器时回退模拟数据。
+
+    horizon > 0 时对融合结果外推 horizon 秒（抵消舵机执行延迟），其他数据源忽略该参数。
+    """
+    p, r, y = 0.0, 0.0, 0.0
+    if platform == "android":
+        imu = getattr(app, "imu_reader", None)
+        if imu is not None and hasattr(imu, "is_fused") and imu.is_fused():
+            try:
+                # 轴映射判断仍基于角速度，输出则使用滤波后的角度
+                gx, gy, _gz = imu.get_rates()
+                mode = _update_gyro_axis_mode(app, gx, gy)
+                if horizon and horizon > 0:
+                    ax, ay, az = imu.predict_orientation(horizon)
+                else:
+                    ax, ay, az = imu.get_device_angles()
+                p, r, y = map_axes(mode, ax, ay, az)
+            except Exception:
+                pass
+        elif gyroscope_module:
+            try:
+                val = gyroscope_module.rotation
+                if val[0] is not None:
+                    dx, dy, dz = val[0], val[1], val[2]
+                    mode = _update_gyro_axis_mode(app, dx, dy)
+                    p, r, y = map_axes(mode, dx, dy, dz)
+            except Exception:
+                pass
     else:
         p = random.uniform(-5, 5)
         r = random.uniform(-5, 5)
@@ -0,0 +1,95 @@
+from services.action_executor import ActionExecutor
+from services.gait_engine import GaitEngine
+
+
+def get_action_executor(app):
+    """返回全局唯一的动作执行器（AI 与调试面板共用，首次调用时创建）。"""
+    ex = getattr(app, "action_executor", None)
+    if ex is None:
+        ex = ActionExecutor(lambda: getattr(app, "motion_controller", None))
+        ex.start()
+        app.action_executor = ex
+    return ex
+
+
+GAIT_ACTIONS = ("walk", "turn_left", "turn_right")
+
+
+def submit_action(app, action, source="ui", fn=None):
+    """提交动作到统一执行队列；返回 False 表示被合并或丢弃。"""
+    if fn is None and str(action or "").strip().lower() in GAIT_ACTIONS:
+        # 行走/转向交给连续步态：挂接后 MotionController.run_action 只更新速度指令
+        start_gait(app)
+    elif fn is not None:
+        fn = _with_gait_released(app, fn)
+    try:
+        return bool(get_action_executor(app).submit(action, source=source, fn=fn))
+    except Exception as e:
+        print(f"Action submit failed: {action}, err={e}")
+        return False
+
+
+def is_action_running(app):
+    ex = getattr(app, "action_executor", None)
+    return bool(ex is not None and ex.is_busy())
+
+
+def get_action_queue_status(app):
+    ex = getattr(app, "action_executor", None)
+    if ex is None:
+        return {}
+    try:
+        return ex.get_stats()
+    except Exception:
+        return {}
+
+
+def shutdown_action_executor(app):
+    ex = getattr(app, "action_executor", None)
+    if ex is None:
+        return
+    try:
+        ex.shutdown()
+    except Exception:
+        pass
+    app.action_executor = None
+
+
+def start_gait(app):
+    """挂接连续步态：主循环 _update_loop 每帧采样步态并与平衡补偿合并后统一 move_sync。"""
+    bus = getattr(app, "servo_bus", None)
+    mc = getattr(app, "motion_controller", None)
+    if not bus or getattr(bus, "is_mock", True) or not mc:
+        return False
+    gait = getattr(app, "gait_engine", None)
+    if gait is None:
+        gait = GaitEngine()
+        app.gait_engine = gait
+    mc.gait = gait
+    return True
+
+
+def _with_gait_released(app, fn):
+    """自定义动作（Demo 等）不经过 run_action，执行前同样先收敛并解除步态。"""
+
+    def run():
+        mc = getattr(app, "motion_controller", None)
+        if mc is not None and hasattr(mc, "release_gait"):
+            mc.release_gait()
+        return fn()
+
+    return run
+
+
+def stop_gait(app):
+    """停止步态：经动作队列提交 stop，幅值收敛后解除挂接并回中位。"""
+    return submit_action(app, "stop")
+
+
+def set_gait_command(app, forward=0.0, turn=0.0):
+    """非阻塞更新步态速度指令（持续行走直到 stop），下一控制周期生效。"""
+    if not start_gait(app):
+        return False
+    gait = app.gait_engine
+    gait.set_command(forward=forward, turn=turn)
+    return True
@@ -0,0 +1,61 @@
+import pathlib
+
+from app import vision_runtime
+from services import session_recorder
+from widgets.runtime_status import RuntimeStatusLogger
+
+
+def recording_dir(app):
+    try:
+        return pathlib.Path(app.user_data_dir) / "recordings"
+    except Exception:
+        return pathlib.Path("data") / "recordings"
+
+
+def start_session_recording(app):
+    """开始录制 IMU、舵机指令、遥测、AI 动作与低分辨率摄像头帧；返回输出文件路径。"""
+    try:
+        rec = session_recorder.start_recording(str(recording_dir(app)))
+        vision_runtime.start_frame_recording(app)
+        path = rec.files[-1] if rec.files else ""
+        try:
+            RuntimeStatusLogger.log_info(f"会话录制已开始: {path}")
+        except Exception:
+            pass
+        return path
+    except Exception as e:
+        try:
+            RuntimeStatusLogger.log_error(f"会话录制启动失败: {e}")
+        except Exception:
+            pass
+        return ""
+
+
+def stop_session_recording(app):
+    vision_runtime.stop_frame_recording(app)
+    rec = session_recorder.stop_recording()
+    if rec is None:
+        return {}
+    stats = rec.get_stats()
+    try:
+        RuntimeStatusLogger.log_info(
+            f"会话录制已停止: {stats['segments']} 段, {stats['bytes'] / 1024:.0f}KB, 丢弃 {stats['dropped']}"
+        )
+    except Exception:
+        pass
+    return stats
+
+
+def toggle_session_recording(app):
+    """切换录制状态，返回切换后是否正在录制。"""
+    if session_recorder.get_active_recorder() is not None:
+        stop_session_recording(app)
+        return False
+    return bool(start_session_recording(app))
+
+
+def get_recording_status(app):
+    rec = session_recorder.get_active_recorder()
+    if rec is None:
+        return {"running": False}
+    return rec.get_stats()
@@ -7,7 +7,7 @@ from kivy.utils import platform
 
 from widgets.runtime_status import RuntimeStatusLogger
 from services.servo_bus import ServoBus
-from services.imu import IMUReader
+from app import device_runtime
 from services.motion_controller import MotionController
 
 
@@ -377,8 +377,7 @@ def handle_android_usb_attach_intent(app, source="resume"):
 def init_motion_controller_after_connect(app):
     """连接成功后初始化 MotionController。"""
     try:
-        imu = IMUReader(simulate=False)
-        imu.start()
+        imu = device_runtime.get_imu_reader(app)
         app.motion_controller = MotionController(
             app.servo_bus.manager,
             balance_ctrl=app.balance_ctrl,
@@ -850,8 +849,7 @@ def handle_otg_event(app, event, device_id, list_ports_module=None):
                                         pass
                                     connected = True
                                     try:
-                                        imu = IMUReader(simulate=False)
-                                        imu.start()
+                                        imu = device_runtime.get_imu_reader(app)
                                         app.motion_controller = MotionController(
                                             app.servo_bus.manager,
                                             balance_ctrl=app.balance_ctrl,
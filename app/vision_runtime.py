@@ -0,0 +1,209 @@
+import time
+
+from kivy.clock import Clock
+
+from app import balance_runtime
+from app import motion_runtime
+from services import session_recorder
+from services.head_tracker import HeadTracker
+from services.vision import ColorTracker
+from services.vision_pipeline import LatestFrameSink, VisionPipeline, encode_jpeg
+
+
+def _camera_view(app):
+    try:
+        return app.root_widget.ids.get("camera_view")
+    except Exception:
+        return None
+
+
+def get_vision_pipeline(app):
+    """返回全局视觉流水线，并挂接到 CameraView 的帧回调（首次调用时创建）。"""
+    pipe = getattr(app, "vision_pipeline", None)
+    if pipe is None:
+        pipe = VisionPipeline(max_workers=2)
+        app.vision_pipeline = pipe
+    cam = _camera_view(app)
+    if cam is not None and getattr(cam, "frame_callback", None) != pipe.submit:
+        cam.frame_callback = pipe.submit
+    return pipe
+
+
+def start_color_tracking(app, hsv_lower=(35, 80, 60), hsv_upper=(85, 255, 255), rate_hz=15.0, width=None):
+    """限频运行颜色跟踪，不占用 UI 线程。
+
+    跟踪模式自行缩小帧做搜索、锁定后只处理 ROI，因此默认传入原尺寸帧以保持全分辨率坐标。
+    """
+    tracker = getattr(app, "color_tracker", None)
+    if tracker is None:
+        tracker = ColorTracker(hsv_lower=hsv_lower, hsv_upper=hsv_upper, tracking=True)
+        app.color_tracker = tracker
+    get_vision_pipeline(app).register("color", tracker.process_frame, rate_hz=rate_hz, width=width)
+    return tracker
+
+
+def stop_color_tracking(app):
+    pipe = getattr(app, "vision_pipeline", None)
+    if pipe is not None:
+        pipe.unregister("color")
+    app.head_tracking_active = False
+
+
+def _face_look(app):
+    def look(x, y):
+        face = app.root_widget.ids.get("face") if getattr(app, "root_widget", None) else None
+        if face is not None:
+            Clock.schedule_once(lambda dt: face.look_at(x, y), 0)
+    return look
+
+
+def _head_send(app, mc):
+    def send(yaw, pitch, runtime_ms=60):
+        if balance_runtime.loop_writes_servos(app):
+            # 主循环在写总线时颈部目标随同步写下发，颈部只有一个写者
+            app.head_offsets = (yaw, pitch)
+            return True
+        app.head_offsets = None
+        return mc.set_head(yaw, pitch, runtime_ms=runtime_ms)
+    return send
+
+
+def head_overlay(app):
+    """头部跟踪时颈部的绝对目标 {舵机ID: 位置}，由 _update_loop 覆盖平衡目标；未跟踪时返回 None。"""
+    offsets = getattr(app, "head_offsets", None)
+    mc = getattr(app, "motion_controller", None)
+    if offsets is None or mc is None or not is_head_tracking(app):
+        return None
+    return mc.head_targets(*offsets)
+
+
+def start_head_tracking(app, hsv_lower=(35, 80, 60), hsv_upper=(85, 255, 255), rate_hz=30.0, **kwargs):
+    """颜色跟踪 + 颈部视觉伺服：每帧在视觉线程上更新质心并下发颈部目标，眼睛同步注视。
+
+    主循环在同步写舵机时，颈部目标交给循环随平衡目标一起下发；否则直接 set_head。
+    """
+    mc = getattr(app, "motion_controller", None)
+    if mc is None:
+        return None
+    tracker = getattr(app, "color_tracker", None)
+    if tracker is None:
+        tracker = ColorTracker(hsv_lower=hsv_lower, hsv_upper=hsv_upper, tracking=True)
+        app.color_tracker = tracker
+    head = getattr(app, "head_tracker", None)
+    if head is None or head.mc is not mc:
+        kwargs.setdefault("pause_fn", lambda: motion_runtime.is_action_running(app))
+        kwargs.setdefault("send_fn", _head_send(app, mc))
+        head = HeadTracker(mc, look_fn=_face_look(app), **kwargs)
+        app.head_tracker = head
+
+    def on_frame(frame, ts):
+        tracker.process_frame(frame)
+        cx, cy, _ = tracker.get_last()
+        h, w = frame.shape[:2]
+        head.update(cx, cy, w, h, ts)
+
+    # 与普通颜色跟踪共用一个阶段，避免同一帧重复处理
+    get_vision_pipeline(app).register("color", on_frame, rate_hz=rate_hz, width=None, pass_ts=True)
+    app.head_tracking_active = True
+    return head
+
+
+def stop_head_tracking(app):
+    stop_color_tracking(app)
+    app.head_offsets = None
+    head = getattr(app, "head_tracker", None)
+    if head is not None:
+        try:
+            head.reset()
+        except Exception:
+            pass
+
+
+def is_head_tracking(app):
+    return bool(getattr(app, "head_tracking_active", False))
+
+
+def get_snapshot_sink(app, rate_hz=2.0, width=640):
+    """AI 截图用的最新帧缓存：按需读取 sink.get()，不阻塞采集。"""
+    sink = getattr(app, "vision_snapshot_sink", None)
+    if sink is None:
+        sink = LatestFrameSink()
+        app.vision_snapshot_sink = sink
+        get_vision_pipeline(app).register("snapshot", sink, rate_hz=rate_hz, width=width)
+    return sink
+
+
+def get_ai_snapshot(app, max_age=1.5, quality=80):
+    """最新一帧的 JPEG（供 AI 视觉对话）；没有帧或帧已过期时返回 None。"""
+    frame, ts = get_snapshot_sink(app).get()
+    if frame is None or time.monotonic() - ts > max_age:
+        return None
+    return encode_jpeg(frame, quality)
+
+
+def attach_ai_snapshot(app):
+    """让 AI 在提到眼前画面的轮次自动附带摄像头截图。"""
+    ai_core = getattr(app, "ai_core", None)
+    if ai_core is None:
+        return
+    get_snapshot_sink(app)
+    ai_core.image_provider = lambda: get_ai_snapshot(app)
+
+
+def start_frame_recording(app, rate_hz=5.0, width=160, quality=60):
+    """会话录制期间以低帧率、低分辨率把摄像头帧写入录制文件（时间戳为帧到达时刻）。"""
+
+    def on_frame(frame, ts):
+        h, w = frame.shape[:2]
+        session_recorder.record_frame(ts, encode_jpeg(frame, quality), w, h)
+
+    get_vision_pipeline(app).register("recorder", on_frame, rate_hz=rate_hz, width=width, pass_ts=True)
+
+
+def stop_frame_recording(app):
+    pipe = getattr(app, "vision_pipeline", None)
+    if pipe is not None:
+        pipe.unregister("recorder")
+
+
+def get_vision_stats(app):
+    stats = {}
+    pipe = getattr(app, "vision_pipeline", None)
+    if pipe is not None:
+        try:
+            stats = pipe.get_stats()
+        except Exception:
+            stats = {}
+    cam = _camera_view(app)
+    if cam is not None and hasattr(cam, "get_capture_stats"):
+        try:
+            stats["capture"] = cam.get_capture_stats()
+        except Exception:
+            pass
+    tracker = getattr(app, "color_tracker", None)
+    if tracker is not None:
+        try:
+            stats["color_tracker"] = tracker.get_stats()
+        except Exception:
+            pass
+    head = getattr(app, "head_tracker", None)
+    if head is not None and is_head_tracking(app):
+        try:
+            stats["head_tracker"] = head.get_stats()
+        except Exception:
+            pass
+    return stats
+
+
+def shutdown_vision_pipeline(app):
+    pipe = getattr(app, "vision_pipeline", None)
+    if pipe is None:
+        return
+    cam = _camera_view(app)
+    if cam is not None and getattr(cam, "frame_callback", None) == pipe.submit:
+        cam.frame_callback = None
+    try:
+        pipe.shutdown()
+    except Exception:
+        pass
+    app.vision_pipeline = None
@@ -0,0 +1,252 @@
+"""
+ActionExecutor
+
+AI 与 UI 动作指令的统一执行器：单工作线程 + 有界优先级队列，保证同一时刻只有一个
+MotionController 动作序列在写总线。
+
+规则：
+- stop 优先级最高：清空队列并抢占正在执行的动作（MotionController.cancel）
+- 与队尾相同的动作合并为一次；AI 重复下发正在执行的动作时同样合并
+- 新的 AI 决策到达时，丢弃队列中尚未执行的旧 AI 动作
+- 队列满时丢弃优先级最低、最早入队的动作
+
+使用示例：
+    ex = ActionExecutor(lambda: app.motion_controller)
+    ex.submit('wave', source='ai')
+    ex.submit('demo', source='ui', fn=run_demo)
+    ex.get_stats()
+"""
+
+import heapq
+import logging
+import threading
+import time
+
+PRIORITY_STOP = 0
+PRIORITY_UI = 1
+PRIORITY_AI = 2
+
+_SOURCE_PRIORITY = {'ui': PRIORITY_UI, 'ai': PRIORITY_AI}
+
+
+def run_motion_action(motion, action):
+    """执行单个命名动作；兼容没有 run_action 的旧控制器。"""
+    if hasattr(motion, 'run_action'):
+        return motion.run_action(action)
+    if action == 'walk' and hasattr(motion, 'walk'):
+        return motion.walk(steps=2)
+    if action == 'stop' and hasattr(motion, 'stop'):
+        return motion.stop()
+    if action == 'nod' and hasattr(motion, 'nod'):
+        return motion.nod(times=1)
+    if action == 'shake_head' and hasattr(motion, 'shake_head'):
+        return motion.shake_head(times=1)
+    if action == 'wave' and hasattr(motion, 'wave'):
+        return motion.wave(side='right', times=1)
+    if action == 'sit' and hasattr(motion, 'sit'):
+        return motion.sit()
+    if action == 'stand' and hasattr(motion, 'stand'):
+        return motion.stand()
+    if action == 'twist' and hasattr(motion, 'twist'):
+        return motion.twist(angle_deg=25)
+    logging.info('Action not supported by motion controller: %s', action)
+    return False
+
+
+class ActionExecutor:
+    def __init__(self, motion_getter, max_queue=8):
+        """
+        motion_getter: 返回当前 MotionController 的可调用对象（重连后控制器会被替换）
+        max_queue: 队列上限
+        """
+        self._motion_getter = motion_getter
+        self.max_queue = max(1, int(max_queue))
+
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = 0
+        self._current = None
+        self._running = False
+        self._thread = None
+
+        self._stats = {
+            'submitted': 0,
+            'executed': 0,
+            'failed': 0,
+            'merged': 0,
+            'dropped_stale': 0,
+            'dropped_full': 0,
+            'preempted': 0,
+            'max_depth': 0,
+        }
+        self._per_action = {}
+
+    # ---------------- 生命周期 ----------------
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._worker, name='action-executor', daemon=True)
+        self._thread.start()
+
+    def shutdown(self, timeout=1.0):
+        with self._cond:
+            self._running = False
+            self._heap.clear()
+            self._cond.notify_all()
+        motion = self._get_motion()
+        if motion is not None and hasattr(motion, 'cancel'):
+            motion.cancel()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    # ---------------- 提交 ----------------
+    def submit(self, action, source='ui', fn=None):
+        """提交动作。fn 为自定义执行函数（如 Demo），否则调用 motion.run_action(action)。
+
+        返回 False 表示动作被合并或丢弃。
+        """
+        action = str(action or '').strip().lower()
+        if action in ('', 'none'):
+            return False
+        source = str(source or 'ui')
+        if not self._running:
+            self.start()
+
+        now = time.monotonic()
+        with self._cond:
+            self._stats['submitted'] += 1
+
+            if action == 'stop':
+                dropped = len(self._heap)
+                self._heap.clear()
+                self._stats['dropped_stale'] += dropped
+                if self._current is not None:
+                    self._stats['preempted'] += 1
+                    motion = self._get_motion()
+                    if motion is not None and hasattr(motion, 'cancel'):
+                        motion.cancel()
+                self._push(PRIORITY_STOP, action, source, fn, now)
+                return True
+
+            if source == 'ai':
+                # 新的 AI 决策使队列中的旧 AI 动作失效
+                kept = [item for item in self._heap if item[2]['source'] != 'ai']
+                self._stats['dropped_stale'] += len(self._heap) - len(kept)
+                if len(kept) != len(self._heap):
+                    self._heap = kept
+                    heapq.heapify(self._heap)
+
+            if self._is_duplicate(action, source):
+                self._stats['merged'] += 1
+                return False
+
+            if len(self._heap) >= self.max_queue:
+                victim = max(self._heap, key=lambda item: (item[0], -item[1]))
+                if victim[0] < _SOURCE_PRIORITY.get(source, PRIORITY_UI):
+                    self._stats['dropped_full'] += 1
+                    return False
+                self._heap.remove(victim)
+                heapq.heapify(self._heap)
+                self._stats['dropped_full'] += 1
+
+            self._push(_SOURCE_PRIORITY.get(source, PRIORITY_UI), action, source, fn, now)
+            return True
+
+    def _push(self, priority, action, source, fn, now):
+        self._seq += 1
+        item = {'action': action, 'source': source, 'fn': fn, 'enqueued_at': now}
+        heapq.heappush(self._heap, (priority, self._seq, item))
+        self._stats['max_depth'] = max(self._stats['max_depth'], len(self._heap))
+        self._cond.notify()
+
+    def _is_duplicate(self, action, source):
+        if self._heap:
+            tail = max(self._heap, key=lambda item: item[1])[2]
+            return tail['action'] == action and tail['source'] == source
+        cur = self._current
+        return bool(cur and source == 'ai' and cur['source'] == 'ai' and cur['action'] == action)
+
+    # ---------------- 执行 ----------------
+    def _get_motion(self):
+        try:
+            return self._motion_getter()
+        except Exception:
+            return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._running and not self._heap:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                _prio, _seq, item = heapq.heappop(self._heap)
+                self._current = item
+                depth = len(self._heap)
+                motion = self._get_motion()
+                # 在锁内清除上一动作的抢占标志：之后到达的 stop 在同一把锁内 cancel()，不会被清掉
+                if motion is not None and hasattr(motion, 'reset_cancel') and item['action'] != 'stop':
+                    motion.reset_cancel()
+
+            start = time.monotonic()
+            wait_ms = (start - item['enqueued_at']) * 1000.0
+            ok = False
+            try:
+                if item['fn'] is not None:
+                    item['fn']()
+                    ok = True
+                else:
+                    if motion is None:
+                        logging.info('Action skipped, motion controller not ready: %s', item['action'])
+                    else:
+                        ok = run_motion_action(motion, item['action']) is not False
+            except Exception as e:
+                logging.warning('Action execution failed: %s, err=%s', item['action'], e)
+            exec_ms = (time.monotonic() - start) * 1000.0
+
+            with self._cond:
+                self._current = None
+                self._record(item, ok, wait_ms, exec_ms)
+            logging.info(
+                '[action] %s source=%s wait=%.0fms exec=%.0fms depth=%d ok=%s',
+                item['action'], item['source'], wait_ms, exec_ms, depth, ok,
+            )
+
+    def _record(self, item, ok, wait_ms, exec_ms):
+        self._stats['executed'] += 1
+        if not ok:
+            self._stats['failed'] += 1
+        st = self._per_action.setdefault(
+            item['action'],
+            {'count': 0, 'wait_ms_total': 0.0, 'exec_ms_total': 0.0, 'last_wait_ms': 0.0, 'last_exec_ms': 0.0},
+        )
+        st['count'] += 1
+        st['wait_ms_total'] += wait_ms
+        st['exec_ms_total'] += exec_ms
+        st['last_wait_ms'] = wait_ms
+        st['last_exec_ms'] = exec_ms
+
+    def is_busy(self):
+        """是否有动作正在执行（头部跟踪等旁路写总线的控制据此暂停）。"""
+        return self._current is not None
+
+    # ---------------- 统计 ----------------
+    def get_stats(self):
+        with self._cond:
+            out = dict(self._stats)
+            out['depth'] = len(self._heap)
+            out['current'] = self._current['action'] if self._current else None
+            actions = {}
+            for name, st in self._per_action.items():
+                n = max(1, st['count'])
+                actions[name] = {
+                    'count': st['count'],
+                    'avg_wait_ms': round(st['wait_ms_total'] / n, 1),
+                    'avg_exec_ms': round(st['exec_ms_total'] / n, 1),
+                    'last_wait_ms': round(st['last_wait_ms'], 1),
+                    'last_exec_ms': round(st['last_exec_ms'], 1),
+                }
+            out['actions'] = actions
+            return out
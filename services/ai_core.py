@@ -1,18 +1,26 @@
+import asyncio
 import base64
 import json
 import os
-import re
+import queue
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, List, Optional
 
-import requests
 from kivy.clock import Clock
 from kivy.event import EventDispatcher
 from kivy.logger import Logger
 from kivy.utils import platform
 
+from .ai_http import LatencyWindow, SessionPool
+from .context_builder import ContextBuilder
+from .decision_cache import DecisionCache, image_fingerprint
+from .input_queue import CoalescingInputQueue
+from .intent_engine import IntentEngine
+from .json_stream import StreamingJSONParser
+from .turn_tracer import TurnTracer
+
 if platform == "android":
     try:
         from jnius import autoclass, PythonJavaClass, java_method
@@ -29,6 +37,15 @@ else:
     run_on_ui_thread = None
 
 
+# 提到眼前画面的话语才附带摄像头截图（视觉模型更慢，且画面会让决策缓存失效）
+_SCENE_WORDS = ("看", "画面", "眼前", "前面", "这是什么", "这是谁", "什么颜色", "拍", "镜头", "认出", "认识")
+
+
+def wants_scene(text):
+    text = str(text or "")
+    return any(w in text for w in _SCENE_WORDS)
+
+
 @dataclass
 class ModelProfile:
     name: str
@@ -37,6 +54,65 @@ class ModelProfile:
     vision_model: str
     api_key_env: str = "ROBOTBRAIN_LLM_API_KEY"
     timeout_sec: int = 60
+    context_tokens: int = 3000
+
+
+class _StreamAttempt:
+    """一次流式请求（可能与其他 profile 竞速）；增量片段经队列交给 _chat_stream 消费。"""
+
+    def __init__(self, profile, api_key, hedged=False):
+        self.profile = profile
+        self.api_key = api_key
+        self.hedged = hedged
+        self.q = queue.Queue()
+        self.cancel = threading.Event()
+        self.first_token = threading.Event()
+        self.finished = threading.Event()
+        self.started_at = time.time()
+        self.first_at = None
+        self.connect_ms = 0
+        self.error = None
+        self.resp = None
+
+    def abort(self):
+        self.cancel.set()
+        resp = self.resp
+        if resp is not None:
+            try:
+                resp.close()
+            except Exception:
+                pass
+
+
+class _TurnCancelled(Exception):
+    pass
+
+
+class _Turn:
+    """一轮对话输入及其流式处理状态；被更新的语音输入打断（barge-in）时取消，其输出不再下发。
+
+    流式状态随轮次走，被取消轮次的线程池任务晚到时不会改写下一轮的状态。
+    """
+
+    def __init__(self, gen, image_data, user_text, local):
+        self.gen = gen
+        self.image_data = image_data
+        self.user_text = user_text
+        self.local = local              # 本地意图 (IntentMatch, 下发时刻) 或 None
+        self.local_recorded = False
+        self.created_at = time.time()
+        self.cancelled = threading.Event()
+        self.attempts = []
+        # 流式解析状态：已播报的 speech 字符数；action/emotion 字段闭合即提前下发动作
+        self.stream_parser = None
+        self.streamed_chars = 0
+        self.early_action_sent = False
+
+    def cancel(self):
+        self.cancelled.set()
+        for att in list(self.attempts):
+            att.abort()
+            att.q.put(("cancel", None))
 
 
 if platform == "android" and PythonJavaClass is not None and java_method is not None:
@@ -66,7 +142,10 @@ if platform == "android" and PythonJavaClass is not None and java_method is not
 
         @java_method("()V")
         def onEndOfSpeech(self):
-            pass
+            try:
+                self._owner._stt_speech_end_ts = time.time()
+            except Exception:
+                pass
 
         @java_method("(I)V")
         def onError(self, error):
@@ -95,18 +174,35 @@ if platform == "android" and PythonJavaClass is not None and java_method is not
 
 
 class VoiceAI(EventDispatcher):
-    __events__ = ("on_action_command", "on_speech_output")
+    __events__ = ("on_action_command", "on_speech_output", "on_turn_cancelled")
 
-    def __init__(self, api_key=None, profile_name=None, config_path=None, history_turns=8):
+    def __init__(self, api_key=None, profile_name=None, config_path=None, history_turns=8, cache_path=None):
         super().__init__()
         self.is_thinking = False
         self._lock = threading.Lock()
         self._history_turns = max(2, int(history_turns))
-        self._history: List[Dict[str, str]] = []
-        self._streamed_chars = 0
+        # 本地意图快速通道：命中时动作已下发，本轮 LLM 只负责说话
+        try:
+            self.intent_engine = IntentEngine.load()
+        except Exception as e:
+            Logger.warning(f"AI: intent engine unavailable: {e}")
+            self.intent_engine = None
         self._realtime_text_buf = ""
         self._realtime_flush_event = None
-        self._pending_inputs: List[Dict[str, Optional[bytes]]] = []
+        # 单个后台 asyncio 事件循环串行处理对话轮次；阻塞的 HTTP 流在有界线程池中执行
+        self._loop = None
+        self._loop_thread = None
+        self._loop_ready = threading.Event()
+        self._turn_signal = None
+        # 有界合并队列：连续文本合并、图像只留最新、过期输入丢弃
+        self._inputs = CoalescingInputQueue(freshness_sec=8.0)
+        self._current_turn = None
+        self._current_task = None
+        self._turn_gen = 0
+        self._cancelled_gens = set()
+        self._tls = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="ai-io")
+        self.barge_in_enabled = True
 
         self._voice_sr = None
         self._voice_mic = None
@@ -119,13 +215,41 @@ class VoiceAI(EventDispatcher):
         self._android_listen_start_ts = 0.0
         self._android_sr_cls = None
         self._stt_ignore_until = 0.0
+        # 最近一次 STT 最终结果的 (语音结束, 识别完成) 时刻，由下一轮输入取走
+        self._stt_speech_end_ts = 0.0
+        self._stt_marks = None
         self._perf = {
             "stt_wait_ms": 0,
             "stt_rec_ms": 0,
             "llm_first_ms": 0,
+            "llm_connect_ms": 0,
+            "llm_ttft_ms": 0,
+            "llm_conn_reused": False,
             "llm_total_ms": 0,
+            "llm_profile": "",
+            "hedge_fired": 0,
+            "hedge_wins": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "cache_hit_ms": 0,
+            "last_from_cache": False,
+            "barge_ins": 0,
+            "prompt_tokens": 0,
             "updated_at": 0.0,
         }
+        # 对冲请求：主 profile 超过其 TTFT 分位数仍无首 token 时，向备用 profile 发同样请求
+        self._hedge_cfg = {}
+        self._ttft = {}
+        # 用户保存的各 profile API Key（ai_settings.json 的 api_keys），优先于环境变量
+        self._profile_keys = {}
+        # 摄像头截图来源：返回 JPEG bytes 或 None（由 app/vision_runtime.attach_ai_snapshot 设置）
+        self.image_provider = None
+        # 决策缓存（重复的问候/指令直接复用，不再调用 LLM）
+        self.decision_cache = DecisionCache(cache_path or os.environ.get("ROBOTBRAIN_AI_CACHE"))
+        # 每个 profile 一个 keep-alive 会话，启动/切换时预热连接
+        self._http = SessionPool()
+        # 端到端轮次追踪：各阶段按 profile 统计 p50/p90/p99
+        self.tracer = TurnTracer()
         self.last_voice_error = ""
         self.last_chat_error = ""
 
@@ -140,8 +264,16 @@ class VoiceAI(EventDispatcher):
         )
         self.enabled = bool(self.api_key)
 
+        self.hedge_enabled = bool(self._hedge_cfg.get("enabled", False))
+        self.hedge_profile = str(self._hedge_cfg.get("secondary") or "") or None
+        self.hedge_percentile = float(self._hedge_cfg.get("percentile", 0.9))
+        self.hedge_min_ms = int(self._hedge_cfg.get("min_ms", 800))
+        self.hedge_max_ms = int(self._hedge_cfg.get("max_ms", 4000))
+        self.hedge_default_ms = int(self._hedge_cfg.get("default_ms", 2500))
+
         if self.enabled:
             Logger.info(f"AI: online mode. profile={self.profile_name}, model={self.profile.text_model}")
+            self.prewarm()
         else:
             Logger.warning("AI: API key missing. Running in MOCK mode.")
 
@@ -149,16 +281,23 @@ class VoiceAI(EventDispatcher):
 你是一个活泼可爱的人形机器人。你要结合视觉和对话做决策。
 必须只输出 JSON，不能包含任何 JSON 外文字。格式如下：
 {
-  "thought": "内部思考，简短",
-  "speech": "对主人说的话，必须短句口语化",
   "emotion": "normal|happy|sad|angry|surprised|thinking|wink",
-  "action": "walk|stop|nod|shake_head|wave|sit|stand|twist|none"
+  "action": "walk|stop|nod|shake_head|wave|sit|stand|twist|none",
+  "speech": "对主人说的话，必须短句口语化",
+  "thought": "内部思考，简短"
 }
+字段顺序必须与上面一致（先 emotion、action，再 speech）。
 规则：
 1) 默认 action=none，只有主人明确要求动作时才输出动作。
 2) 安全优先：动作不确定时输出 stop。
 3) speech 尽量 8~24 字，适合实时播报。
 """.strip()
+        # 按 profile 的 token 预算组装上下文，旧轮次在后台压缩为摘要
+        self.context = ContextBuilder(
+            self.system_prompt,
+            budget_tokens=self.profile.context_tokens,
+            max_turns=self._history_turns,
+        )
 
     def on_action_command(self, action, emotion):
         pass
@@ -166,6 +305,9 @@ class VoiceAI(EventDispatcher):
     def on_speech_output(self, text):
         pass
 
+    def on_turn_cancelled(self):
+        pass
+
     def list_profiles(self):
         return list(self._profiles.keys())
 
@@ -178,23 +320,262 @@ class VoiceAI(EventDispatcher):
         self.profile_name = profile_name
         self.profile = self._profiles[profile_name]
         self.api_key = self._normalize_api_key(
-            api_key or os.environ.get(self.profile.api_key_env) or os.environ.get("ROBOTBRAIN_LLM_API_KEY")
+            api_key or self._profile_api_key(self.profile) or os.environ.get("ROBOTBRAIN_LLM_API_KEY")
         )
         self.enabled = bool(self.api_key)
+        self.context.budget_tokens = self.profile.context_tokens
         Logger.info(f"AI: switched profile={self.profile_name}, online={self.enabled}")
+        if self.enabled:
+            self.prewarm()
+
+    def prewarm(self):
+        """后台预先建立到当前 profile 服务端的连接（DNS/TCP/TLS），首轮对话直接复用。"""
+        try:
+            urls = self._candidate_chat_urls(self.profile.base_url)
+            if not urls:
+                return
+            base = urls[0][: -len("/chat/completions")]
+            self._http.prewarm(self.profile_name, base, self._auth_headers())
+            secondary = self._hedge_secondary()
+            if secondary is not None:
+                profile, key = secondary
+                base = self._candidate_chat_urls(profile.base_url)[0][: -len("/chat/completions")]
+                self._http.prewarm(profile.name, base, self._auth_headers(key))
+        except Exception as e:
+            Logger.warning(f"AI: prewarm failed: {e}")
+
+    # ---------------- 对冲请求 ----------------
+    def set_profile_keys(self, keys):
+        """设置各 profile 的 API Key（{profile_name: key}），对冲备用 profile 与切换 profile 时使用。"""
+        self._profile_keys = {}
+        for name, key in dict(keys or {}).items():
+            key = self._normalize_api_key(key)
+            if key:
+                self._profile_keys[str(name)] = key
+
+    def _profile_api_key(self, profile):
+        return self._normalize_api_key(self._profile_keys.get(profile.name) or os.environ.get(profile.api_key_env))
+
+    def set_hedging(self, enabled, secondary=None):
+        """开关对冲请求；secondary 为备用 profile 名，"" 表示自动选择第一个有 Key 的 profile。"""
+        self.hedge_enabled = bool(enabled)
+        if secondary is not None:
+            if secondary and secondary not in self._profiles:
+                raise ValueError(f"Unknown profile: {secondary}")
+            self.hedge_profile = secondary or None
+        if self.hedge_enabled:
+            self.prewarm()
+
+    def _hedge_secondary(self):
+        """返回 (profile, api_key)；未启用或备用 profile 无可用 Key 时返回 None。"""
+        if not self.hedge_enabled:
+            return None
+        names = [self.hedge_profile] if self.hedge_profile else list(self._profiles.keys())
+        for name in names:
+            if not name or name == self.profile_name or name not in self._profiles:
+                continue
+            profile = self._profiles[name]
+            key = self._profile_api_key(profile)
+            if key:
+                return profile, key
+        return None
+
+    def _ttft_window(self, name):
+        win = self._ttft.get(name)
+        if win is None:
+            win = LatencyWindow(size=50)
+            self._ttft[name] = win
+        return win
+
+    def _hedge_threshold_ms(self, name):
+        win = self._ttft_window(name)
+        if len(win) < 5:
+            return self.hedge_default_ms
+        p = win.percentile(self.hedge_percentile, self.hedge_default_ms)
+        return int(max(self.hedge_min_ms, min(self.hedge_max_ms, p)))
+
+    def get_hedge_stats(self):
+        out = {
+            "enabled": self.hedge_enabled,
+            "secondary": self.hedge_profile,
+            "fired": int(self._perf.get("hedge_fired") or 0),
+            "wins": int(self._perf.get("hedge_wins") or 0),
+            "profiles": {},
+        }
+        for name, win in list(self._ttft.items()):
+            out["profiles"][name] = {
+                "samples": len(win),
+                "ttft_p50_ms": int(win.percentile(0.5, 0) or 0),
+                "ttft_p90_ms": int(win.percentile(0.9, 0) or 0),
+                "threshold_ms": self._hedge_threshold_ms(name),
+            }
+        return out
+
+    def get_http_stats(self):
+        return self._http.get_stats()
+
+    def close(self):
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(loop.stop)
+            except Exception:
+                pass
+            self._loop = None
+        try:
+            self._executor.shutdown(wait=False)
+        except Exception:
+            pass
+        try:
+            self._http.close()
+        except Exception:
+            pass
+        try:
+            self.decision_cache.flush()
+        except Exception:
+            pass
+
+    def get_cache_stats(self):
+        return self.decision_cache.get_stats()
 
     def set_profile(self, profile_name, api_key=None):
         self.switch_profile(profile_name, api_key=api_key)
 
-    def process_input(self, image_data=None, user_text=None):
+    def process_input(self, image_data=None, user_text=None, barge_in=None, partial=False):
+        """提交一轮输入。barge_in 默认对文本输入生效：取消进行中与排队的旧轮次，旧回答不再播报。
+
+        partial=True 表示静默触发的语音识别中间文本：不走本地意图快速通道（“停”可能是“停电了”的前半句，
+        且最终结果到达时会再匹配一次），动作只由最终结果或键入文本下发。
+        """
         text = str(user_text or "").strip()
+        local = None if partial else self._try_local_intent(text)
+        if barge_in is None:
+            barge_in = self.barge_in_enabled and bool(text)
         with self._lock:
-            if self.is_thinking:
-                self._pending_inputs.append({"image_data": image_data, "user_text": text})
-                Logger.info(f"AI: busy, queued input. queue_size={len(self._pending_inputs)}")
-                return
+            self._turn_gen += 1
+            turn = _Turn(self._turn_gen, image_data, text, local)
             self.is_thinking = True
-        threading.Thread(target=self._ai_thread, args=(image_data, text), daemon=True).start()
+            stt_marks, self._stt_marks = self._stt_marks, None
+        speech_end_ts, stt_final_ts = stt_marks if (stt_marks and text) else (None, None)
+        self.tracer.begin(turn.gen, self.profile_name, speech_end_ts=speech_end_ts, stt_final_ts=stt_final_ts)
+        if local:
+            self.tracer.mark(turn.gen, "action_dispatched", local[1])
+        loop = self._ensure_loop()
+        loop.call_soon_threadsafe(self._enqueue_turn, turn, bool(barge_in))
+
+    # ---------------- 事件循环 ----------------
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is not None and self._loop_thread is not None and self._loop_thread.is_alive():
+                return self._loop
+            self._loop_ready.clear()
+            loop = asyncio.new_event_loop()
+            self._loop = loop
+            self._loop_thread = threading.Thread(target=self._run_loop, args=(loop,), name="ai-loop", daemon=True)
+            self._loop_thread.start()
+        self._loop_ready.wait(2.0)
+        return loop
+
+    def _run_loop(self, loop):
+        asyncio.set_event_loop(loop)
+        loop.create_task(self._turn_worker())
+        try:
+            loop.run_forever()
+        finally:
+            try:
+                tasks = asyncio.all_tasks(loop)
+                for task in tasks:
+                    task.cancel()
+                loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+                loop.close()
+            except Exception:
+                pass
+
+    async def _turn_worker(self):
+        self._turn_signal = asyncio.Event()
+        self._loop_ready.set()
+        while True:
+            turn = self._inputs.pop()
+            if turn is None:
+                self._turn_signal.clear()
+                await self._turn_signal.wait()
+                continue
+            if turn.gen in self._cancelled_gens:
+                continue
+            self._current_turn = turn
+            self._current_task = asyncio.ensure_future(self._run_turn(turn))
+            try:
+                await self._current_task
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                Logger.error(f"AI: turn failed: {e}")
+            finally:
+                self._current_turn = None
+                self._current_task = None
+                with self._lock:
+                    self.is_thinking = not self._inputs.empty()
+
+    def _enqueue_turn(self, turn, barge_in):
+        """在事件循环线程上执行。排队中的输入与新输入合并，barge-in 只取消进行中的轮次。"""
+        if barge_in:
+            cur = self._current_turn
+            if cur is not None and self._current_task is not None and not self._current_task.done():
+                self._mark_cancelled(cur)
+                self._current_task.cancel()
+                self._perf["barge_ins"] = int(self._perf.get("barge_ins") or 0) + 1
+                Logger.info(f"AI: barge-in, cancelled turn {cur.gen}")
+                self._dispatch_cancel_on_main()
+        had_pending = not self._inputs.empty()
+        merged = self._inputs.push(turn)
+        if had_pending or self._current_turn is not None:
+            Logger.info(f"AI: busy, queued input. depth={len(self._inputs)} text={merged.user_text}")
+        self._turn_signal.set()
+
+    def get_queue_stats(self):
+        return self._inputs.get_stats()
+
+    def get_trace_stats(self, profile=None):
+        """各阶段累计耗时的 p50/p90/p99：{profile: {stage: {n, p50, p90, p99}}}。"""
+        return self.tracer.get_stats(profile)
+
+    def export_trace(self, path):
+        return self.tracer.export_json(path)
+
+    def mark_audio_out(self):
+        """TTS 开始出声时由播放线程调用。"""
+        self.tracer.mark_audio()
+
+    def _mark_cancelled(self, turn):
+        self._cancelled_gens.add(turn.gen)
+        self.tracer.cancel(turn.gen)
+        # 只保留最近的代号，避免集合无限增长
+        if len(self._cancelled_gens) > 64:
+            floor = self._turn_gen - 64
+            self._cancelled_gens = {g for g in self._cancelled_gens if g > floor}
+        turn.cancel()
+
+    def _current_gen(self):
+        return getattr(self._tls, "gen", None)
+
+    def _try_local_intent(self, text):
+        """本地匹配简单动作指令；高置信度时立即下发，返回 (IntentMatch, 下发时刻)。"""
+        if not text or self.intent_engine is None:
+            return None
+        try:
+            m = self.intent_engine.match(text)
+        except Exception:
+            return None
+        if m is None:
+            return None
+        Logger.info(f"AI Local Intent: action={m.action}, conf={m.confidence}, source={m.source}, {m.match_ms}ms")
+        self._dispatch_action_on_main(m.action, m.emotion)
+        return m, time.time()
+
+    def get_intent_stats(self):
+        if self.intent_engine is None:
+            return {}
+        return self.intent_engine.get_stats()
 
     def send_text(self, text, image_data=None):
         self.process_input(image_data=image_data, user_text=text)
@@ -221,7 +602,13 @@ class VoiceAI(EventDispatcher):
             txt = str(self._realtime_text_buf or "").strip()
             self._realtime_flush_event = None
             if txt:
-                self.send_text(txt, image_data=image_data)
+                # 静默触发的中间文本只排队合并，不打断进行中的轮次；最终结果才 barge-in
+                self.process_input(
+                    image_data=image_data,
+                    user_text=txt,
+                    barge_in=None if is_final else False,
+                    partial=not is_final,
+                )
 
         if is_final:
             Clock.schedule_once(_flush, 0)
@@ -324,6 +711,7 @@ class VoiceAI(EventDispatcher):
                                     self._perf["stt_wait_ms"] = max(0, int(listen_ms))
                                     self._perf["stt_rec_ms"] = max(0, int(rec_ms))
                                     self._perf["updated_at"] = time.time()
+                                    self._stt_marks = (rec_start, rec_start + rec_ms / 1000.0)
                                     try:
                                         Logger.info(
                                             f"AI PERF STT: wait={self._perf['stt_wait_ms']}ms rec={self._perf['stt_rec_ms']}ms"
@@ -472,6 +860,8 @@ class VoiceAI(EventDispatcher):
             self._perf["updated_at"] = now
 
             if is_final:
+                speech_end = float(self._stt_speech_end_ts or 0.0)
+                self._stt_marks = (speech_end if 0 < now - speech_end < 10.0 else None, now)
                 try:
                     Logger.info(f"AI STT(Android): {text}")
                 except Exception:
@@ -565,16 +955,13 @@ class VoiceAI(EventDispatcher):
             "stream": False,
         }
 
-        key = self._normalize_api_key(self.api_key)
-        headers = {
-            "Authorization": f"Bearer {key}",
-            "Content-Type": "application/json",
-        }
+        headers = self._auth_headers()
+        session = self._http.session(self.profile_name)
 
         last_error = None
         for url in self._candidate_chat_urls(self.profile.base_url):
             try:
-                resp = requests.post(
+                resp = session.post(
                     url,
                     headers=headers,
                     json=payload,
@@ -600,29 +987,67 @@ class VoiceAI(EventDispatcher):
         self.last_chat_error = str(last_error or "AI 连接测试失败")
         return False, self.last_chat_error
 
-    def _ai_thread(self, image_data, user_text):
+    async def _run_turn(self, turn):
+        image_data, user_text, local = turn.image_data, turn.user_text, turn.local
+        self._tls.gen = turn.gen
         try:
             if not self.enabled:
-                self._mock_response(user_text)
+                await asyncio.sleep(0.8)
+                self._mock_response(user_text, turn)
                 return
 
-            self._streamed_chars = 0
-            messages = self._build_messages(image_data=image_data, user_text=user_text)
-            raw_text, first_ms, total_ms = self._chat_stream(messages, use_vision=bool(image_data))
+            if image_data is None and self.image_provider is not None and wants_scene(user_text):
+                image_data = self._snapshot()
+                turn.image_data = image_data
+            if self._try_cached_decision(image_data, user_text, turn):
+                return
+            messages = self._build_messages(
+                image_data=image_data,
+                user_text=user_text,
+                local_action=local[0].action if local else None,
+            )
+            fut = asyncio.get_running_loop().run_in_executor(
+                self._executor, self._chat_stream, messages, bool(image_data), turn
+            )
+            try:
+                raw_text, first_ms, total_ms, connect_ms, winner = await fut
+            except asyncio.CancelledError:
+                turn.cancel()
+                raise
+            self._tls.gen = turn.gen
+            self._perf["llm_profile"] = winner
             self._perf["llm_first_ms"] = max(0, int(first_ms))
+            self._perf["llm_connect_ms"] = max(0, int(connect_ms))
+            self._perf["llm_ttft_ms"] = max(0, int(first_ms) - int(connect_ms))
+            self._perf["llm_conn_reused"] = int(connect_ms) <= 0
             self._perf["llm_total_ms"] = max(0, int(total_ms))
             self._perf["updated_at"] = time.time()
-            Logger.info(f"AI PERF LLM: first={self._perf['llm_first_ms']}ms total={self._perf['llm_total_ms']}ms")
-            result_json = self._parse_json_result(raw_text)
+            Logger.info(
+                f"AI PERF LLM: first={self._perf['llm_first_ms']}ms connect={self._perf['llm_connect_ms']}ms "
+                f"ttft={self._perf['llm_ttft_ms']}ms total={self._perf['llm_total_ms']}ms"
+            )
+            parser = turn.stream_parser
+            if parser is not None and parser.done:
+                result_json = dict(parser.fields)
+            else:
+                result_json = self._parse_json_result(raw_text)
             if not result_json:
                 Logger.error(f"AI: invalid JSON result: {raw_text}")
                 self._emit_speech_stream("我刚刚没组织好语言，再说一次好吗？")
                 return
 
-            self._append_history("user", str(user_text or ""))
-            self._append_history("assistant", str(result_json.get("speech", "")))
-            self._execute_command(result_json)
+            self._append_turn(user_text, result_json.get("speech", ""))
+            self._execute_command(result_json, turn)
+            # 本地意图轮次的 LLM 动作被强制为 none，不能作为该文本的决策缓存
+            if (user_text or image_data) and not turn.local:
+                vision = bool(image_data)
+                fp = image_fingerprint(image_data) if vision else None
+                self.decision_cache.put(self.profile_name, user_text, result_json, fp, vision=vision)
+        except _TurnCancelled:
+            return
         except Exception as e:
+            if turn.cancelled.is_set():
+                return
             self.last_chat_error = str(e)
             Logger.error(f"AI Error: {e}")
             err = str(e)
@@ -633,116 +1058,284 @@ class VoiceAI(EventDispatcher):
             else:
                 self._emit_speech_stream("网络有点卡，我的大脑短路了一下。")
         finally:
-            next_item = None
-            with self._lock:
-                if self._pending_inputs:
-                    next_item = self._pending_inputs.pop(0)
-                    self.is_thinking = True
-                else:
-                    self.is_thinking = False
-
-            if next_item is not None:
-                threading.Thread(
-                    target=self._ai_thread,
-                    args=(next_item.get("image_data"), next_item.get("user_text")),
-                    daemon=True,
-                ).start()
-
-    def _build_messages(self, image_data=None, user_text=None):
-        messages = [{"role": "system", "content": self.system_prompt}]
-        for item in self._history[-self._history_turns * 2 :]:
-            messages.append({"role": item["role"], "content": item["content"]})
+            if not turn.cancelled.is_set():
+                self.tracer.mark(turn.gen, "turn_done")
 
+    def _try_cached_decision(self, image_data, user_text, turn):
+        """命中决策缓存时直接执行缓存的决策并返回 True；视觉轮次要求画面与缓存时接近。"""
+        if not user_text and not image_data:
+            return False
+        t0 = time.time()
+        vision = bool(image_data)
+        fp = image_fingerprint(image_data) if vision else None
+        cached = self.decision_cache.get(self.profile_name, user_text, fp, vision=vision)
+        if not cached:
+            self._perf["cache_misses"] = int(self._perf.get("cache_misses") or 0) + 1
+            self._perf["last_from_cache"] = False
+            return False
+        self._perf["cache_hits"] = int(self._perf.get("cache_hits") or 0) + 1
+        self._perf["cache_hit_ms"] = int((time.time() - t0) * 1000)
+        self._perf["last_from_cache"] = True
+        self._perf["updated_at"] = time.time()
+        Logger.info(f"AI Cache Hit: text={user_text}, {self._perf['cache_hit_ms']}ms")
+        self._append_turn(user_text, cached.get("speech", ""))
+        self._execute_command(cached, turn)
+        return True
+
+    def _snapshot(self):
+        try:
+            return self.image_provider() or None
+        except Exception as e:
+            Logger.warning(f"AI: snapshot failed: {e}")
+            return None
+
+    def _build_messages(self, image_data=None, user_text=None, local_action=None):
         prompt = f"主人刚刚说：{user_text}。请像连续对话一样自然回应。" if user_text else "请根据当前画面进行一句自然回应。"
+        if local_action:
+            prompt += f"（动作 {local_action} 已在执行，action 输出 none，只需配合说话。）"
         if image_data:
             b64_img = base64.b64encode(image_data).decode("utf-8")
-            messages.append(
+            content = [
+                {"type": "text", "text": prompt},
                 {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": f"data:image/jpeg;base64,{b64_img}"},
-                        },
-                    ],
-                }
-            )
+                    "type": "image_url",
+                    "image_url": {"url": f"data:image/jpeg;base64,{b64_img}"},
+                },
+            ]
         else:
-            messages.append({"role": "user", "content": prompt})
+            content = prompt
+        messages = self.context.build(content)
+        self._perf["prompt_tokens"] = self.context.last_prompt_tokens
         return messages
 
-    def _chat_stream(self, messages, use_vision=False):
-        model = self.profile.vision_model if use_vision else self.profile.text_model
+    def get_context_stats(self):
+        return self.context.get_stats()
+
+    def _summarize_history(self, prev_summary, turns):
+        """在后台线程调用 LLM 生成滚动摘要；离线或失败时返回 None（改用本地抽取式摘要）。"""
+        if not self.enabled:
+            return None
+        lines = "\n".join(f"主人：{u}\n机器人：{r}" for u, r in turns)
         payload = {
-            "model": model,
-            "messages": messages,
-            "temperature": 0.3,
-            "max_tokens": 500,
-            "stream": True,
+            "model": self.profile.text_model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "你负责压缩对话记录。用不超过80字的中文概括要点（主人的需求、偏好、已做过的动作），只输出摘要。",
+                },
+                {"role": "user", "content": f"已有摘要：{prev_summary or '无'}\n新对话：\n{lines}"},
+            ],
+            "temperature": 0,
+            "max_tokens": 160,
+            "stream": False,
         }
+        session = self._http.session(self.profile_name)
+        for url in self._candidate_chat_urls(self.profile.base_url):
+            try:
+                resp = session.post(url, headers=self._auth_headers(), json=payload, timeout=20)
+                resp.raise_for_status()
+                data = resp.json()
+                text = (((data.get("choices") or [{}])[0]).get("message") or {}).get("content")
+                if text:
+                    return str(text).strip()
+            except Exception:
+                continue
+        return None
+
+    def _chat_stream(self, messages, use_vision=False, turn=None):
+        """流式请求当前 profile；启用对冲时，主 profile 超过阈值仍无首 token 则同时请求备用 profile，
+        先出 token 的一方胜出，另一方被取消。返回 (output, first_ms, total_ms, connect_ms, profile_name)。
+        在线程池中执行；turn 被取消时抛出 _TurnCancelled。
+        """
         key = self._normalize_api_key(self.api_key)
         if not key:
             raise RuntimeError("AI API Key 为空")
-        headers = {
-            "Authorization": f"Bearer {key}",
-            "Content-Type": "application/json",
-        }
+        self._tls.gen = turn.gen if turn is not None else None
 
-        output = ""
+        def _check_cancel():
+            if turn is not None and turn.cancelled.is_set():
+                raise _TurnCancelled()
+
+        _check_cancel()
         request_start = time.time()
-        first_piece_at = None
-        last_error = None
-        for url in self._candidate_chat_urls(self.profile.base_url):
-            try:
-                with requests.post(
-                    url,
-                    headers=headers,
-                    json=payload,
-                    stream=True,
-                    timeout=self.profile.timeout_sec,
-                ) as resp:
-                    if resp.status_code == 401:
-                        raise RuntimeError(
-                            f"401 Unauthorized: AI API 认证失败，请检查 Key/模型/服务商。url={url}"
-                        )
-                    if resp.status_code == 402:
-                        raise RuntimeError(
-                            f"402 Payment Required: 账户余额不足或未开通计费/模型权限。url={url}"
-                        )
-                    if resp.status_code == 404:
-                        raise RuntimeError(f"404 Not Found: endpoint 不存在。url={url}")
-                    resp.raise_for_status()
-                    for line in resp.iter_lines(decode_unicode=True):
-                        if not line:
-                            continue
-                        if not str(line).startswith("data:"):
-                            continue
-                        data = str(line)[5:].strip()
-                        if data == "[DONE]":
-                            break
-                        try:
-                            packet = json.loads(data)
-                        except Exception:
-                            continue
-                        delta = ((packet.get("choices") or [{}])[0]).get("delta") or {}
-                        piece = delta.get("content")
-                        if piece:
-                            if first_piece_at is None:
-                                first_piece_at = time.time()
-                            output += str(piece)
-                            self._emit_streaming_speech_from_json(output)
-                    total_ms = int((time.time() - request_start) * 1000)
-                    first_ms = int((first_piece_at - request_start) * 1000) if first_piece_at else total_ms
-                    return output, first_ms, total_ms
-            except Exception as e:
-                last_error = e
-                msg = str(e)
-                if "401" in msg or "Unauthorized" in msg or "402" in msg:
+        if turn is not None:
+            self.tracer.mark(turn.gen, "request_sent", request_start)
+        primary = _StreamAttempt(self.profile, key)
+        attempts = [primary]
+        if turn is not None:
+            turn.attempts.append(primary)
+        self._start_attempt(primary, messages, use_vision)
+
+        secondary = self._hedge_secondary()
+        winner = None
+        if secondary is not None:
+            threshold = self._hedge_threshold_ms(self.profile.name) / 1000.0
+            # 等待首 token；主请求在阈值前失败也立即切换
+            deadline = request_start + threshold
+            while not primary.first_token.is_set() and not primary.finished.is_set():
+                _check_cancel()
+                remain = deadline - time.time()
+                if remain <= 0:
                     break
+                primary.first_token.wait(min(0.05, remain))
+            if not primary.first_token.is_set():
+                profile, sec_key = secondary
+                backup = _StreamAttempt(profile, sec_key, hedged=True)
+                attempts.append(backup)
+                if turn is not None:
+                    turn.attempts.append(backup)
+                self._perf["hedge_fired"] = int(self._perf.get("hedge_fired") or 0) + 1
+                Logger.info(f"AI Hedge: {self.profile.name} no token in {int(threshold * 1000)}ms, racing {profile.name}")
+                self._start_attempt(backup, messages, use_vision)
+
+        # 先产出 token 的请求胜出；全部失败则报错
+        while winner is None:
+            _check_cancel()
+            for att in attempts:
+                if att.first_token.is_set():
+                    winner = att
+                    break
+            if winner is not None:
+                break
+            if all(att.finished.is_set() for att in attempts):
+                # 正常结束但没有内容的请求也作为结果返回
+                done = [att for att in attempts if att.error is None]
+                winner = done[0] if done else None
+                break
+            primary.first_token.wait(0.01)
+        for att in attempts:
+            if att is winner:
                 continue
+            if att.first_at is not None:
+                self._ttft_window(att.profile.name).add((att.first_at - att.started_at) * 1000.0)
+            elif not att.finished.is_set():
+                # 被取消的请求只知道下界，也计入窗口，避免分位数偏低
+                self._ttft_window(att.profile.name).add((time.time() - att.started_at) * 1000.0)
+            att.abort()
+        if winner is None:
+            errors = [att.error for att in attempts if att.error is not None]
+            raise RuntimeError(str(errors[0] if errors else "AI 请求失败"))
+        if winner.hedged:
+            self._perf["hedge_wins"] = int(self._perf.get("hedge_wins") or 0) + 1
+        if turn is not None:
+            self.tracer.set_profile(turn.gen, winner.profile.name)
+            if winner.first_at is not None:
+                self.tracer.mark(turn.gen, "first_token", winner.first_at)
+
+        parser = StreamingJSONParser()
+        if turn is None:
+            turn = _Turn(None, None, "", None)
+        turn.stream_parser = parser
+        output = ""
+        while True:
+            try:
+                kind, value = winner.q.get(timeout=0.1)
+            except queue.Empty:
+                _check_cancel()
+                continue
+            _check_cancel()
+            if kind == "piece":
+                output += value
+                self._on_stream_delta(turn, parser, value)
+            elif kind == "reset":
+                # 当前 URL 中途失败、换下一个候选 URL 重新开始
+                output = ""
+                parser = StreamingJSONParser()
+                turn.stream_parser = parser
+            elif kind == "error":
+                raise value
+            elif kind == "cancel":
+                raise _TurnCancelled()
+            else:
+                break
 
-        raise RuntimeError(str(last_error or "AI 请求失败"))
+        total_ms = int((time.time() - request_start) * 1000)
+        first_ms = int((winner.first_at - request_start) * 1000) if winner.first_at else total_ms
+        if winner.first_at is not None:
+            self._ttft_window(winner.profile.name).add((winner.first_at - winner.started_at) * 1000.0)
+        return output, first_ms, total_ms, winner.connect_ms, winner.profile.name
+
+    def _start_attempt(self, attempt, messages, use_vision):
+        self._executor.submit(self._run_attempt, attempt, messages, use_vision)
+
+    def _run_attempt(self, attempt, messages, use_vision):
+        profile = attempt.profile
+        model = profile.vision_model if use_vision else profile.text_model
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": 0.3,
+            "max_tokens": 500,
+            "stream": True,
+        }
+        headers = self._auth_headers(attempt.api_key)
+        session = self._http.session(profile.name)
+
+        last_error = None
+        self._http.begin_request()
+        try:
+            for url in self._candidate_chat_urls(profile.base_url):
+                if attempt.cancel.is_set():
+                    return
+                if attempt.first_at is not None:
+                    attempt.q.put(("reset", None))
+                try:
+                    with session.post(
+                        url,
+                        headers=headers,
+                        json=payload,
+                        stream=True,
+                        timeout=profile.timeout_sec,
+                    ) as resp:
+                        attempt.resp = resp
+                        if resp.status_code == 401:
+                            raise RuntimeError(
+                                f"401 Unauthorized: AI API 认证失败，请检查 Key/模型/服务商。url={url}"
+                            )
+                        if resp.status_code == 402:
+                            raise RuntimeError(
+                                f"402 Payment Required: 账户余额不足或未开通计费/模型权限。url={url}"
+                            )
+                        if resp.status_code == 404:
+                            raise RuntimeError(f"404 Not Found: endpoint 不存在。url={url}")
+                        resp.raise_for_status()
+                        attempt.connect_ms, _ = self._http.end_request()
+                        for line in resp.iter_lines(decode_unicode=True):
+                            if attempt.cancel.is_set():
+                                return
+                            if not line:
+                                continue
+                            if not str(line).startswith("data:"):
+                                continue
+                            data = str(line)[5:].strip()
+                            if data == "[DONE]":
+                                break
+                            try:
+                                packet = json.loads(data)
+                            except Exception:
+                                continue
+                            delta = ((packet.get("choices") or [{}])[0]).get("delta") or {}
+                            piece = delta.get("content")
+                            if piece:
+                                if attempt.first_at is None:
+                                    attempt.first_at = time.time()
+                                attempt.q.put(("piece", str(piece)))
+                                attempt.first_token.set()
+                        attempt.q.put(("done", None))
+                        return
+                except Exception as e:
+                    if attempt.cancel.is_set():
+                        return
+                    last_error = e
+                    msg = str(e)
+                    if "401" in msg or "Unauthorized" in msg or "402" in msg:
+                        break
+                    continue
+            attempt.error = RuntimeError(str(last_error or "AI 请求失败"))
+            attempt.q.put(("error", attempt.error))
+        finally:
+            attempt.resp = None
+            attempt.finished.set()
 
     def get_latency_snapshot(self):
         try:
@@ -752,10 +1345,27 @@ class VoiceAI(EventDispatcher):
                 "stt_wait_ms": 0,
                 "stt_rec_ms": 0,
                 "llm_first_ms": 0,
+                "llm_connect_ms": 0,
+                "llm_ttft_ms": 0,
+                "llm_conn_reused": False,
                 "llm_total_ms": 0,
+                "llm_profile": "",
+                "hedge_fired": 0,
+                "hedge_wins": 0,
+                "cache_hits": 0,
+                "cache_misses": 0,
+                "cache_hit_ms": 0,
+                "last_from_cache": False,
                 "updated_at": 0.0,
             }
 
+    def _auth_headers(self, api_key=None):
+        key = self._normalize_api_key(api_key if api_key is not None else self.api_key)
+        return {
+            "Authorization": f"Bearer {key}",
+            "Content-Type": "application/json",
+        }
+
     def _candidate_chat_urls(self, base_url):
         base = str(base_url or "").rstrip("/")
         if not base:
@@ -773,15 +1383,23 @@ class VoiceAI(EventDispatcher):
             s = s[1:-1].strip()
         return s
 
-    def _emit_streaming_speech_from_json(self, text):
-        speech = self._extract_speech_partial(text)
-        if not speech:
-            return
-        if len(speech) <= self._streamed_chars:
+    def _on_stream_delta(self, turn, parser, piece):
+        """每个增量只解析一次：speech 新字符立即播报，action/emotion 闭合后立即下发动作。"""
+        for kind, key, value in parser.feed(piece):
+            if kind == "chars" and key == "speech":
+                turn.streamed_chars += len(value)
+                self._dispatch_speech_on_main(value)
+            elif kind == "field" and key in ("action", "emotion"):
+                self._maybe_dispatch_early_action(turn, parser.fields)
+
+    def _maybe_dispatch_early_action(self, turn, fields):
+        if turn.early_action_sent or "action" not in fields or "emotion" not in fields:
             return
-        chunk = speech[self._streamed_chars :]
-        self._streamed_chars = len(speech)
-        self._dispatch_speech_on_main(chunk)
+        turn.early_action_sent = True
+        action = self._resolve_turn_action(str(fields.get("action") or "none"), turn)
+        emotion = str(fields.get("emotion") or "normal")
+        Logger.info(f"AI Early Action: action={action}, emotion={emotion}")
+        self._dispatch_action_on_main(action, emotion)
 
     def _parse_json_result(self, text):
         json_text = self._extract_json_object(text)
@@ -799,31 +1417,48 @@ class VoiceAI(EventDispatcher):
             return ""
         return text[start : end + 1]
 
-    def _extract_speech_partial(self, text):
-        m = re.search(r'"speech"\s*:\s*"((?:\\.|[^"\\])*)', text)
-        if not m:
-            return ""
-        raw = m.group(1)
-        try:
-            return json.loads(f'"{raw}"')
-        except Exception:
-            return raw.replace("\\n", "\n").replace('\\"', '"')
-
-    def _execute_command(self, data):
+    def _execute_command(self, data, turn):
         action = str(data.get("action", "none") or "none")
         emotion = str(data.get("emotion", "normal") or "normal")
         speech = str(data.get("speech", "") or "")
 
         Logger.info(f"AI Decision: action={action}, emotion={emotion}, speech={speech}")
-        self._dispatch_action_on_main(action, emotion)
+        if not turn.early_action_sent:
+            # 流式阶段未下发时在此下发
+            self._dispatch_action_on_main(self._resolve_turn_action(action, turn), emotion)
+
+        if speech and turn.streamed_chars < len(speech):
+            self._dispatch_speech_on_main(speech[turn.streamed_chars :])
+
+    def _resolve_turn_action(self, llm_action, turn):
+        """本轮动作已由本地意图下发时不重复执行，并记录 LLM 的判断与节省的时间。
 
-        if speech:
-            if self._streamed_chars < len(speech):
-                self._dispatch_speech_on_main(speech[self._streamed_chars :])
-            self._streamed_chars = 0
+        LLM 给出 stop 或与本地不同的动作时以 LLM 为准：先 stop 抢占本地动作，再执行 LLM 的动作；
+        本地已判定为 stop 时不被覆盖。
+        """
+        local = turn.local
+        if not local:
+            return llm_action
+        match, sent_at = local
+        if not turn.local_recorded and self.intent_engine is not None:
+            turn.local_recorded = True
+            saved_ms = (time.time() - sent_at) * 1000.0 if self.enabled else None
+            self.intent_engine.record_outcome(match.action, llm_action, saved_ms=saved_ms)
+        # 本地 stop 不被覆盖（安全优先）
+        if llm_action in ("none", match.action) or match.action == "stop":
+            return "none"
+        Logger.info(f"AI: LLM overrides local intent {match.action} -> {llm_action}")
+        if llm_action != "stop":
+            self._dispatch_action_on_main("stop", "normal")
+        return llm_action
+
+    def _dispatch_action_on_main(self, action, emotion, gen=None):
+        gen = self._current_gen() if gen is None else gen
 
-    def _dispatch_action_on_main(self, action, emotion):
         def _do(_dt):
+            if gen is not None and gen in self._cancelled_gens:
+                return
+            self.tracer.mark(gen, "action_dispatched")
             try:
                 self.dispatch("on_action_command", action, emotion)
             except Exception as e:
@@ -831,11 +1466,17 @@ class VoiceAI(EventDispatcher):
 
         Clock.schedule_once(_do, 0)
 
-    def _dispatch_speech_on_main(self, text):
+    def _dispatch_speech_on_main(self, text, gen=None):
         if not text:
             return
+        gen = self._current_gen() if gen is None else gen
+        # 在调度前登记，保证 turn_done 时追踪器已知道本轮需要等待出声
+        self.tracer.note_speech(gen)
 
         def _do(_dt):
+            # 已被打断的轮次不再播报
+            if gen is not None and gen in self._cancelled_gens:
+                return
             try:
                 self.dispatch("on_speech_output", text)
             except Exception as e:
@@ -843,12 +1484,21 @@ class VoiceAI(EventDispatcher):
 
         Clock.schedule_once(_do, 0)
 
-    def _append_history(self, role, content):
-        item = {"role": str(role), "content": str(content)}
-        self._history.append(item)
-        max_items = self._history_turns * 2
-        if len(self._history) > max_items:
-            self._history = self._history[-max_items:]
+    def _dispatch_cancel_on_main(self):
+        def _do(_dt):
+            try:
+                self.dispatch("on_turn_cancelled")
+            except Exception as e:
+                Logger.error(f"AI: cancel dispatch failed: {e}")
+
+        Clock.schedule_once(_do, 0)
+
+    def _append_turn(self, user_text, reply):
+        self.context.add_turn(str(user_text or ""), str(reply or ""))
+        try:
+            self.context.maybe_compact(self._executor.submit, self._summarize_history)
+        except Exception as e:
+            Logger.warning(f"AI: context compaction failed: {e}")
 
     def _emit_speech_stream(self, text, chunk_size=2, interval=0.06):
         if not text:
@@ -856,19 +1506,20 @@ class VoiceAI(EventDispatcher):
         text = str(text)
         chunks = [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
         state = {"idx": 0}
+        gen = self._current_gen()
+        self.tracer.note_speech(gen)
 
         def _tick(_dt):
             i = state["idx"]
             if i >= len(chunks):
                 return False
-            self._dispatch_speech_on_main(chunks[i])
+            self._dispatch_speech_on_main(chunks[i], gen=gen)
             state["idx"] += 1
             return state["idx"] < len(chunks)
 
         Clock.schedule_interval(_tick, interval)
 
-    def _mock_response(self, text):
-        time.sleep(0.8)
+    def _mock_response(self, text, turn):
         mock_data = {
             "thought": "离线模拟模式",
             "speech": f"听到你说：{text}，我现在离线。",
@@ -882,7 +1533,7 @@ class VoiceAI(EventDispatcher):
                 mock_data.update({"action": "stop", "speech": "收到，我先停下。", "emotion": "normal"})
             elif "点头" in text:
                 mock_data.update({"action": "nod", "speech": "明白，我点点头。", "emotion": "wink"})
-        self._execute_command(mock_data)
+        self._execute_command(mock_data, turn)
 
     def _load_profiles(self, config_path=None):
         defaults = {
@@ -926,6 +1577,7 @@ class VoiceAI(EventDispatcher):
         try:
             with open(cfg_path, "r", encoding="utf-8") as f:
                 data = json.load(f)
+            self._hedge_cfg = dict(data.get("hedge") or {})
             profiles_data = data.get("profiles") or {}
             out = dict(defaults)
             for key, value in profiles_data.items():
@@ -936,6 +1588,9 @@ class VoiceAI(EventDispatcher):
                     vision_model=str(value.get("vision_model") or defaults.get(key, defaults["deepseek"]).vision_model),
                     api_key_env=str(value.get("api_key_env") or defaults.get(key, defaults["deepseek"]).api_key_env),
                     timeout_sec=int(value.get("timeout_sec") or defaults.get(key, defaults["deepseek"]).timeout_sec),
+                    context_tokens=int(
+                        value.get("context_tokens") or defaults.get(key, defaults["deepseek"]).context_tokens
+                    ),
                 )
             default_profile = str(data.get("default_profile") or "deepseek")
             return out, default_profile
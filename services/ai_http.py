@@ -0,0 +1,219 @@
+"""
+AI HTTP 连接池
+
+每个模型 profile 一个 requests.Session（keep-alive 连接池），避免每轮对话都重新做
+DNS、TCP 与 TLS 握手：
+
+- prewarm(): 后台提前建立连接（启动时与切换 profile 时调用）
+- 后台线程对空闲超过 keepalive_sec 的会话发送轻量请求，防止服务端/NAT 关闭空闲连接
+- 统计新建连接耗时：复用连接时 connect_ms 为 0，可与首 token 时间分开观察
+
+使用：
+    pool = SessionPool()
+    pool.prewarm('deepseek', 'https://api.deepseek.com', headers)
+    pool.begin_request()
+    resp = pool.session('deepseek').post(url, json=payload, stream=True)
+    connect_ms, new_conns = pool.end_request()
+"""
+
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# 当前线程内新建连接的累计耗时（连接建立发生在发起请求的线程上）
+_conn_local = threading.local()
+
+
+def _record_connect(ms):
+    _conn_local.connect_ms = getattr(_conn_local, 'connect_ms', 0.0) + ms
+    _conn_local.new_conns = getattr(_conn_local, 'new_conns', 0) + 1
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        t0 = time.perf_counter()
+        super().connect()
+        _record_connect((time.perf_counter() - t0) * 1000.0)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        t0 = time.perf_counter()
+        super().connect()
+        _record_connect((time.perf_counter() - t0) * 1000.0)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+class LatencyWindow:
+    """最近 N 次耗时的滑动窗口，用于按 profile 统计首 token 时间分位数。"""
+
+    def __init__(self, size=50):
+        self._values = deque(maxlen=max(1, int(size)))
+        self._lock = threading.Lock()
+
+    def add(self, ms):
+        with self._lock:
+            self._values.append(float(ms))
+
+    def __len__(self):
+        return len(self._values)
+
+    def percentile(self, q, default=None):
+        with self._lock:
+            values = sorted(self._values)
+        if not values:
+            return default
+        idx = min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))
+        return values[idx]
+
+
+class _Entry:
+    def __init__(self, session, base_url, headers):
+        self.session = session
+        self.base_url = base_url
+        self.headers = dict(headers or {})
+        self.last_used = 0.0
+        self.prewarm_ms = 0
+        self.pings = 0
+        self.ping_failures = 0
+
+
+class SessionPool:
+    def __init__(self, pool_maxsize=4, keepalive_sec=25.0, ping_timeout=5.0):
+        self.pool_maxsize = max(1, int(pool_maxsize))
+        self.keepalive_sec = float(keepalive_sec)
+        self.ping_timeout = float(ping_timeout)
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---------------- 会话 ----------------
+    def _entry(self, name, base_url=None, headers=None):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                session = requests.Session()
+                adapter = _TimedAdapter(pool_connections=2, pool_maxsize=self.pool_maxsize)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                entry = _Entry(session, base_url, headers)
+                self._entries[name] = entry
+            else:
+                if base_url:
+                    entry.base_url = base_url
+                if headers:
+                    entry.headers = dict(headers)
+            return entry
+
+    def session(self, name, base_url=None, headers=None):
+        entry = self._entry(name, base_url, headers)
+        entry.last_used = time.monotonic()
+        return entry.session
+
+    def begin_request(self):
+        """在发起请求的线程上调用，清零该线程的建连统计。"""
+        _conn_local.connect_ms = 0.0
+        _conn_local.new_conns = 0
+
+    def end_request(self):
+        """返回 (connect_ms, new_conns)：本线程自 begin_request 以来新建连接的耗时与数量。"""
+        return int(getattr(_conn_local, 'connect_ms', 0.0)), int(getattr(_conn_local, 'new_conns', 0))
+
+    # ---------------- 预热与保活 ----------------
+    def prewarm(self, name, base_url, headers=None, wait=False):
+        """后台建立到 base_url 的连接；wait=True 时同步执行并返回耗时（ms）。"""
+        entry = self._entry(name, base_url, headers)
+        self._ensure_keepalive()
+        if wait:
+            return self._ping(entry)
+        threading.Thread(target=self._ping, args=(entry,), daemon=True).start()
+        return None
+
+    def _ping(self, entry):
+        if not entry.base_url:
+            return None
+        self.begin_request()
+        t0 = time.perf_counter()
+        try:
+            # 任何响应（包括 401/404）都会保留连接；只关心握手
+            resp = entry.session.get(
+                entry.base_url.rstrip('/') + '/models',
+                headers=entry.headers,
+                timeout=self.ping_timeout,
+            )
+            resp.close()
+            entry.pings += 1
+        except Exception:
+            entry.ping_failures += 1
+            return None
+        ms = int((time.perf_counter() - t0) * 1000)
+        connect_ms, new_conns = self.end_request()
+        if new_conns:
+            entry.prewarm_ms = connect_ms
+        entry.last_used = time.monotonic()
+        return ms
+
+    def _ensure_keepalive(self):
+        if self.keepalive_sec <= 0:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._keepalive_loop, name='ai-keepalive', daemon=True)
+            self._thread.start()
+
+    def _keepalive_loop(self):
+        interval = max(1.0, self.keepalive_sec / 4.0)
+        while not self._stop.wait(interval):
+            now = time.monotonic()
+            with self._lock:
+                entries = list(self._entries.values())
+            for entry in entries:
+                if entry.last_used and now - entry.last_used >= self.keepalive_sec:
+                    self._ping(entry)
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            try:
+                entry.session.close()
+            except Exception:
+                pass
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                name: {
+                    'prewarm_connect_ms': e.prewarm_ms,
+                    'pings': e.pings,
+                    'ping_failures': e.ping_failures,
+                    'idle_sec': round(time.monotonic() - e.last_used, 1) if e.last_used else None,
+                }
+                for name, e in self._entries.items()
+            }
@@ -24,6 +24,11 @@ class BalanceController:
             self.gain_p = 5.0
             self.gain_r = 3.8
 
+        # 舵机执行延迟（秒）：总线发送 + 舵机响应。控制循环按此时长外推 IMU 姿态，
+        # 使补偿对准指令真正生效的时刻；设为 0 则直接使用最新样本
+        self.actuation_latency_s = 0.04
+        self.last_imu_age_ms = -1.0
+
     def compute(self, pitch, roll, yaw):
         """
         输入: 陀螺仪实时角度 (度)
@@ -74,12 +79,17 @@ class BalanceController:
         return targets
 
     # ------------------ 实时控制循环 ------------------
-    def start_loop(self, servo_manager, imu_reader, period=0.05):
+    def start_loop(self, servo_manager, imu_reader, period=0.05, gait=None):
         """启动控制循环：定期读取 IMU，计算舵机目标并发送同步位置指令
 
+        独立线程直接写总线，仅用于脱离应用主循环的场景（台架调试）；应用内由 _update_loop
+        统一下发，二者不可同时运行。
+
         servo_manager: UartServoManager 实例
-        imu_reader: IMUReader 或其他实现 get_orientation() 的对象
+        imu_reader: IMUReader 或其他实现 get_orientation() 的对象；
+                    若提供 predict_orientation() 则按 actuation_latency_s 做延迟补偿
         period: 控制周期（秒）
+        gait: GaitEngine（可选），步态偏移与平衡补偿在同一周期内合并
         """
         if hasattr(self, '_loop_running') and self._loop_running:
             return
@@ -89,24 +99,18 @@ class BalanceController:
         # 用于限制日志输出频率
         log_counter = [0]
 
+        self.gait = gait
+
         def _loop():
+            last_t = time.monotonic()
             while self._loop_running:
                 try:
-                    pitch, roll, yaw = imu_reader.get_orientation()
-                    targets = self.compute(pitch, roll, yaw)
-
-                    # 只向已知舵机发送指令
-                    servo_ids = []
-                    pos_list = []
-                    for sid, pos in targets.items():
-                        if sid in servo_manager.servo_info_dict:
-                            servo_ids.append(sid)
-                            pos_list.append(int(pos))
+                    now = time.monotonic()
+                    dt = now - last_t
+                    last_t = now
+                    pitch, roll, yaw, servo_ids = self.step(servo_manager, imu_reader, dt, period)
 
                     if servo_ids:
-                        runtime_ms = max(30, int(period * 1000))
-                        servo_manager.sync_set_position(servo_ids, pos_list, [runtime_ms] * len(servo_ids))
-                        
                         # 每隔 10 次循环打印一次日志（约 0.5 秒一次）
                         log_counter[0] += 1
                         if log_counter[0] % 10 == 0:
@@ -124,6 +128,44 @@ class BalanceController:
         self._loop_thread = threading.Thread(target=_loop, daemon=True)
         self._loop_thread.start()
 
+    def step(self, servo_manager, imu_reader, dt, period=0.05):
+        """单个控制周期：读取 IMU、计算补偿、合并步态偏移并同步下发。
+
+        供 start_loop 的独立控制线程使用；应用主循环与离线回放走 services/servo_sync.py。
+        返回 (pitch, roll, yaw, servo_ids)。
+        """
+        pitch, roll, yaw = self._read_imu(imu_reader)
+        targets = self.compute(pitch, roll, yaw)
+        gait_engine = getattr(self, 'gait', None)
+        if gait_engine is not None:
+            gait_engine.apply(targets, dt)
+
+        # 只向已知舵机发送指令
+        servo_ids = []
+        pos_list = []
+        for sid, pos in targets.items():
+            if sid in servo_manager.servo_info_dict:
+                servo_ids.append(sid)
+                pos_list.append(int(pos))
+
+        if servo_ids:
+            runtime_ms = max(30, int(period * 1000))
+            servo_manager.sync_set_position(servo_ids, pos_list, [runtime_ms] * len(servo_ids))
+        return pitch, roll, yaw, servo_ids
+
+    def _read_imu(self, imu_reader):
+        latency = float(getattr(self, 'actuation_latency_s', 0.0) or 0.0)
+        try:
+            sample = imu_reader.get_sample() if hasattr(imu_reader, 'get_sample') else None
+            if sample is not None:
+                import time
+                self.last_imu_age_ms = (time.monotonic() - sample[0]) * 1000.0
+            if latency > 0 and hasattr(imu_reader, 'predict_orientation'):
+                return imu_reader.predict_orientation(latency)
+        except Exception:
+            pass
+        return imu_reader.get_orientation()
+
     def stop_loop(self):
         if hasattr(self, '_loop_running') and self._loop_running:
             self._loop_running = False
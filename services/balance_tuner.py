@@ -0,0 +1,449 @@
+"""
+BalanceTuner
+
+离线平衡参数自动调优：在倾角扰动轨迹上仿真闭环响应，搜索 gain_p / gain_r 与主循环的
+重算阈值（sync_compute_pose_threshold_deg / sync_compute_idle_period），结果写入 balance_tuning.json。
+
+被控对象（每轴独立的倾角响应模型，单位：度）：
+    θ'' = -ωn² θ - 2ζωn θ' + d(t) - k_act · u
+- d(t)：扰动角加速度（合成：阶跃/冲击/摆动/噪声；或由录制的 IMU 倾角换算）
+- u：舵机实际补偿量（位置单位），以一阶惯性 tau_act 跟随指令
+- 指令由 BalanceController.compute() 计算（与实机相同的混合与取整），
+  输入为带延迟与噪声的测量倾角，重算时机按主循环的阈值/空闲周期规则决定
+
+代价 = 倾角 RMS + 控制量 + 总线负载（每秒重算次数）+ 跌倒惩罚；权重见 DEFAULT_WEIGHTS。
+
+搜索方式：
+- grid：网格穷举
+- es：对角协方差的 (μ, λ) 进化策略（CMA 风格的简化版）
+候选评估通过 ProcessPoolExecutor 分发到多核，纯 Python 实现，可在无界面的 Linux 主机上运行。
+
+结果默认写入本机应用加载的 <user_data_dir>/balance_tuning.json（与 Kivy App.user_data_dir 规则一致）；
+最优候选不优于当前参数时不写入。手机端需把文件复制到应用目录，例如：
+    adb push balance_tuning.json /sdcard/balance_tuning.json
+    adb shell run-as <package> cp /sdcard/balance_tuning.json files/balance_tuning.json
+
+使用：
+    python -m services.balance_tuner --method es --generations 20
+    python -m services.balance_tuner --method grid --traces recordings/session_xxx_000.rbsr --out balance_tuning.json
+"""
+
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import List
+
+from .balance_ctrl import BalanceController
+
+# 参数搜索范围：(下限, 上限)
+PARAM_BOUNDS = {
+    'gain_p': (0.5, 14.0),
+    'gain_r': (0.5, 14.0),
+    'sync_compute_pose_threshold_deg': (0.05, 1.0),
+    'sync_compute_idle_period': (0.1, 0.6),
+}
+PARAM_NAMES = tuple(PARAM_BOUNDS.keys())
+
+DEFAULT_WEIGHTS = {
+    'tilt': 1.0,        # 倾角 RMS（度）
+    'effort': 0.002,    # 控制量 RMS（位置单位）
+    'bus': 0.01,        # 每秒重算/下发次数
+    'fall': 100.0,      # 跌倒惩罚
+}
+
+
+@dataclass
+class PlantModel:
+    omega_n: float = 8.0          # 固有频率 rad/s（脚掌支撑的柔性）
+    zeta: float = 0.25            # 阻尼比
+    k_act: float = 12.0           # 每个位置单位补偿对应的角加速度（度/s²）
+    tau_act: float = 0.05         # 舵机跟随时间常数（秒）
+    latency: float = 0.03         # 测量 + 总线延迟（秒）
+    noise_deg: float = 0.05       # 测量噪声标准差（度）
+    loop_period: float = 0.1      # 主循环周期（秒），与 init_runtime_loops 一致
+    fall_deg: float = 25.0        # 超过该倾角视为跌倒
+    dt: float = 0.005             # 仿真步长（秒）
+
+
+@dataclass
+class Trace:
+    name: str
+    dt: float
+    # 每步的 (pitch 扰动, roll 扰动) 角加速度，度/s²
+    disturbance: List[tuple] = field(default_factory=list)
+
+
+def synthetic_traces(duration=8.0, dt=0.005, seed=0, count=4):
+    """生成合成扰动：阶跃推力、短冲击、步态摆动与随机噪声的组合。"""
+    rng = random.Random(seed)
+    traces = []
+    n = int(duration / dt)
+    for k in range(count):
+        dist = []
+        step_t = rng.uniform(0.5, 2.0)
+        step_p = rng.uniform(-60.0, 60.0)
+        step_r = rng.uniform(-40.0, 40.0)
+        kicks = [(rng.uniform(1.0, duration - 0.5), rng.uniform(-800.0, 800.0), rng.uniform(-600.0, 600.0)) for _ in range(3)]
+        sway_f = rng.uniform(0.6, 1.4)
+        sway_a = rng.uniform(20.0, 80.0)
+        for i in range(n):
+            t = i * dt
+            dp = step_p if t >= step_t else 0.0
+            dr = step_r if t >= step_t else 0.0
+            for kt, kp, kr in kicks:
+                if kt <= t < kt + 0.05:
+                    dp += kp
+                    dr += kr
+            dp += sway_a * math.sin(2 * math.pi * sway_f * t)
+            dr += 0.6 * sway_a * math.cos(2 * math.pi * sway_f * t)
+            dp += rng.gauss(0.0, 5.0)
+            dr += rng.gauss(0.0, 5.0)
+            dist.append((dp, dr))
+        traces.append(Trace(name=f'synthetic-{seed}-{k}', dt=dt, disturbance=dist))
+    return traces
+
+
+def traces_from_session(paths, plant, dt=0.005):
+    """把录制的 IMU 倾角换算为扰动：d = ωn² · θ_rec（复现录制中出现的倾斜幅度与频谱）。"""
+    from .session_recorder import load_session
+
+    imu = load_session(paths)['imu']
+    ts = list(imu['ts'])
+    if len(ts) < 2:
+        return []
+    pitch = list(imu['pitch'])
+    roll = list(imu['roll'])
+    w2 = plant.omega_n ** 2
+    dist = []
+    j = 0
+    t = ts[0]
+    while t <= ts[-1]:
+        while j + 1 < len(ts) and ts[j + 1] <= t:
+            j += 1
+        dist.append((w2 * pitch[j], w2 * roll[j]))
+        t += dt
+    name = os.path.basename(paths[0] if isinstance(paths, (list, tuple)) else paths)
+    return [Trace(name=f'session-{name}', dt=dt, disturbance=dist)]
+
+
+def simulate(params, trace, plant, seed=0):
+    """在单条扰动轨迹上仿真闭环响应，返回指标字典。"""
+    bc = BalanceController({}, is_landscape=True)
+    bc.gain_p = float(params['gain_p'])
+    bc.gain_r = float(params['gain_r'])
+    threshold = float(params['sync_compute_pose_threshold_deg'])
+    idle = max(0.05, float(params['sync_compute_idle_period']))
+    neutral_p = bc.neutral[15]
+    neutral_r = bc.neutral[18]
+
+    rng = random.Random(seed)
+    dt = trace.dt
+    w2 = plant.omega_n ** 2
+    c = 2.0 * plant.zeta * plant.omega_n
+    delay_steps = max(0, int(round(plant.latency / dt)))
+    loop_steps = max(1, int(round(plant.loop_period / dt)))
+    alpha = dt / (plant.tau_act + dt) if plant.tau_act > 0 else 1.0
+
+    th_p = th_r = 0.0
+    w_p = w_r = 0.0
+    u_p = u_r = 0.0          # 舵机实际补偿
+    cmd_p = cmd_r = 0.0      # 最近下发的指令
+    hist = [(0.0, 0.0)] * (delay_steps + 1)
+    last_cp = last_cr = None
+    last_compute_t = -1e9
+    computes = 0
+    sq_tilt = 0.0
+    sq_u = 0.0
+    max_tilt = 0.0
+    fell = False
+    n = len(trace.disturbance)
+
+    for i in range(n):
+        t = i * dt
+        hist.append((th_p, th_r))
+        hist.pop(0)
+        if i % loop_steps == 0:
+            mp = hist[0][0] + rng.gauss(0.0, plant.noise_deg)
+            mr = hist[0][1] + rng.gauss(0.0, plant.noise_deg)
+            changed = (
+                last_cp is None
+                or abs(mp - last_cp) >= threshold
+                or abs(mr - last_cr) >= threshold
+            )
+            if changed or (t - last_compute_t) >= idle:
+                targets = bc.compute(mp, mr, 0.0)
+                cmd_p = float(targets[15] - neutral_p)
+                cmd_r = float(targets[18] - neutral_r)
+                last_cp, last_cr = mp, mr
+                last_compute_t = t
+                computes += 1
+
+        u_p += (cmd_p - u_p) * alpha
+        u_r += (cmd_r - u_r) * alpha
+        dp, dr = trace.disturbance[i]
+        a_p = -w2 * th_p - c * w_p + dp - plant.k_act * u_p
+        a_r = -w2 * th_r - c * w_r + dr - plant.k_act * u_r
+        w_p += a_p * dt
+        w_r += a_r * dt
+        th_p += w_p * dt
+        th_r += w_r * dt
+
+        tilt = math.sqrt(th_p * th_p + th_r * th_r)
+        sq_tilt += tilt * tilt
+        sq_u += u_p * u_p + u_r * u_r
+        if tilt > max_tilt:
+            max_tilt = tilt
+        if tilt > plant.fall_deg:
+            fell = True
+            break
+
+    steps = max(1, i + 1)
+    duration = n * dt
+    return {
+        'rms_tilt': math.sqrt(sq_tilt / steps),
+        'max_tilt': max_tilt,
+        'rms_effort': math.sqrt(sq_u / steps),
+        'computes_per_s': computes / max(dt, steps * dt),
+        'fell': fell,
+        'fell_at': (i * dt) if fell else None,
+        'duration': duration,
+    }
+
+
+def score(metrics, weights):
+    cost = (
+        weights['tilt'] * metrics['rms_tilt']
+        + weights['effort'] * metrics['rms_effort']
+        + weights['bus'] * metrics['computes_per_s']
+    )
+    if metrics['fell']:
+        # 越早跌倒惩罚越大
+        frac = (metrics['fell_at'] or 0.0) / max(1e-6, metrics['duration'])
+        cost += weights['fall'] * (2.0 - frac)
+    return cost
+
+
+def evaluate(job):
+    """进程池任务：(params, traces, plant, weights) -> (cost, params, 平均指标)。必须是模块级函数以便 pickle。"""
+    params, traces, plant, weights = job
+    total = 0.0
+    agg = {'rms_tilt': 0.0, 'max_tilt': 0.0, 'rms_effort': 0.0, 'computes_per_s': 0.0, 'falls': 0}
+    for k, tr in enumerate(traces):
+        m = simulate(params, tr, plant, seed=k)
+        total += score(m, weights)
+        agg['rms_tilt'] += m['rms_tilt']
+        agg['max_tilt'] = max(agg['max_tilt'], m['max_tilt'])
+        agg['rms_effort'] += m['rms_effort']
+        agg['computes_per_s'] += m['computes_per_s']
+        agg['falls'] += int(m['fell'])
+    n = max(1, len(traces))
+    for key in ('rms_tilt', 'rms_effort', 'computes_per_s'):
+        agg[key] = round(agg[key] / n, 4)
+    agg['max_tilt'] = round(agg['max_tilt'], 3)
+    return total / n, params, agg
+
+
+def _clip(name, value):
+    lo, hi = PARAM_BOUNDS[name]
+    return max(lo, min(hi, value))
+
+
+def grid_candidates(steps=6):
+    """网格候选：增益取 steps 档，阈值与空闲周期各取 3 档。"""
+    def _lin(name, k):
+        lo, hi = PARAM_BOUNDS[name]
+        return [lo + (hi - lo) * i / (k - 1) for i in range(k)] if k > 1 else [(lo + hi) / 2.0]
+
+    out = []
+    for gp in _lin('gain_p', steps):
+        for gr in _lin('gain_r', steps):
+            for th in _lin('sync_compute_pose_threshold_deg', 3):
+                for idle in _lin('sync_compute_idle_period', 3):
+                    out.append({
+                        'gain_p': round(gp, 3),
+                        'gain_r': round(gr, 3),
+                        'sync_compute_pose_threshold_deg': round(th, 3),
+                        'sync_compute_idle_period': round(idle, 3),
+                    })
+    return out
+
+
+class BalanceTuner:
+    def __init__(self, traces, plant=None, weights=None, workers=None):
+        self.traces = list(traces)
+        self.plant = plant or PlantModel()
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        self.evaluations = 0
+        self.history = []
+
+    def _evaluate_many(self, pool, candidates):
+        jobs = [(c, self.traces, self.plant, self.weights) for c in candidates]
+        chunk = max(1, len(jobs) // (self.workers * 4))
+        results = list(pool.map(evaluate, jobs, chunksize=chunk))
+        self.evaluations += len(results)
+        self.history.extend(results)
+        return results
+
+    def run_grid(self, steps=6):
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            return sorted(self._evaluate_many(pool, grid_candidates(steps)), key=lambda r: r[0])
+
+    def run_es(self, start=None, generations=20, population=None, seed=0):
+        """对角协方差 (μ, λ) 进化策略：按精英样本的加权均值与方差更新搜索分布。"""
+        rng = random.Random(seed)
+        lam = int(population or max(8, 4 * self.workers))
+        mu = max(2, lam // 4)
+        wts = [math.log(mu + 0.5) - math.log(i + 1) for i in range(mu)]
+        s = sum(wts)
+        wts = [w / s for w in wts]
+
+        mean = {}
+        sigma = {}
+        for name in PARAM_NAMES:
+            lo, hi = PARAM_BOUNDS[name]
+            mean[name] = _clip(name, float((start or {}).get(name, (lo + hi) / 2.0)))
+            sigma[name] = (hi - lo) * 0.3
+
+        results = []
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for _gen in range(int(generations)):
+                cands = []
+                for _ in range(lam):
+                    cands.append({name: round(_clip(name, rng.gauss(mean[name], sigma[name])), 4) for name in PARAM_NAMES})
+                gen = sorted(self._evaluate_many(pool, cands), key=lambda r: r[0])
+                results.extend(gen)
+                elite = [r[1] for r in gen[:mu]]
+                for name in PARAM_NAMES:
+                    new_mean = sum(w * e[name] for w, e in zip(wts, elite))
+                    var = sum(w * (e[name] - mean[name]) ** 2 for w, e in zip(wts, elite))
+                    lo, hi = PARAM_BOUNDS[name]
+                    # 方差平滑更新并设下限，避免过早收敛
+                    sigma[name] = max((hi - lo) * 0.01, 0.7 * sigma[name] + 0.3 * math.sqrt(var))
+                    mean[name] = _clip(name, new_mean)
+        return sorted(results, key=lambda r: r[0])
+
+
+def write_tuning(path, params, extra=None):
+    """把最优参数合并写入 balance_tuning.json（保留轴映射等其他字段）。"""
+    data = {}
+    try:
+        with open(path, 'r', encoding='utf8') as f:
+            data = json.load(f)
+    except Exception:
+        data = {}
+    data['gain_p'] = round(float(params['gain_p']), 3)
+    data['gain_r'] = round(float(params['gain_r']), 3)
+    data['sync_compute_pose_threshold_deg'] = round(float(params['sync_compute_pose_threshold_deg']), 3)
+    data['sync_compute_idle_period'] = round(float(params['sync_compute_idle_period']), 3)
+    if extra:
+        data.update(extra)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def app_tuning_path(app_name='robotdashboard'):
+    """桌面端应用加载的 balance_tuning.json 路径（RobotDashboardApp 的 user_data_dir）。"""
+    if sys.platform.startswith('win'):
+        base = os.environ.get('APPDATA') or os.path.expanduser('~')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Application Support')
+    else:
+        base = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+    return os.path.join(base, app_name, 'balance_tuning.json')
+
+
+def _current_params(path):
+    base = {'gain_p': 5.5, 'gain_r': 4.2, 'sync_compute_pose_threshold_deg': 0.2, 'sync_compute_idle_period': 0.22}
+    try:
+        with open(path, 'r', encoding='utf8') as f:
+            obj = json.load(f)
+        for k in base:
+            if k in obj:
+                base[k] = float(obj[k])
+    except Exception:
+        pass
+    return base
+
+
+def main(argv=None):
+    import argparse
+
+    ap = argparse.ArgumentParser(description='离线平衡参数自动调优')
+    ap.add_argument('--method', choices=('grid', 'es'), default='es')
+    ap.add_argument('--traces', nargs='*', default=[], help='.rbsr 录制文件；不提供时使用合成扰动')
+    ap.add_argument('--synthetic', type=int, default=None,
+                    help='合成扰动轨迹条数；默认提供 --traces 时为 0，否则为 4（显式指定时与录制轨迹混合）')
+    ap.add_argument('--duration', type=float, default=8.0, help='合成轨迹时长（秒）')
+    ap.add_argument('--grid-steps', type=int, default=6)
+    ap.add_argument('--generations', type=int, default=20)
+    ap.add_argument('--population', type=int, default=None)
+    ap.add_argument('--workers', type=int, default=None, help='进程数（默认 CPU 核数）')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--latency', type=float, default=None, help='覆盖模型延迟（秒）')
+    ap.add_argument('--out', default=app_tuning_path(),
+                    help='写入的 balance_tuning.json（默认本机应用的 user_data_dir，手机端需复制过去）')
+    ap.add_argument('--report', default=None, help='报告路径（默认与 --out 同目录 balance_tuning_report.json）')
+    ap.add_argument('--dry-run', action='store_true', help='只打印结果，不写文件')
+    args = ap.parse_args(argv)
+
+    plant = PlantModel()
+    if args.latency is not None:
+        plant.latency = float(args.latency)
+    traces = traces_from_session(args.traces, plant, dt=plant.dt) if args.traces else []
+    synthetic = args.synthetic if args.synthetic is not None else (0 if args.traces else 4)
+    if synthetic > 0:
+        traces += synthetic_traces(duration=args.duration, dt=plant.dt, seed=args.seed, count=synthetic)
+    if not traces:
+        raise SystemExit('没有可用的扰动轨迹')
+
+    tuner = BalanceTuner(traces, plant=plant, workers=args.workers)
+    baseline_params = _current_params(args.out)
+    baseline = evaluate((baseline_params, traces, plant, tuner.weights))
+
+    t0 = time.perf_counter()
+    if args.method == 'grid':
+        ranked = tuner.run_grid(steps=args.grid_steps)
+    else:
+        ranked = tuner.run_es(start=baseline_params, generations=args.generations, population=args.population, seed=args.seed)
+    elapsed = time.perf_counter() - t0
+
+    best_cost, best_params, best_metrics = ranked[0]
+    report = {
+        'method': args.method,
+        'workers': tuner.workers,
+        'evaluations': tuner.evaluations,
+        'elapsed_s': round(elapsed, 2),
+        'evals_per_s': round(tuner.evaluations / elapsed, 1) if elapsed > 0 else 0.0,
+        'traces': [t.name for t in traces],
+        'plant': asdict(plant),
+        'weights': tuner.weights,
+        'baseline': {'cost': round(baseline[0], 4), 'params': baseline_params, 'metrics': baseline[2]},
+        'improved': best_cost < baseline[0],
+        'best': {'cost': round(best_cost, 4), 'params': best_params, 'metrics': best_metrics},
+        'top': [{'cost': round(c, 4), 'params': p, 'metrics': m} for c, p, m in ranked[:10]],
+    }
+    print(json.dumps(report['best'], ensure_ascii=False, indent=2))
+    print(f"baseline cost={report['baseline']['cost']} -> best cost={report['best']['cost']} "
+          f"({tuner.evaluations} evals, {report['evals_per_s']}/s, {tuner.workers} workers)")
+    if not args.dry_run:
+        if report['improved']:
+            write_tuning(args.out, best_params)
+        else:
+            print(f'no improvement over current parameters, {args.out} left unchanged')
+        report_path = args.report or os.path.join(os.path.dirname(os.path.abspath(args.out)), 'balance_tuning_report.json')
+        os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+        with open(report_path, 'w', encoding='utf8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"written: {args.out + ', ' if report['improved'] else ''}{report_path}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
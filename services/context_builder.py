@@ -0,0 +1,192 @@
+"""
+ContextBuilder
+
+按 token 预算组装对话上下文：
+
+- 本地快速估算 token（CJK 约 1 字 1 token，其余约 4 字符 1 token，另加每条消息开销）
+- 组装顺序固定：系统提示 -> 滚动摘要 -> 历史轮次（旧到新）-> 本轮输入。
+  旧轮次不是每轮从头部挤掉一条，而是攒够后一次性压缩进摘要，
+  因此相邻两轮的前缀保持一致，便于服务端前缀缓存命中
+- 历史超过压缩阈值时，在后台线程把较旧的一半轮次生成摘要（不在请求关键路径上），
+  摘要完成前照常使用完整历史；超出预算时临时丢弃最旧轮次兜底
+- 记录每轮的提示 token 估算值
+
+使用：
+    ctx = ContextBuilder(system_prompt, budget_tokens=3000)
+    messages = ctx.build(user_content)
+    ctx.add_turn(user_text, reply)
+    ctx.maybe_compact(executor.submit, summarizer)
+    ctx.last_prompt_tokens
+"""
+
+import re
+import threading
+
+_CJK_RE = re.compile(r"[　-〿㐀-䶿一-鿿＀-￯]")
+
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text):
+    """快速估算 token 数（不依赖分词器）。"""
+    if not text:
+        return 0
+    text = str(text)
+    cjk = len(_CJK_RE.findall(text))
+    other = len(text) - cjk
+    return cjk + (other + 3) // 4
+
+
+def local_summary(turns, max_chars=160):
+    """无 LLM 可用时的抽取式摘要：保留每轮主人输入与回答的开头。"""
+    parts = []
+    for user, reply in turns:
+        u = str(user or "").strip()[:24]
+        r = str(reply or "").strip()[:16]
+        if u or r:
+            parts.append(f"主人：{u} / 我：{r}")
+    text = "；".join(parts)
+    return text[-max_chars:]
+
+
+class ContextBuilder:
+    def __init__(self, system_prompt, budget_tokens=3000, reserve_tokens=500, max_turns=8,
+                 compact_ratio=0.6, image_tokens=800):
+        """
+        budget_tokens: 提示总预算（不含输出）
+        reserve_tokens: 为本轮输入预留的余量
+        max_turns: 历史轮次上限，超过即触发压缩
+        compact_ratio: 历史 token 超过 (budget - reserve) * compact_ratio 时触发后台压缩
+        image_tokens: 一张图片按固定 token 计入
+        """
+        self.system_prompt = system_prompt
+        self.budget_tokens = int(budget_tokens)
+        self.reserve_tokens = int(reserve_tokens)
+        self.max_turns = max(1, int(max_turns))
+        self.compact_ratio = float(compact_ratio)
+        self.image_tokens = int(image_tokens)
+
+        self._lock = threading.Lock()
+        self._turns = []          # [(user, reply, tokens)]
+        self.summary = ""
+        self._compacting = False
+
+        self.last_prompt_tokens = 0
+        self.last_dropped_turns = 0
+        self.compactions = 0
+
+    # ---------------- 组装 ----------------
+    def _message_tokens(self, content):
+        if isinstance(content, list):
+            total = 0
+            for part in content:
+                if part.get("type") == "text":
+                    total += estimate_tokens(part.get("text"))
+                else:
+                    total += self.image_tokens
+            return total + MESSAGE_OVERHEAD
+        return estimate_tokens(content) + MESSAGE_OVERHEAD
+
+    def build(self, user_content):
+        """返回 messages 列表；user_content 为字符串或多模态 content 列表。"""
+        with self._lock:
+            turns = list(self._turns)
+            summary = self.summary
+
+        messages = [{"role": "system", "content": self.system_prompt}]
+        used = self._message_tokens(self.system_prompt)
+        if summary:
+            summary_msg = f"此前对话摘要：{summary}"
+            messages.append({"role": "system", "content": summary_msg})
+            used += self._message_tokens(summary_msg)
+        current = self._message_tokens(user_content)
+
+        # 超出预算时从最旧的轮次开始丢弃（兜底；正常情况下由压缩控制长度）
+        available = self.budget_tokens - used - current
+        history_tokens = sum(t for _, _, t in turns)
+        dropped = 0
+        while turns and history_tokens > available:
+            history_tokens -= turns[0][2]
+            turns.pop(0)
+            dropped += 1
+
+        for user, reply, _ in turns:
+            messages.append({"role": "user", "content": user})
+            messages.append({"role": "assistant", "content": reply})
+        messages.append({"role": "user", "content": user_content})
+
+        self.last_prompt_tokens = used + history_tokens + current
+        self.last_dropped_turns = dropped
+        return messages
+
+    # ---------------- 历史 ----------------
+    def add_turn(self, user, reply):
+        user = str(user or "")
+        reply = str(reply or "")
+        tokens = self._message_tokens(user) + self._message_tokens(reply)
+        with self._lock:
+            self._turns.append((user, reply, tokens))
+
+    def history_tokens(self):
+        with self._lock:
+            return sum(t for _, _, t in self._turns)
+
+    def needs_compaction(self):
+        with self._lock:
+            if self._compacting or len(self._turns) < 2:
+                return False
+            tokens = sum(t for _, _, t in self._turns)
+            limit = max(self.budget_tokens * 0.3, (self.budget_tokens - self.reserve_tokens) * self.compact_ratio)
+            return len(self._turns) > self.max_turns or tokens > limit
+
+    def maybe_compact(self, submit, summarizer=None):
+        """需要时在后台把较旧的一半轮次压缩进摘要。submit(fn) 为线程池提交函数。"""
+        if not self.needs_compaction():
+            return False
+        with self._lock:
+            self._compacting = True
+            n = max(1, len(self._turns) // 2)
+            old = [(u, r) for u, r, _ in self._turns[:n]]
+            prev = self.summary
+        try:
+            submit(self._compact, n, old, prev, summarizer)
+        except Exception:
+            with self._lock:
+                self._compacting = False
+            return False
+        return True
+
+    def _compact(self, n, old, prev, summarizer):
+        text = None
+        if summarizer is not None:
+            try:
+                text = summarizer(prev, old)
+            except Exception:
+                text = None
+        if not text:
+            text = local_summary(old)
+            if prev:
+                text = (prev + "；" + text)[-240:].lstrip("；")
+        with self._lock:
+            # 压缩期间新增的轮次保留在后面，只移除已被摘要的前 n 轮
+            self._turns = self._turns[n:]
+            self.summary = str(text).strip()
+            self._compacting = False
+            self.compactions += 1
+
+    def clear(self):
+        with self._lock:
+            self._turns = []
+            self.summary = ""
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "prompt_tokens": self.last_prompt_tokens,
+                "history_turns": len(self._turns),
+                "history_tokens": sum(t for _, _, t in self._turns),
+                "summary_tokens": estimate_tokens(self.summary),
+                "budget_tokens": self.budget_tokens,
+                "dropped_turns": self.last_dropped_turns,
+                "compactions": self.compactions,
+            }
@@ -0,0 +1,224 @@
+"""
+DecisionCache
+
+AI 决策缓存：问候、状态询问、重复指令等常见输入直接复用上次的决策 JSON
+（speech/emotion/action），省去一次付费 LLM 调用与 1~3 s 延迟。
+
+- 键：profile + 归一化用户文本；视觉轮次额外保存画面指纹（dHash），
+  画面变化超过阈值（汉明距离）时视为未命中，不复用旧决策
+- 键不含对话历史，因此回答依赖时间或上下文的输入（“现在几点”“刚才说的”“继续”）既不查也不存，
+  见 is_context_free()
+- LRU 淘汰 + 条目数上限 + TTL 过期
+- 持久化为 JSON（原子替换写入），重启后继续生效
+
+使用：
+    cache = DecisionCache('ai_cache.json')
+    fp = image_fingerprint(jpeg_bytes)        # 无 OpenCV 时返回 None（视觉轮次不缓存）
+    hit = cache.get('deepseek', '你好', fp)    # dict 或 None
+    cache.put('deepseek', '你好', decision, fp)
+    cache.flush()
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import cv2
+    import numpy as np
+except Exception:
+    cv2 = None
+    np = None
+
+_NORM_RE = re.compile(r"[\s,，。.!！?？~～、;；:：\"'“”‘’…]+")
+
+_FIELDS = ("speech", "emotion", "action")
+
+# 出现这些词时回答随时间或对话上下文变化，不能按文本复用
+_CONTEXT_WORDS = (
+    "今天", "明天", "昨天", "现在", "几点", "时间", "日期", "星期", "周几", "天气",
+    "刚才", "刚刚", "上次", "之前", "前面", "继续", "再来", "再说", "还有", "然后",
+    "那个", "它", "他", "她", "我们聊",
+)
+
+
+def normalize_text(text):
+    return _NORM_RE.sub("", str(text or "").strip().lower())
+
+
+def is_context_free(text):
+    """文本输入的回答是否与时间/对话历史无关（可按文本缓存）。"""
+    norm = normalize_text(text)
+    return not any(w in norm for w in _CONTEXT_WORDS)
+
+
+def image_fingerprint(image_data):
+    """JPEG 字节 -> 64 位差值哈希（dHash）；无法解码时返回 None。"""
+    if not image_data or cv2 is None:
+        return None
+    try:
+        buf = np.frombuffer(image_data, dtype=np.uint8)
+        img = cv2.imdecode(buf, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+        if img is None:
+            return None
+        small = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (small[:, 1:] > small[:, :-1]).flatten()
+        value = 0
+        for b in bits:
+            value = (value << 1) | int(b)
+        return value
+    except Exception:
+        return None
+
+
+def _hamming(a, b):
+    return bin(int(a) ^ int(b)).count("1")
+
+
+class DecisionCache:
+    def __init__(self, path=None, max_entries=256, ttl_sec=6 * 3600, max_image_distance=6, save_interval=5.0):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_sec = float(ttl_sec)
+        self.max_image_distance = int(max_image_distance)
+        self.save_interval = float(save_interval)
+        self._lock = threading.Lock()
+        self._items = OrderedDict()     # key -> {"decision", "fp", "ts"}
+        self._dirty = False
+        self._last_save = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.image_mismatches = 0
+        self.expired = 0
+        self.evictions = 0
+        self.skipped_context = 0
+        self._load()
+
+    @staticmethod
+    def make_key(profile, text, vision):
+        return f"{profile}|{'v' if vision else 't'}|{normalize_text(text)}"
+
+    # ---------------- 查询/写入 ----------------
+    def get(self, profile, text, image_fp=None, vision=False):
+        """返回缓存的决策 dict；视觉轮次需提供画面指纹且与缓存画面足够接近。"""
+        if vision and image_fp is None:
+            return None
+        if not is_context_free(text):
+            with self._lock:
+                self.skipped_context += 1
+            return None
+        key = self.make_key(profile, text, vision)
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            if self.ttl_sec > 0 and now - item["ts"] > self.ttl_sec:
+                del self._items[key]
+                self._dirty = True
+                self.expired += 1
+                self.misses += 1
+                return None
+            if vision:
+                fp = item.get("fp")
+                if fp is None or _hamming(fp, image_fp) > self.max_image_distance:
+                    self.image_mismatches += 1
+                    self.misses += 1
+                    return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return dict(item["decision"])
+
+    def put(self, profile, text, decision, image_fp=None, vision=False):
+        if vision and image_fp is None:
+            return False
+        if not isinstance(decision, dict) or not decision.get("speech"):
+            return False
+        if not is_context_free(text):
+            return False
+        key = self.make_key(profile, text, vision)
+        entry = {
+            "decision": {k: str(decision.get(k) or "") for k in _FIELDS},
+            "fp": image_fp,
+            "ts": time.time(),
+        }
+        with self._lock:
+            self._items[key] = entry
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                self.evictions += 1
+            self._dirty = True
+            due = time.time() - self._last_save >= self.save_interval
+        if due:
+            self.flush()
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._dirty = True
+        self.flush()
+
+    # ---------------- 持久化 ----------------
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return
+        now = time.time()
+        items = sorted((data.get("items") or {}).items(), key=lambda kv: float(kv[1].get("ts") or 0))
+        for key, entry in items:
+            ts = float(entry.get("ts") or 0)
+            if self.ttl_sec > 0 and now - ts > self.ttl_sec:
+                continue
+            if not isinstance(entry.get("decision"), dict):
+                continue
+            self._items[key] = {"decision": entry["decision"], "fp": entry.get("fp"), "ts": ts}
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def flush(self):
+        if not self.path:
+            return False
+        with self._lock:
+            if not self._dirty:
+                return True
+            data = {"version": 1, "items": dict(self._items)}
+            self._dirty = False
+            self._last_save = time.time()
+        tmp = f"{self.path}.tmp"
+        try:
+            parent = os.path.dirname(self.path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            return True
+        except Exception:
+            with self._lock:
+                self._dirty = True
+            return False
+
+    def get_stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / float(total), 3) if total else 0.0,
+                "image_mismatches": self.image_mismatches,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "skipped_context": self.skipped_context,
+            }
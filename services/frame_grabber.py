@@ -0,0 +1,139 @@
+"""
+FrameGrabber
+
+桌面摄像头采集线程：阻塞的 capture.read() 在独立线程中执行，读入预分配的帧缓冲池，
+并以“最新帧”方式交给 UI 线程；UI 来不及取走的旧帧直接被覆盖（计为丢帧）。
+
+缓冲池至少 3 块：一块为已发布的最新帧，一块可能正被 UI 读取，其余供采集线程写入，
+因此采集线程永远不会覆盖 UI 正在使用的内存。
+
+frame_callback(frame) 在采集线程上调用，帧为只读共享数据，回调内不得修改或长期持有。
+
+使用：
+    grabber = FrameGrabber(cv2.VideoCapture(0))
+    grabber.start()
+    item = grabber.take_latest()     # (seq, frame, ts) 或 None（无新帧）
+    grabber.get_stats()
+    grabber.stop()
+"""
+
+import threading
+import time
+
+
+class FrameGrabber:
+    def __init__(self, capture, pool_size=3, frame_callback=None):
+        self.capture = capture
+        self.pool_size = max(3, int(pool_size))
+        self.frame_callback = frame_callback
+
+        self._pool = [None] * self.pool_size
+        self._lock = threading.Lock()
+        self._latest = None          # (slot, seq, ts)
+        self._in_use = None          # UI 当前持有的 slot
+        self._seq = 0
+        self._taken_seq = 0
+        self._running = False
+        self._thread = None
+
+        self._frames = 0
+        self._dropped = 0
+        self._read_failures = 0
+        self._fps = 0.0
+        self._read_ms = 0.0
+        self._callback_ms = 0.0
+        self._last_frame_t = 0.0
+
+    # ---------------- 生命周期 ----------------
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name='frame-grabber', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._running
+
+    # ---------------- 采集线程 ----------------
+    def _free_slot(self):
+        with self._lock:
+            busy = {self._in_use}
+            if self._latest is not None:
+                busy.add(self._latest[0])
+        for i in range(self.pool_size):
+            if i not in busy:
+                return i
+        return 0
+
+    def _loop(self):
+        while self._running:
+            slot = self._free_slot()
+            buf = self._pool[slot]
+            t0 = time.perf_counter()
+            try:
+                # 传入预分配缓冲区；尺寸匹配时 OpenCV 直接写入，避免每帧分配
+                ret, frame = self.capture.read(buf) if buf is not None else self.capture.read()
+            except Exception:
+                ret, frame = False, None
+            t1 = time.perf_counter()
+            if not ret or frame is None:
+                self._read_failures += 1
+                time.sleep(0.01)
+                continue
+            # 后端未复用缓冲区（首帧或分辨率变化）时，以新数组替换该槽
+            self._pool[slot] = frame
+
+            cb = self.frame_callback
+            if cb is not None:
+                try:
+                    cb(frame)
+                except Exception:
+                    pass
+            t2 = time.perf_counter()
+
+            with self._lock:
+                self._seq += 1
+                if self._latest is not None and self._latest[1] > self._taken_seq:
+                    self._dropped += 1
+                self._latest = (slot, self._seq, time.monotonic())
+
+            self._frames += 1
+            if self._last_frame_t > 0:
+                inst = 1.0 / max(1e-6, t2 - self._last_frame_t)
+                self._fps = inst if self._fps <= 0 else (0.9 * self._fps + 0.1 * inst)
+            self._last_frame_t = t2
+            self._read_ms = 0.9 * self._read_ms + 0.1 * (t1 - t0) * 1000.0
+            self._callback_ms = 0.9 * self._callback_ms + 0.1 * (t2 - t1) * 1000.0
+
+    # ---------------- UI 线程 ----------------
+    def take_latest(self):
+        """取出最新帧 (seq, frame, ts)；自上次取出后没有新帧时返回 None。
+
+        返回的帧在下一次 take_latest() 之前不会被采集线程覆盖。
+        """
+        with self._lock:
+            latest = self._latest
+            if latest is None or latest[1] <= self._taken_seq:
+                return None
+            slot, seq, ts = latest
+            self._in_use = slot
+            self._taken_seq = seq
+            return seq, self._pool[slot], ts
+
+    def get_stats(self):
+        return {
+            'frames': self._frames,
+            'fps': round(self._fps, 1),
+            'dropped': self._dropped,
+            'read_failures': self._read_failures,
+            'read_ms': round(self._read_ms, 2),
+            'callback_ms': round(self._callback_ms, 2),
+        }
@@ -0,0 +1,151 @@
+"""
+GaitEngine
+
+连续步态引擎：根据速度指令（前进/转向/停止）在控制循环内逐帧采样预计算的相位查找表，
+输出髋、膝、踝、臂的偏移量。应用中由主循环 _update_loop 与 BalanceController.compute()
+的补偿合并后经同一次 move_sync 下发（总线上只有一个写入方）。
+
+要点：
+- 相位表在构造时一次性生成，每帧只做整数索引查表，不再调用 math.sin
+- set_command() 只做一次元组赋值，不阻塞调用方；幅值在一个步态周期内平滑过渡到新指令
+- 指令回零且幅值收敛后相位归零，停在中立站姿
+- set_command(steps=N) 走完 N 步（每半个周期一步）后自动停止；不指定时持续行走直到 stop()
+
+使用：
+    gait = GaitEngine()
+    targets = gait.apply(balance.compute(pitch, roll, yaw), dt)   # 每个控制周期
+    gait.set_command(forward=1.0)   # 前进
+    gait.set_command(forward=1.0, steps=2)   # 走两步后自动停止
+    gait.set_command(turn=-0.5)     # 原地右转
+    gait.stop()
+"""
+
+import math
+
+TABLE_BITS = 8
+TABLE_SIZE = 1 << TABLE_BITS
+TABLE_MASK = TABLE_SIZE - 1
+
+# 通用正弦表，Walker 等旧实现也可复用
+SIN_TABLE = tuple(math.sin(2 * math.pi * i / TABLE_SIZE) for i in range(TABLE_SIZE))
+
+
+def _build_tables():
+    hip = SIN_TABLE
+    # 左腿在前半周期抬起，右腿在后半周期抬起
+    lift_l = tuple(max(0.0, s) for s in SIN_TABLE)
+    lift_r = tuple(max(0.0, -s) for s in SIN_TABLE)
+    # 侧向重心转移比摆腿超前 90°，保证抬腿时重心已移到支撑腿
+    sway = tuple(math.cos(2 * math.pi * i / TABLE_SIZE) for i in range(TABLE_SIZE))
+    return {'hip': hip, 'lift_l': lift_l, 'lift_r': lift_r, 'sway': sway}
+
+
+class GaitEngine:
+    # 关节 ID（与 MotionController.JOINT 一致）
+    L_HIP, R_HIP = 14, 20
+    L_THIGH, R_THIGH = 15, 21
+    L_THIGH_ROT, R_THIGH_ROT = 16, 22
+    L_KNEE, R_KNEE = 17, 23
+    L_ANKLE_LR, R_ANKLE_LR = 18, 24
+    L_ANKLE_FB, R_ANKLE_FB = 19, 25
+    L_ARM, R_ARM = 3, 8
+
+    def __init__(self, cycle_hz=1.0, step_size=220, lift_height=180, turn_size=140, sway=60, arm_ratio=0.8):
+        self.cycle_hz = float(cycle_hz)
+        self.step_size = float(step_size)      # 髋关节摆动幅度（位置单位）
+        self.lift_height = float(lift_height)  # 膝关节抬起幅度
+        self.turn_size = float(turn_size)      # 大腿旋转幅度（转向）
+        self.sway = float(sway)                # 脚踝左右重心转移幅度
+        self.arm_ratio = float(arm_ratio)
+
+        self._tables = _build_tables()
+        self._cmd = (0.0, 0.0)       # (forward, turn)，由其他线程整体替换
+        self._forward = 0.0          # 当前幅值（平滑后）
+        self._turn = 0.0
+        self._phase = 0.0            # [0, 1)
+        self._steps_left = None      # 剩余步数；None 为不限
+
+    # ---------------- 指令 ----------------
+    def set_command(self, forward=0.0, turn=0.0, steps=None):
+        """设置速度指令，范围 [-1, 1]；steps 为走完后自动停止的步数。线程安全、立即返回。"""
+        f = max(-1.0, min(1.0, float(forward)))
+        t = max(-1.0, min(1.0, float(turn)))
+        self._steps_left = max(1, int(steps)) if steps else None
+        self._cmd = (f, t)
+
+    def stop(self):
+        self._cmd = (0.0, 0.0)
+        self._steps_left = None
+
+    def reset(self):
+        """立即清零指令与幅值（主循环未运行、无法平滑收敛时使用）。"""
+        self.stop()
+        self._forward = 0.0
+        self._turn = 0.0
+        self._phase = 0.0
+
+    @property
+    def command(self):
+        return self._cmd
+
+    @property
+    def is_active(self):
+        f, t = self._cmd
+        return bool(f or t or abs(self._forward) > 1e-3 or abs(self._turn) > 1e-3)
+
+    # ---------------- 控制循环 ----------------
+    def step(self, dt):
+        """推进 dt 秒并返回 {servo_id: offset}。静止时返回空字典。"""
+        cmd_f, cmd_t = self._cmd
+        # 每秒最多变化 2*cycle_hz：从满速前进到满速后退恰好一个周期
+        max_delta = 2.0 * self.cycle_hz * max(0.0, dt)
+        self._forward += max(-max_delta, min(max_delta, cmd_f - self._forward))
+        self._turn += max(-max_delta, min(max_delta, cmd_t - self._turn))
+
+        activity = max(abs(self._forward), abs(self._turn))
+        if activity < 1e-3 and not (cmd_f or cmd_t):
+            self._forward = 0.0
+            self._turn = 0.0
+            self._phase = 0.0
+            return {}
+
+        prev_half = int(self._phase * 2.0)
+        self._phase = (self._phase + dt * self.cycle_hz) % 1.0
+        if self._steps_left is not None and int(self._phase * 2.0) != prev_half:
+            self._steps_left -= 1
+            if self._steps_left <= 0:
+                self.stop()
+        idx = int(self._phase * TABLE_SIZE) & TABLE_MASK
+        tb = self._tables
+
+        swing = tb['hip'][idx] * self.step_size * self._forward
+        rot = tb['hip'][idx] * self.turn_size * self._turn
+        lift_l = tb['lift_l'][idx] * self.lift_height * activity
+        lift_r = tb['lift_r'][idx] * self.lift_height * activity
+        sway = tb['sway'][idx] * self.sway * activity
+        arm = swing * self.arm_ratio
+
+        return {
+            self.L_HIP: int(swing),
+            self.R_HIP: int(-swing),
+            self.L_THIGH_ROT: int(rot),
+            self.R_THIGH_ROT: int(rot),
+            self.L_THIGH: int(-lift_l * 0.5),
+            self.R_THIGH: int(-lift_r * 0.5),
+            self.L_KNEE: int(lift_l),
+            self.R_KNEE: int(lift_r),
+            # 脚腕前后抵消髋摆，保持脚掌放平
+            self.L_ANKLE_FB: int(-swing * 0.5),
+            self.R_ANKLE_FB: int(swing * 0.5),
+            self.L_ANKLE_LR: int(sway),
+            self.R_ANKLE_LR: int(sway),
+            self.L_ARM: int(-arm),
+            self.R_ARM: int(arm),
+        }
+
+    def apply(self, targets, dt):
+        """将本帧步态偏移叠加到绝对目标位置（就地修改并返回）。"""
+        for sid, off in self.step(dt).items():
+            if sid in targets:
+                targets[sid] = max(0, min(4095, int(targets[sid] + off)))
+        return targets
@@ -0,0 +1,230 @@
+"""
+HeadTracker
+
+头部视觉伺服：把颜色跟踪的像素质心转换为颈部 yaw/pitch 目标，闭环跟随目标。
+
+- PD 控制：误差为目标相对画面中心的归一化偏差（-1..1），按视场角换算为舵机位置增量
+- 延迟补偿：用误差变化率把误差外推到 latency_s 之后（帧采集 -> 舵机到位的总延迟）
+- 每帧以较短的 runtime_ms 下发颈部目标：send_fn(yaw, pitch, runtime_ms) 决定走控制循环还是
+  MotionController.set_head（未提供时直接 set_head）
+- 眼睛（RobotFace.look_at）直接看向剩余误差，头部随后跟上
+- pause_fn 返回 True（动作执行器正在执行点头/摇头等动作）时暂停颈部下发、只动眼睛，
+  避免与动作序列交错写颈部舵机；动作结束后从中位重新开始跟随
+- 统计从帧时间戳到指令下发的回路延迟
+
+使用：
+    head = HeadTracker(motion_controller, look_fn=face.look_at)
+    head.update(cx, cy, frame_w, frame_h, frame_ts)   # 在视觉工作线程每帧调用
+    head.get_stats()
+"""
+
+import threading
+import time
+
+# 4096 位置 / 360 度
+POS_PER_DEG = 4096.0 / 360.0
+
+
+class HeadTracker:
+    def __init__(self, motion_controller, look_fn=None, kp=0.5, kd=0.04, latency_s=0.08,
+                 fov_deg=(60.0, 45.0), yaw_limit=450, pitch_limit=250, max_step=60,
+                 deadband=0.03, runtime_ms=60, yaw_sign=-1, pitch_sign=1, lost_timeout=1.0, pause_fn=None,
+                 send_fn=None):
+        """
+        motion_controller: MotionController（使用 set_head 下发颈部目标）
+        look_fn: 眼睛注视回调 look_fn(x_norm, y_norm)，通常为 RobotFace.look_at（需自行切回 UI 线程）
+        fov_deg: 相机水平/垂直视场角，用于像素误差 -> 角度换算
+        yaw_limit/pitch_limit: 颈部相对中位的最大偏移（位置单位）
+        max_step: 单次更新的最大位置增量
+        yaw_sign/pitch_sign: 舵机方向与图像方向的对应关系，装配不同时取反
+        pause_fn: 返回 True 时暂停颈部下发（通常为“动作执行器忙”）
+        send_fn: 颈部目标下发函数 send_fn(yaw_offset, pitch_offset, runtime_ms) -> bool；
+                 控制循环在写总线时由它交给循环统一下发，回路延迟统计到交接时刻
+        """
+        self.mc = motion_controller
+        self.look_fn = look_fn
+        self.kp = float(kp)
+        self.kd = float(kd)
+        self.latency_s = float(latency_s)
+        self.fov_deg = (float(fov_deg[0]), float(fov_deg[1]))
+        self.yaw_limit = int(yaw_limit)
+        self.pitch_limit = int(pitch_limit)
+        self.max_step = int(max_step)
+        self.deadband = float(deadband)
+        self.runtime_ms = int(runtime_ms)
+        self.yaw_sign = -1 if yaw_sign < 0 else 1
+        self.pitch_sign = -1 if pitch_sign < 0 else 1
+        self.lost_timeout = float(lost_timeout)
+        self.pause_fn = pause_fn
+        self.send_fn = send_fn
+
+        self._lock = threading.Lock()
+        self.yaw_offset = 0.0
+        self.pitch_offset = 0.0
+        self._prev_err = None
+        self._prev_ts = None
+        self._last_seen = 0.0
+        self._paused = False
+
+        self._updates = 0
+        self._paused_frames = 0
+        self._commands = 0
+        self._lost = 0
+        self._latency_ms = 0.0
+        self._max_latency_ms = 0.0
+        self._rate_hz = 0.0
+        self._last_cmd_t = 0.0
+
+    def reset(self):
+        with self._lock:
+            self.yaw_offset = 0.0
+            self.pitch_offset = 0.0
+            self._prev_err = None
+            self._prev_ts = None
+        if not self._check_paused():
+            self._send(0.0, 0.0, time.monotonic(), runtime_ms=400)
+        self._look(0.0, 0.0)
+
+    # ---------------- 控制 ----------------
+    def update(self, cx, cy, frame_w, frame_h, frame_ts=None):
+        """处理一帧的跟踪结果；cx/cy 为 None 表示当帧无目标。frame_ts 为帧采集时的 time.monotonic()。"""
+        now = time.monotonic()
+        ts = now if frame_ts is None else frame_ts
+        self._updates += 1
+
+        found = cx is not None and cy is not None and frame_w and frame_h
+        if found:
+            ex = (float(cx) - frame_w / 2.0) / (frame_w / 2.0)
+            ey = (float(cy) - frame_h / 2.0) / (frame_h / 2.0)
+
+        if self._check_paused():
+            # 动作执行中只动眼睛，颈部交给动作序列
+            if found:
+                self._look(ex, ey)
+            return False
+
+        if not found:
+            self._on_lost(now, ts)
+            return False
+
+        self._last_seen = now
+
+        with self._lock:
+            if self._prev_err is not None and self._prev_ts is not None and ts > self._prev_ts:
+                dt = ts - self._prev_ts
+                dex = (ex - self._prev_err[0]) / dt
+                dey = (ey - self._prev_err[1]) / dt
+            else:
+                dex = dey = 0.0
+            self._prev_err = (ex, ey)
+            self._prev_ts = ts
+
+            # 延迟补偿：误差外推到指令实际生效的时刻
+            px = ex + dex * self.latency_s
+            py = ey + dey * self.latency_s
+            if abs(px) < self.deadband:
+                px = 0.0
+            if abs(py) < self.deadband:
+                py = 0.0
+
+            # 归一化误差 -> 角度 -> 位置增量
+            yaw_err = px * (self.fov_deg[0] / 2.0) * POS_PER_DEG
+            pitch_err = py * (self.fov_deg[1] / 2.0) * POS_PER_DEG
+            yaw_rate = dex * (self.fov_deg[0] / 2.0) * POS_PER_DEG
+            pitch_rate = dey * (self.fov_deg[1] / 2.0) * POS_PER_DEG
+            dyaw = self._clip(self.kp * yaw_err + self.kd * yaw_rate, self.max_step)
+            dpitch = self._clip(self.kp * pitch_err + self.kd * pitch_rate, self.max_step)
+
+            self.yaw_offset = self._clip(self.yaw_offset + self.yaw_sign * dyaw, self.yaw_limit)
+            self.pitch_offset = self._clip(self.pitch_offset + self.pitch_sign * dpitch, self.pitch_limit)
+            yaw, pitch = self.yaw_offset, self.pitch_offset
+
+        self._look(ex, ey)
+        return self._send(yaw, pitch, ts)
+
+    def _on_lost(self, now, ts):
+        self._lost += 1
+        with self._lock:
+            self._prev_err = None
+            self._prev_ts = None
+            if self._last_seen and now - self._last_seen < self.lost_timeout:
+                return
+            if abs(self.yaw_offset) < 1 and abs(self.pitch_offset) < 1:
+                return
+            # 目标丢失超时：缓慢回中
+            self.yaw_offset *= 0.9
+            self.pitch_offset *= 0.9
+            yaw, pitch = self.yaw_offset, self.pitch_offset
+        self._look(0.0, 0.0)
+        self._send(yaw, pitch, ts)
+
+    def _check_paused(self):
+        fn = self.pause_fn
+        try:
+            paused = bool(fn()) if fn is not None else False
+        except Exception:
+            paused = False
+        if paused:
+            self._paused_frames += 1
+            with self._lock:
+                self._prev_err = None
+                self._prev_ts = None
+        elif self._paused:
+            # 动作序列结束时颈部已回到中位
+            with self._lock:
+                self.yaw_offset = 0.0
+                self.pitch_offset = 0.0
+        self._paused = paused
+        return paused
+
+    @staticmethod
+    def _clip(v, limit):
+        return max(-limit, min(limit, v))
+
+    def _look(self, x, y):
+        fn = self.look_fn
+        if fn is None:
+            return
+        try:
+            fn(max(-1.0, min(1.0, x)), max(-1.0, min(1.0, -y)))
+        except Exception:
+            pass
+
+    def _send(self, yaw, pitch, frame_ts, runtime_ms=None):
+        mc = self.mc
+        send = self.send_fn
+        if send is None:
+            if mc is None or not hasattr(mc, 'set_head'):
+                return False
+            send = mc.set_head
+        try:
+            ok = send(yaw, pitch, runtime_ms=runtime_ms or self.runtime_ms)
+        except Exception:
+            ok = False
+        if not ok:
+            return False
+        t = time.monotonic()
+        latency = (t - frame_ts) * 1000.0
+        self._commands += 1
+        self._latency_ms = latency if self._commands == 1 else (0.9 * self._latency_ms + 0.1 * latency)
+        self._max_latency_ms = max(self._max_latency_ms, latency)
+        if self._last_cmd_t > 0:
+            inst = 1.0 / max(1e-6, t - self._last_cmd_t)
+            self._rate_hz = inst if self._rate_hz <= 0 else (0.9 * self._rate_hz + 0.1 * inst)
+        self._last_cmd_t = t
+        return True
+
+    # ---------------- 统计 ----------------
+    def get_stats(self):
+        return {
+            'updates': self._updates,
+            'commands': self._commands,
+            'lost': self._lost,
+            'paused': self._paused,
+            'paused_frames': self._paused_frames,
+            'rate_hz': round(self._rate_hz, 1),
+            'latency_ms': round(self._latency_ms, 2),
+            'max_latency_ms': round(self._max_latency_ms, 2),
+            'yaw_offset': round(self.yaw_offset, 1),
+            'pitch_offset': round(self.pitch_offset, 1),
+        }
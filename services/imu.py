@@ -5,7 +5,9 @@ IMU Reader
 - 优先尝试在 Android 环境使用本机传感器（如 plyer/android）读取陀螺仪/姿态
 - 如果不可用，作为后备可通过 UDP 接收来自手机的 JSON 姿态数据，例如：
   {"pitch": 1.2, "roll": -0.5, "yaw": 12.3}
+  也接受带序号/时间戳的二进制批量数据报（services/imu_protocol.py），可统计丢包与乱序
 - 在桌面环境还会提供模拟模式（始终返回 0,0,0 或周期性测试信号）
+- Android 本机传感器在独立线程上以传感器速率读取陀螺仪 + 加速度计，经互补滤波输出角度
 
 使用：
     imu = IMUReader(udp_port=5005)
@@ -18,20 +20,25 @@ IMU Reader
 
 import threading
 import time
-import json
 import socket
 import math
 import sys
 
+from . import session_recorder
+from .imu_buffer import IMURingBuffer
+from .imu_protocol import IMUStreamState, decode_packet, parse_legacy
+from .orientation_filter import ComplementaryFilter
+
 try:
     from kivy.utils import platform as _kivy_platform
 except Exception:
     _kivy_platform = sys.platform
 
 class IMUReader:
-    def __init__(self, udp_port=5005, simulate=False):
+    def __init__(self, udp_port=5005, simulate=False, sensor_period=0.01, filter_tau=0.5, buffer_size=256):
         self.udp_port = udp_port
         self.simulate = simulate
+        self.sensor_period = float(sensor_period)
 
         self._running = False
         self._lock = threading.Lock()
@@ -41,6 +48,18 @@ class IMUReader:
 
         self._thread = None
         self._sock = None
+        self._buffer = IMURingBuffer(capacity=buffer_size)
+        self._udp_state = IMUStreamState()
+
+        # 姿态融合（本机传感器）
+        self._filter = ComplementaryFilter(tau=filter_tau)
+        self._accelerometer = None
+        self._fused = False
+        self._rates = (0.0, 0.0, 0.0)
+        self._sample_ts = 0.0       # 最近一次传感器读取时刻（monotonic）
+        self._publish_ts = 0.0      # 最近一次发布角度的时刻
+        self._proc_us = 0.0         # 单次融合耗时
+        self._rate_hz = 0.0         # 实测传感器采样率（EMA）
 
     def start(self):
         # Try platform-specific sensor first (best-effort)
@@ -63,6 +82,13 @@ class IMUReader:
                     try:
                         gyroscope.enable()
                         self._gyroscope = gyroscope
+                        try:
+                            accelerometer = importlib.import_module('plyer.accelerometer')
+                            accelerometer.enable()
+                            self._accelerometer = accelerometer
+                        except Exception:
+                            self._accelerometer = None
+                        self._fused = True
                         self._thread = threading.Thread(target=self._plyer_loop, daemon=True)
                         self._thread.start()
                         started = True
@@ -97,6 +123,12 @@ class IMUReader:
 
     def stop(self):
         self._running = False
+        for sensor in (getattr(self, '_gyroscope', None), self._accelerometer):
+            try:
+                if sensor is not None:
+                    sensor.disable()
+            except Exception:
+                pass
         try:
             if self._sock:
                 self._sock.close()
@@ -109,37 +141,112 @@ class IMUReader:
         with self._lock:
             return (float(self._pitch), float(self._roll), float(self._yaw))
 
+    def _publish(self, pitch, roll, yaw, ts=None):
+        """更新最新姿态并写入带时间戳的环形缓冲区。"""
+        if ts is None:
+            ts = time.monotonic()
+        with self._lock:
+            self._pitch = pitch
+            self._roll = roll
+            self._yaw = yaw
+        seq = self._buffer.push(ts, pitch, roll, yaw)
+        session_recorder.record_imu(ts, pitch, roll, yaw, seq)
+        return seq
+
+    @property
+    def buffer(self):
+        return self._buffer
+
+    def get_sample(self):
+        """最新样本 (monotonic_ts, pitch, roll, yaw, seq)；尚无数据时返回 None。"""
+        return self._buffer.get_latest()
+
+    def get_orientation_at(self, t):
+        """按 monotonic 时刻插值姿态；无数据时返回最新值。"""
+        val = self._buffer.get_at(t)
+        return val if val is not None else self.get_orientation()
+
+    def predict_orientation(self, horizon):
+        """外推 horizon 秒后的姿态，用于抵消舵机执行延迟。"""
+        val = self._buffer.predict(horizon)
+        return val if val is not None else self.get_orientation()
+
+    def get_stream_stats(self):
+        return self._buffer.get_stats()
+
+    def is_fused(self):
+        """是否由本机陀螺 + 加速度计融合输出（而非 UDP/模拟）。"""
+        return bool(self._fused and self._running)
+
+    def get_device_angles(self):
+        """相对安装参考姿态的滤波倾角 (x', y', 航向)（度），供上层做轴映射。"""
+        return self.get_orientation()
+
+    def calibrate_level(self):
+        """以当前姿态为安装参考姿态（输出归零）；仅本机传感器融合时有效。"""
+        if not self._fused:
+            return False
+        self._filter.calibrate()
+        return True
+
+    def get_rates(self):
+        """最近一次原始角速度 (x, y, z)，单位 rad/s。"""
+        with self._lock:
+            return self._rates
+
+    def get_latency_ms(self):
+        """当前角度相对传感器读取时刻的延迟（ms）。"""
+        with self._lock:
+            ts = self._sample_ts
+        if ts <= 0:
+            return -1.0
+        return (time.monotonic() - ts) * 1000.0
+
+    def get_filter_stats(self):
+        with self._lock:
+            return {
+                'fused': bool(self._fused),
+                'accel': self._accelerometer is not None,
+                'rate_hz': round(self._rate_hz, 1),
+                'proc_us': round(self._proc_us, 1),
+                'latency_ms': round((time.monotonic() - self._sample_ts) * 1000.0, 1) if self._sample_ts else -1.0,
+                'tau_s': self._filter.tau,
+                'reference_ready': self._filter.reference_ready,
+            }
+
     # -------------------- loops --------------------
     def _udp_loop(self):
-        # 接收 JSON 文本或简单 CSV
+        # 优先按二进制批量协议解析（见 imu_protocol），否则回退旧的 JSON 文本或简单 CSV
         while self._running:
             try:
                 data, addr = self._sock.recvfrom(2048)
                 if not data:
                     continue
-                s = data.decode(errors='ignore').strip()
+                now = time.monotonic()
                 try:
-                    obj = json.loads(s)
-                    pitch = float(obj.get('pitch', 0.0))
-                    roll = float(obj.get('roll', 0.0))
-                    yaw = float(obj.get('yaw', 0.0))
-                except Exception:
-                    # 解析失败时尝试 CSV: pitch,roll,yaw
-                    try:
-                        parts = s.replace('\n','').split(',')
-                        pitch = float(parts[0]) if len(parts) > 0 else 0.0
-                        roll = float(parts[1]) if len(parts) > 1 else 0.0
-                        yaw = float(parts[2]) if len(parts) > 2 else 0.0
-                    except Exception:
-                        continue
+                    pkt = decode_packet(data)
+                except ValueError:
+                    self._udp_state.errors += 1
+                    continue
+                if pkt is not None:
+                    samples = self._udp_state.accept(pkt, now)
+                    for ts, pitch, roll, yaw in samples:
+                        self._publish(pitch, roll, yaw, ts=ts)
+                    continue
 
-                with self._lock:
-                    self._pitch = pitch
-                    self._roll = roll
-                    self._yaw = yaw
+                vals = parse_legacy(data)
+                if vals is None:
+                    self._udp_state.errors += 1
+                    continue
+                self._udp_state.accept_legacy(now)
+                self._publish(vals[0], vals[1], vals[2], ts=now)
             except Exception:
                 time.sleep(0.02)
 
+    def get_udp_stats(self):
+        """UDP 接收统计：包速率、丢包、乱序、重复与旧格式包数量。"""
+        return self._udp_state.get_stats()
+
     def _sim_loop(self):
         t0 = time.time()
         while self._running:
@@ -148,34 +255,48 @@ class IMUReader:
             pitch = math.sin(t * 0.8) * 4.0
             roll = math.sin(t * 0.6) * 3.0
             yaw = (t * 10.0) % 360.0
-            with self._lock:
-                self._pitch = pitch
-                self._roll = roll
-                self._yaw = yaw
+            self._publish(pitch, roll, yaw)
             time.sleep(0.02)
 
+    def _read_plyer_vector(self, sensor, attrs):
+        for attr in attrs:
+            try:
+                vals = getattr(sensor, attr)
+            except Exception:
+                vals = None
+            if vals and vals[0] is not None:
+                return vals
+        return None
+
     def _plyer_loop(self):
-        # plyer.gyroscope 返回 (x,y,z) 角速度，某些设备可能有 orientation 接口
-        # 这里做最小封装：尝试读取 gyroscope 值并数值积分 (仅作示例，不是精确姿态融合)
+        # plyer.gyroscope.rotation 为角速度 (rad/s)，plyer.accelerometer.acceleration 为 m/s²
+        # 以传感器速率读取并按实际 dt 做互补滤波，输出角度而不是角速度
         last = None
         while self._running:
+            t_read = time.monotonic()
             try:
-                vals = self._gyroscope.rotation
-                # plyer 的接口不统一，尝试不同属性
-                if vals is None:
-                    try:
-                        vals = self._gyroscope.orientation
-                    except Exception:
-                        vals = None
-                if vals:
-                    # 假设 vals 为 (x,y,z) 角度或角速度
+                rates = self._read_plyer_vector(self._gyroscope, ('rotation',))
+                accel = None
+                if self._accelerometer is not None:
+                    accel = self._read_plyer_vector(self._accelerometer, ('acceleration',))
+                if rates is not None:
+                    dt = (t_read - last) if last is not None else self.sensor_period
+                    last = t_read
+                    ax, ay, az = self._filter.update(rates, accel, dt)
+                    self._publish(ax, ay, az, ts=t_read)
+                    t_done = time.monotonic()
                     with self._lock:
-                        self._pitch = vals[0]
-                        self._roll = vals[1]
-                        self._yaw = vals[2] if len(vals) > 2 else self._yaw
+                        self._rates = (float(rates[0]), float(rates[1]), float(rates[2]) if len(rates) > 2 else 0.0)
+                        self._sample_ts = t_read
+                        self._publish_ts = t_done
+                        self._proc_us = (t_done - t_read) * 1e6
+                        if dt > 0:
+                            inst = 1.0 / dt
+                            self._rate_hz = inst if self._rate_hz <= 0 else (0.9 * self._rate_hz + 0.1 * inst)
             except Exception:
                 pass
-            time.sleep(0.02)
+            spent = time.monotonic() - t_read
+            time.sleep(max(0.001, self.sensor_period - spent))
 
 
 if __name__ == '__main__':
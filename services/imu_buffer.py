@@ -0,0 +1,218 @@
+"""
+IMURingBuffer
+
+定长环形缓冲区，保存带时间戳的姿态样本 (monotonic_ts, pitch, roll, yaw, seq)。
+
+用途：
+- get_latest(): 最新样本及其时间戳，消费者可判断数据新旧
+- get_at(t): 按时刻线性插值（yaw 按最短角度插值），与舵机指令时间对齐
+- predict(horizon): 用最近一小段窗口的角速度外推，抵消已知的执行延迟
+- get_stats(): 采样率、最大间隔、丢帧（间隔异常）次数
+
+单写多读：写入方为 IMU 线程，读取方为平衡循环/录制器/UI，内部用一把锁保护。
+
+使用：
+    buf = IMURingBuffer(capacity=256)
+    buf.push(time.monotonic(), p, r, y)
+    ts, p, r, y, seq = buf.get_latest()
+    p, r, y = buf.get_at(time.monotonic() - 0.02)
+    p, r, y = buf.predict(0.04)
+"""
+
+import threading
+import time
+from array import array
+
+
+def _wrap180(a):
+    return (a + 180.0) % 360.0 - 180.0
+
+
+def _lerp_angle(a0, a1, s):
+    """按最短角度插值/外推 yaw，结果保持输入的取值约定（[0, 360) 或 [-180, 180)）。"""
+    v = a0 + _wrap180(a1 - a0) * s
+    if a0 >= 0.0 and a1 >= 0.0:
+        return v % 360.0
+    return _wrap180(v)
+
+
+class IMURingBuffer:
+    def __init__(self, capacity=256, max_horizon=0.1, gap_factor=3.0):
+        """
+        capacity: 保存的样本数（100Hz 时 256 约 2.5 秒）
+        max_horizon: 外推的最大时长（秒），避免噪声被放大
+        gap_factor: 间隔超过平均周期的该倍数记为一次断流
+        """
+        self.capacity = max(2, int(capacity))
+        self.max_horizon = float(max_horizon)
+        self.gap_factor = float(gap_factor)
+
+        self._ts = array('d', [0.0] * self.capacity)
+        self._p = array('d', [0.0] * self.capacity)
+        self._r = array('d', [0.0] * self.capacity)
+        self._y = array('d', [0.0] * self.capacity)
+        self._seq = array('q', [0] * self.capacity)
+        self._head = 0          # 下一次写入位置
+        self._count = 0
+        self._next_seq = 0
+        self._lock = threading.Lock()
+
+        self._period_ema = 0.0
+        self._max_gap = 0.0
+        self._gaps = 0
+        self._out_of_order = 0
+
+    # ---------------- 写入 ----------------
+    def push(self, ts, pitch, roll, yaw):
+        """写入一个样本并返回其序号。时间戳倒退的样本会被丢弃（返回 -1）。"""
+        ts = float(ts)
+        with self._lock:
+            if self._count:
+                last_ts = self._ts[(self._head - 1) % self.capacity]
+                dt = ts - last_ts
+                if dt <= 0:
+                    self._out_of_order += 1
+                    return -1
+                if self._period_ema > 0 and dt > self._period_ema * self.gap_factor:
+                    self._gaps += 1
+                else:
+                    self._period_ema = dt if self._period_ema <= 0 else (0.95 * self._period_ema + 0.05 * dt)
+                if dt > self._max_gap:
+                    self._max_gap = dt
+            i = self._head
+            seq = self._next_seq
+            self._ts[i] = ts
+            self._p[i] = float(pitch)
+            self._r[i] = float(roll)
+            self._y[i] = float(yaw)
+            self._seq[i] = seq
+            self._head = (i + 1) % self.capacity
+            self._count = min(self.capacity, self._count + 1)
+            self._next_seq = seq + 1
+            return seq
+
+    def clear(self):
+        with self._lock:
+            self._head = 0
+            self._count = 0
+            self._period_ema = 0.0
+            self._max_gap = 0.0
+            self._gaps = 0
+            self._out_of_order = 0
+
+    # ---------------- 读取 ----------------
+    def __len__(self):
+        return self._count
+
+    def _idx(self, k):
+        """第 k 个样本（0 为最旧）的物理下标；调用方需持锁。"""
+        return (self._head - self._count + k) % self.capacity
+
+    def _sample(self, i):
+        return (self._ts[i], self._p[i], self._r[i], self._y[i], int(self._seq[i]))
+
+    def get_latest(self):
+        """返回 (ts, pitch, roll, yaw, seq)；无样本时返回 None。"""
+        with self._lock:
+            if not self._count:
+                return None
+            return self._sample((self._head - 1) % self.capacity)
+
+    def snapshot(self, since_seq=-1):
+        """按时间顺序返回 seq > since_seq 的全部样本（供录制/调试）。"""
+        with self._lock:
+            out = []
+            for k in range(self._count):
+                i = self._idx(k)
+                if self._seq[i] > since_seq:
+                    out.append(self._sample(i))
+            return out
+
+    def get_at(self, t):
+        """返回时刻 t 的 (pitch, roll, yaw)。
+
+        t 落在缓冲区范围外时取最近端点（超过最新样本的部分请用 predict）。
+        """
+        t = float(t)
+        with self._lock:
+            n = self._count
+            if not n:
+                return None
+            first = self._idx(0)
+            last = self._idx(n - 1)
+            if t <= self._ts[first]:
+                return (self._p[first], self._r[first], self._y[first])
+            if t >= self._ts[last]:
+                return (self._p[last], self._r[last], self._y[last])
+            # 二分查找第一个 ts > t 的样本
+            lo, hi = 0, n - 1
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._ts[self._idx(mid)] > t:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            i1 = self._idx(lo)
+            i0 = self._idx(lo - 1)
+            t0, t1 = self._ts[i0], self._ts[i1]
+            a = (t - t0) / (t1 - t0) if t1 > t0 else 1.0
+            p = self._p[i0] + (self._p[i1] - self._p[i0]) * a
+            r = self._r[i0] + (self._r[i1] - self._r[i0]) * a
+            y = _lerp_angle(self._y[i0], self._y[i1], a)
+            return (p, r, y)
+
+    def predict(self, horizon, window=0.05, now=None):
+        """按最近 window 秒的平均角速度外推到 now + horizon（now 默认取当前时刻）。
+
+        返回 (pitch, roll, yaw)；样本不足时退化为最新值。
+        """
+        with self._lock:
+            n = self._count
+            if not n:
+                return None
+            last = self._idx(n - 1)
+            t1 = self._ts[last]
+            p1, r1, y1 = self._p[last], self._r[last], self._y[last]
+            # 找到窗口起点样本
+            k = n - 1
+            while k > 0 and (t1 - self._ts[self._idx(k - 1)]) <= window:
+                k -= 1
+            if k == n - 1 and n >= 2:
+                k = n - 2
+            i0 = self._idx(k)
+            t0 = self._ts[i0]
+            p0, r0, y0 = self._p[i0], self._r[i0], self._y[i0]
+
+        if now is None:
+            now = time.monotonic()
+        lead = max(0.0, min(self.max_horizon, float(now) + float(horizon) - t1))
+        span = t1 - t0
+        if span <= 0 or lead <= 0:
+            return (p1, r1, y1)
+        s = lead / span
+        return (
+            p1 + (p1 - p0) * s,
+            r1 + (r1 - r0) * s,
+            _lerp_angle(y0, y1, 1.0 + s),
+        )
+
+    # ---------------- 统计 ----------------
+    def get_stats(self):
+        with self._lock:
+            n = self._count
+            age_ms = -1.0
+            span = 0.0
+            if n:
+                last_ts = self._ts[(self._head - 1) % self.capacity]
+                age_ms = (time.monotonic() - last_ts) * 1000.0
+                span = last_ts - self._ts[self._idx(0)]
+            return {
+                'samples': n,
+                'seq': self._next_seq - 1,
+                'rate_hz': round(1.0 / self._period_ema, 1) if self._period_ema > 0 else 0.0,
+                'span_s': round(span, 3),
+                'age_ms': round(age_ms, 1),
+                'max_gap_ms': round(self._max_gap * 1000.0, 1),
+                'gaps': self._gaps,
+                'out_of_order': self._out_of_order,
+            }
@@ -0,0 +1,187 @@
+"""
+IMU UDP 二进制协议
+
+手机端以 100Hz 以上发送姿态时，逐包 JSON 文本既浪费带宽又无法发现丢包/乱序。
+本协议把多个样本打包进一个定长结构的数据报，并带有包序号与传感器时间戳。
+
+数据报布局（小端序）：
+- 头部 20 字节：magic b'RBIM' | version(uint8) | flags(uint8) | count(uint16) | seq(uint32) | sensor_ts_us(uint64)
+- count 个样本，每个 16 字节：dt_us(uint32, 相对 sensor_ts_us) | pitch(float32) | roll(float32) | yaw(float32)
+
+seq 每包加 1（uint32 回绕）；sensor_ts_us 为发送端单调时钟（微秒）。
+接收端同时兼容旧的 JSON 文本（{"pitch":..,"roll":..,"yaw":..}）与 CSV（pitch,roll,yaw）。
+
+使用：
+    data = encode_packet(seq, ts_us, [(ts_us, p, r, y), ...])
+    pkt = decode_packet(data)        # IMUPacket 或 None（非二进制格式）
+    state = IMUStreamState()
+    samples = state.accept(pkt, time.monotonic())   # 仅返回按序到达的样本，已换算为本地时间
+"""
+
+import json
+import struct
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+IMU_MAGIC = b'RBIM'
+IMU_VERSION = 1
+_HEADER = struct.Struct('<4sBBHIQ')
+_SAMPLE = struct.Struct('<Ifff')
+MAX_SAMPLES = 64
+_SEQ_MOD = 1 << 32
+
+
+@dataclass
+class IMUPacket:
+    seq: int
+    sensor_ts_us: int
+    # (sensor_ts_us, pitch, roll, yaw)
+    samples: List[Tuple[int, float, float, float]] = field(default_factory=list)
+
+
+def encode_packet(seq, sensor_ts_us, samples, flags=0):
+    """打包样本列表 [(ts_us, pitch, roll, yaw), ...]；ts_us 不得早于 sensor_ts_us。"""
+    samples = list(samples)[:MAX_SAMPLES]
+    base = int(sensor_ts_us)
+    parts = [_HEADER.pack(IMU_MAGIC, IMU_VERSION, int(flags) & 0xFF, len(samples), int(seq) % _SEQ_MOD, base)]
+    for ts_us, p, r, y in samples:
+        parts.append(_SAMPLE.pack(max(0, int(ts_us) - base) & 0xFFFFFFFF, float(p), float(r), float(y)))
+    return b''.join(parts)
+
+
+def decode_packet(data):
+    """解析二进制数据报；不是本协议（magic 不符）时返回 None，格式损坏时抛出 ValueError。"""
+    if len(data) < _HEADER.size or data[:4] != IMU_MAGIC:
+        return None
+    magic, version, _flags, count, seq, base = _HEADER.unpack_from(data, 0)
+    if version != IMU_VERSION:
+        raise ValueError(f'不支持的 IMU 协议版本: {version}')
+    if count > MAX_SAMPLES or len(data) < _HEADER.size + count * _SAMPLE.size:
+        raise ValueError('IMU 数据报长度与样本数不符')
+    samples = []
+    off = _HEADER.size
+    for _ in range(count):
+        dt_us, p, r, y = _SAMPLE.unpack_from(data, off)
+        samples.append((base + dt_us, p, r, y))
+        off += _SAMPLE.size
+    return IMUPacket(seq=seq, sensor_ts_us=base, samples=samples)
+
+
+def parse_legacy(data):
+    """解析旧格式：JSON 文本或 CSV "pitch,roll,yaw"，失败返回 None。"""
+    s = data.decode(errors='ignore').strip()
+    if not s:
+        return None
+    try:
+        obj = json.loads(s)
+        return (float(obj.get('pitch', 0.0)), float(obj.get('roll', 0.0)), float(obj.get('yaw', 0.0)))
+    except Exception:
+        pass
+    try:
+        parts = s.replace('\n', '').split(',')
+        pitch = float(parts[0]) if len(parts) > 0 else 0.0
+        roll = float(parts[1]) if len(parts) > 1 else 0.0
+        yaw = float(parts[2]) if len(parts) > 2 else 0.0
+        return (pitch, roll, yaw)
+    except Exception:
+        return None
+
+
+class IMUStreamState:
+    """接收端状态：序号跟踪（丢包/乱序/重复）、包速率统计、传感器时钟到本地时钟的映射。"""
+
+    def __init__(self, rate_window=1.0, resync_gap=2.0):
+        self.rate_window = float(rate_window)
+        self.resync_gap = float(resync_gap)
+        self.reset()
+
+    def reset(self):
+        self._last_seq = None
+        self._offset = None         # local_monotonic - sensor_time（秒），取观测最小值
+        self._last_sensor_ts = None
+        self._arrivals = deque()
+        self.packets = 0
+        self.samples = 0
+        self.lost = 0
+        self.reordered = 0
+        self.duplicates = 0
+        self.legacy = 0
+        self.errors = 0
+        self.resyncs = 0
+
+    def _to_local(self, sensor_ts_us):
+        return sensor_ts_us / 1e6 + self._offset
+
+    def accept(self, pkt, now=None):
+        """登记一个二进制包，返回应写入的样本 [(local_ts, pitch, roll, yaw), ...]。
+
+        迟到（序号小于已接收的最大序号）的包只计数不返回，保证下游时间单调。
+        """
+        if now is None:
+            now = time.monotonic()
+        self._count_arrival(now)
+        self.packets += 1
+        seq = int(pkt.seq)
+
+        if self._last_seq is not None:
+            diff = (seq - self._last_seq) % _SEQ_MOD
+            if diff == 0:
+                self.duplicates += 1
+                return []
+            if diff >= _SEQ_MOD // 2:
+                # 比已接收的最新包更旧：乱序到达，之前按丢包计入的这次补回
+                self.reordered += 1
+                if self.lost > 0:
+                    self.lost -= 1
+                return []
+            if diff > 1:
+                self.lost += diff - 1
+        self._last_seq = seq
+
+        if not pkt.samples:
+            return []
+        sensor_last = pkt.samples[-1][0] / 1e6
+        # 发送端重启或时钟跳变时重新建立映射
+        if self._last_sensor_ts is not None and abs(sensor_last - self._last_sensor_ts) > self.resync_gap:
+            self._offset = None
+            self.resyncs += 1
+        self._last_sensor_ts = sensor_last
+        # 最小偏移对应网络延迟最小的那次到达，抖动不会把时间戳推后
+        offset = now - sensor_last
+        if self._offset is None or offset < self._offset:
+            self._offset = offset
+
+        self.samples += len(pkt.samples)
+        return [(self._to_local(ts), p, r, y) for ts, p, r, y in pkt.samples]
+
+    def accept_legacy(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        self._count_arrival(now)
+        self.packets += 1
+        self.samples += 1
+        self.legacy += 1
+
+    def _count_arrival(self, now):
+        self._arrivals.append(now)
+        cutoff = now - self.rate_window
+        while self._arrivals and self._arrivals[0] < cutoff:
+            self._arrivals.popleft()
+
+    def get_stats(self):
+        expected = self.packets - self.legacy + self.lost
+        return {
+            'packets': self.packets,
+            'samples': self.samples,
+            'packets_per_s': round(len(self._arrivals) / self.rate_window, 1) if self.rate_window > 0 else 0.0,
+            'lost': self.lost,
+            'loss_pct': round(100.0 * self.lost / expected, 2) if expected > 0 else 0.0,
+            'reordered': self.reordered,
+            'duplicates': self.duplicates,
+            'legacy': self.legacy,
+            'errors': self.errors,
+            'resyncs': self.resyncs,
+            'last_seq': self._last_seq,
+        }
@@ -0,0 +1,119 @@
+"""
+CoalescingInputQueue
+
+AI 输入的合并队列（latest-wins），替代无界列表。AI 忙时新输入与待处理输入合并，
+因此最多只有一条待处理输入：
+
+- 连续的文本输入合并为一条提示；新文本是旧文本的延续（STT 中间结果）时只保留较长者
+- 图像只保留最新一帧
+- 每段文本单独计算新鲜度：合并时丢弃超过新鲜度窗口的旧片段，只保留仍新鲜的部分；
+  待处理输入的时间戳取最新片段，刚说的话不会因为与旧输入合并而被当作过期丢弃
+- 统计队列深度、合并与丢弃次数
+
+队列元素需要具有 user_text / image_data / local / created_at 属性（见 ai_core._Turn）。
+本类不加锁，只应在同一线程（AI 事件循环）中使用。
+"""
+
+import time
+
+
+class CoalescingInputQueue:
+    def __init__(self, freshness_sec=8.0, max_text_chars=200, separator="；"):
+        self.freshness_sec = float(freshness_sec)
+        self.max_text_chars = int(max_text_chars)
+        self.separator = separator
+        self._pending = None
+        self._parts = []          # 待处理输入的文本片段 [(created_at, text)]
+
+        self.pushed = 0
+        self.merged_text = 0
+        self.replaced_images = 0
+        self.dropped_stale = 0
+        self.max_depth = 0
+
+    def __len__(self):
+        return 0 if self._pending is None else 1
+
+    def empty(self):
+        return self._pending is None
+
+    def push(self, item):
+        """入队；有待处理输入时与之合并并返回合并后的元素（其余字段取新输入），否则返回 item。"""
+        self.pushed += 1
+        self._drop_stale()
+        old = self._pending
+        if old is not None:
+            item = self._merge(old, item)
+        else:
+            text = str(item.user_text or "")
+            self._parts = [(item.created_at, text)] if text else []
+        self._pending = item
+        self.max_depth = max(self.max_depth, len(self))
+        return item
+
+    def pop(self):
+        """取出待处理输入（已过期时丢弃）；没有时返回 None。"""
+        self._drop_stale()
+        item = self._pending
+        if item is not None and len(self._parts) > 1:
+            # 等待期间过期的旧片段不再送给 LLM
+            now = time.time()
+            fresh = [t for ts, t in self._parts if not self._is_stale(ts, now)]
+            if len(fresh) != len(self._parts):
+                self.dropped_stale += 1
+                item.user_text = self.separator.join(fresh)[-self.max_text_chars:]
+        self._pending = None
+        self._parts = []
+        return item
+
+    def _is_stale(self, ts, now):
+        return self.freshness_sec > 0 and now - ts > self.freshness_sec
+
+    def _drop_stale(self):
+        if self._pending is not None and self._is_stale(self._pending.created_at, time.time()):
+            self._pending = None
+            self._parts = []
+            self.dropped_stale += 1
+
+    def _merge(self, old, new):
+        now = time.time()
+        fresh = [(ts, t) for ts, t in self._parts if not self._is_stale(ts, now)]
+        if len(fresh) != len(self._parts):
+            self.dropped_stale += 1
+        new_text = str(new.user_text or "")
+        if new_text:
+            if fresh:
+                last_text = fresh[-1][1]
+                if new_text.startswith(last_text) or last_text in new_text:
+                    fresh[-1] = (new.created_at, new_text)
+                elif new_text not in last_text:
+                    fresh.append((new.created_at, new_text))
+                else:
+                    fresh[-1] = (new.created_at, last_text)
+                self.merged_text += 1
+            else:
+                fresh = [(new.created_at, new_text)]
+        self._parts = fresh
+
+        text = self.separator.join(t for _ts, t in fresh)
+        if len(text) > self.max_text_chars:
+            text = text[-self.max_text_chars:]
+        if new.image_data is not None and old.image_data is not None:
+            self.replaced_images += 1
+        new.user_text = text
+        if new.image_data is None:
+            new.image_data = old.image_data
+        if new.local is None:
+            new.local = old.local
+        new.created_at = max(old.created_at, new.created_at)
+        return new
+
+    def get_stats(self):
+        return {
+            "depth": len(self),
+            "max_depth": self.max_depth,
+            "pushed": self.pushed,
+            "merged_text": self.merged_text,
+            "replaced_images": self.replaced_images,
+            "dropped_stale": self.dropped_stale,
+        }
@@ -0,0 +1,270 @@
+"""
+本地快速意图匹配
+
+“挥手”“坐下”“停”“点头”这类简单指令无需等云端 LLM 往返：在 process_input 之前本地匹配，
+高置信度时立即下发动作，LLM 仍并行运行，只负责说话。
+
+规则与样例来自 data/intents.json：
+- patterns: 正则，命中即高置信度
+- keywords: 关键词，置信度随关键词之外剩余字数线性降低（短句更可信）
+- examples: 训练端侧字符 n-gram 朴素贝叶斯分类器；"none" 类用于吸收闲聊，降低误触发
+- whole_utterance: 内置动作意图都必须整句即指令：规则命中之外只允许 fillers 中的语气/客套/称呼词
+  （“请”“吧”“一下”“跟我”），且不接受仅由分类器判定，避免“我走两步就到了”“电梯停了”
+  “他在挥手”这类描述句触发动作
+- negations: 含否定词（“不要挥手”）时跳过该意图，ignore_negation 的意图（如 stop）除外
+- questions: 疑问句（“你坐过飞机吗”）不走本地，交给 LLM
+- max_residual: 规则匹配之外剩余字数超过该值时降低置信度（“讲讲挥手的历史”）
+
+使用：
+    engine = IntentEngine.load()
+    m = engine.match("挥挥手")   # IntentMatch(action='wave', ...) 或 None
+    engine.get_stats()
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+DEFAULT_PATH = os.path.join("data", "intents.json")
+
+_PUNCT_RE = re.compile(r"[\s,，。.!！?？~～、;；:：\"'“”‘’…]+")
+
+
+@dataclass
+class IntentMatch:
+    action: str
+    emotion: str
+    confidence: float
+    source: str          # pattern | keyword | classifier
+    match_ms: float
+
+
+class _Intent:
+    def __init__(self, data):
+        self.action = str(data.get("action") or "none")
+        self.emotion = str(data.get("emotion") or "normal")
+        self.keywords = [normalize(k) for k in data.get("keywords") or [] if normalize(k)]
+        self.patterns = []
+        for p in data.get("patterns") or []:
+            try:
+                self.patterns.append(re.compile(p))
+            except re.error:
+                pass
+        self.examples = [normalize(e) for e in data.get("examples") or [] if normalize(e)]
+        self.ignore_negation = bool(data.get("ignore_negation", False))
+        self.whole_utterance = bool(data.get("whole_utterance", False))
+
+
+def normalize(text):
+    return _PUNCT_RE.sub("", str(text or "").strip().lower())
+
+
+def _ngrams(text):
+    grams = list(text)
+    grams.extend(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+class _NaiveBayes:
+    """字符 1/2-gram 多项式朴素贝叶斯（拉普拉斯平滑）。"""
+
+    def __init__(self):
+        self.classes = []
+        self._log_prior = {}
+        self._log_like = {}
+        self._log_unseen = {}
+
+    def fit(self, samples):
+        counts = {}
+        docs = {}
+        vocab = set()
+        for label, text in samples:
+            docs[label] = docs.get(label, 0) + 1
+            c = counts.setdefault(label, {})
+            for g in _ngrams(text):
+                c[g] = c.get(g, 0) + 1
+                vocab.add(g)
+        total_docs = float(sum(docs.values())) or 1.0
+        v = len(vocab) or 1
+        self.classes = list(docs.keys())
+        for label in self.classes:
+            c = counts.get(label, {})
+            total = float(sum(c.values()))
+            self._log_prior[label] = math.log(docs[label] / total_docs)
+            self._log_like[label] = {g: math.log((n + 1.0) / (total + v)) for g, n in c.items()}
+            self._log_unseen[label] = math.log(1.0 / (total + v))
+
+    def predict(self, text):
+        """返回 (label, prob)；无模型时 (None, 0)。"""
+        if not self.classes:
+            return None, 0.0
+        grams = _ngrams(text)
+        scores = {}
+        for label in self.classes:
+            like = self._log_like[label]
+            unseen = self._log_unseen[label]
+            scores[label] = self._log_prior[label] + sum(like.get(g, unseen) for g in grams)
+        best = max(scores, key=scores.get)
+        m = scores[best]
+        z = sum(math.exp(s - m) for s in scores.values())
+        return best, 1.0 / z
+
+
+class IntentEngine:
+    def __init__(self, intents=None, threshold=0.8, max_chars=16, negations=None, questions=None, max_residual=4,
+                 fillers=None):
+        self.threshold = float(threshold)
+        self.max_chars = int(max_chars)
+        self.max_residual = int(max_residual)
+        # 长的先删，避免“一下”被“一”拆开
+        self.fillers = sorted({normalize(f) for f in fillers or [] if normalize(f)}, key=len, reverse=True)
+        self.negations = [normalize(n) for n in negations or [] if normalize(n)]
+        self.questions = [normalize(q) for q in questions or [] if normalize(q)]
+        self.intents = [_Intent(d) for d in intents or []]
+        self._by_action = {i.action: i for i in self.intents}
+        self._clf = _NaiveBayes()
+        samples = []
+        for it in self.intents:
+            for text in it.examples + it.keywords:
+                samples.append((it.action, text))
+        self._clf.fit(samples)
+
+        self._lock = threading.Lock()
+        self._queries = 0
+        self._hits = 0
+        self._match_ms = 0.0
+        self._saved_n = 0
+        self._saved_ms_total = 0.0
+        self._agree = 0
+        self._disagree = 0
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or os.environ.get("ROBOTBRAIN_INTENTS") or DEFAULT_PATH
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            data = {}
+        return cls(
+            intents=data.get("intents") or [],
+            threshold=data.get("threshold", 0.8),
+            max_chars=data.get("max_chars", 16),
+            negations=data.get("negations") or [],
+            questions=data.get("questions") or [],
+            max_residual=data.get("max_residual", 4),
+            fillers=data.get("fillers") or [],
+        )
+
+    # ---------------- 匹配 ----------------
+    def match(self, text):
+        """返回高置信度的 IntentMatch，否则 None。"""
+        t0 = time.perf_counter()
+        result = self._match(normalize(text))
+        ms = (time.perf_counter() - t0) * 1000.0
+        with self._lock:
+            self._queries += 1
+            self._match_ms = ms if self._queries == 1 else (0.9 * self._match_ms + 0.1 * ms)
+            if result is not None:
+                self._hits += 1
+        if result is not None:
+            action, emotion, conf, source = result
+            return IntentMatch(action, emotion, round(conf, 3), source, round(ms, 3))
+        return None
+
+    def _is_filler(self, rest):
+        for f in self.fillers:
+            rest = rest.replace(f, "")
+        return not rest
+
+    def _rule_match(self, it, text):
+        """规则匹配，返回 (置信度, 来源)。"""
+        conf, source = 0.0, ""
+        for p in it.patterns:
+            for m in p.finditer(text):
+                rest = text[:m.start()] + text[m.end():]
+                if it.whole_utterance:
+                    if not self._is_filler(rest):
+                        continue
+                    c = 0.95
+                else:
+                    c = 0.95 if len(rest) <= self.max_residual else 0.7
+                if c > conf:
+                    conf, source = c, "pattern"
+        if conf > 0:
+            return conf, source
+        for kw in it.keywords:
+            idx = text.find(kw)
+            if idx < 0:
+                continue
+            rest = text[:idx] + text[idx + len(kw):]
+            if it.whole_utterance:
+                if not self._is_filler(rest):
+                    continue
+                c = 0.95
+            else:
+                # 每多一个无关字降低 0.04：剩余 3 字以内才可能超过默认阈值 0.8
+                c = 0.95 - 0.04 * len(rest)
+            if c > conf:
+                conf, source = c, "keyword"
+        return conf, source
+
+    def _match(self, text):
+        if not text or len(text) > self.max_chars:
+            return None
+        if any(q in text for q in self.questions):
+            return None
+        negated = any(n in text for n in self.negations)
+
+        best = None
+        for it in self.intents:
+            if it.action == "none" or (negated and not it.ignore_negation):
+                continue
+            conf, source = self._rule_match(it, text)
+            if conf > 0 and (best is None or conf > best[2]):
+                best = (it.action, it.emotion, conf, source)
+
+        label, prob = self._clf.predict(text)
+        if best is not None:
+            # 规则命中但分类器明确判为其他动作时降低置信度
+            if label not in (None, "none", best[0]) and prob > 0.6:
+                best = (best[0], best[1], best[2] * (1.0 - prob), best[3])
+        elif label not in (None, "none"):
+            it = self._by_action.get(label)
+            if it is not None and not it.whole_utterance and not (negated and not it.ignore_negation):
+                best = (it.action, it.emotion, prob, "classifier")
+
+        if best is None or best[2] < self.threshold:
+            return None
+        return best
+
+    # ---------------- 统计 ----------------
+    def record_outcome(self, local_action, llm_action, saved_ms=None):
+        """记录本地命中后 LLM 给出的动作与节省的时间（LLM 动作字段闭合时刻 - 本地下发时刻）。"""
+        with self._lock:
+            if llm_action is not None:
+                if str(llm_action) in (local_action, "none"):
+                    self._agree += 1
+                else:
+                    self._disagree += 1
+            if saved_ms is not None:
+                self._saved_n += 1
+                self._saved_ms_total += max(0.0, float(saved_ms))
+
+    def get_stats(self):
+        with self._lock:
+            q = self._queries
+            return {
+                "queries": q,
+                "hits": self._hits,
+                "hit_rate": round(self._hits / float(q), 3) if q else 0.0,
+                "match_ms": round(self._match_ms, 3),
+                "saved_ms_avg": int(self._saved_ms_total / self._saved_n) if self._saved_n else 0,
+                "saved_ms_total": int(self._saved_ms_total),
+                "llm_agree": self._agree,
+                "llm_disagree": self._disagree,
+            }
@@ -0,0 +1,198 @@
+"""
+增量 JSON 字段解析器
+
+用于 LLM 流式输出：每个增量片段只扫描一次（整体 O(n)），不再对累积文本反复正则匹配。
+
+- 顶层字符串字段的内容边解析边产出（已完成转义的字符），适合 speech 实时播报
+- 顶层字段的值闭合时立即产出完整值，例如 action/emotion 可在模型说完前就执行
+- JSON 之前/之后的杂散文本（如 ```json 代码块标记）被忽略
+
+使用：
+    parser = StreamingJSONParser()
+    for delta in stream:
+        for kind, key, value in parser.feed(delta):
+            if kind == 'chars' and key == 'speech': ...     # value 为新增字符
+            elif kind == 'field': ...                       # value 为已闭合字段的完整值
+    parser.done, parser.fields
+"""
+
+import json
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+# 解析状态
+_S_START = 0        # 等待顶层 '{'
+_S_KEY = 1          # 等待键（或 '}'）
+_S_KEY_STR = 2      # 键字符串内
+_S_COLON = 3        # 等待 ':'
+_S_VALUE = 4        # 等待值开始
+_S_STR = 5          # 顶层字符串值内
+_S_RAW = 6          # 非字符串值（数字/布尔/null/嵌套对象数组）
+_S_AFTER = 7        # 值结束，等待 ',' 或 '}'
+_S_DONE = 8
+
+
+class StreamingJSONParser:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.fields = {}
+        self.done = False
+        self._state = _S_START
+        self._key = []
+        self._cur_key = ''
+        self._str = []
+        self._escape = False
+        self._unicode = None        # \\uXXXX 收集中的十六进制字符
+        self._high_surrogate = None
+        self._raw = []
+        self._raw_depth = 0
+        self._raw_in_str = False
+        self._raw_escape = False
+
+    # ---------------- 对外接口 ----------------
+    def feed(self, text):
+        """消费一个增量片段，返回事件列表 [(kind, key, value)]，kind 为 'chars' 或 'field'。"""
+        events = []
+        chars = []
+        for ch in text or '':
+            st = self._state
+            if st == _S_STR:
+                out = self._string_char(ch)
+                if out is None:
+                    # 字符串结束
+                    if chars:
+                        events.append(('chars', self._cur_key, ''.join(chars)))
+                        chars = []
+                    self._close_field(''.join(self._str), events)
+                elif out:
+                    self._str.append(out)
+                    chars.append(out)
+            elif st == _S_RAW:
+                self._raw_char(ch, events)
+            elif st == _S_START:
+                if ch == '{':
+                    self._state = _S_KEY
+            elif st == _S_KEY:
+                if ch == '"':
+                    self._key = []
+                    self._escape = False
+                    self._unicode = None
+                    self._state = _S_KEY_STR
+                elif ch == '}':
+                    self._state = _S_DONE
+                    self.done = True
+            elif st == _S_KEY_STR:
+                out = self._string_char(ch)
+                if out is None:
+                    self._cur_key = ''.join(self._key)
+                    self._state = _S_COLON
+                elif out:
+                    self._key.append(out)
+            elif st == _S_COLON:
+                if ch == ':':
+                    self._state = _S_VALUE
+            elif st == _S_VALUE:
+                if ch.isspace():
+                    continue
+                if ch == '"':
+                    self._str = []
+                    self._escape = False
+                    self._unicode = None
+                    self._high_surrogate = None
+                    self._state = _S_STR
+                else:
+                    self._raw = []
+                    self._raw_depth = 0
+                    self._raw_in_str = False
+                    self._raw_escape = False
+                    self._state = _S_RAW
+                    self._raw_char(ch, events)
+            elif st == _S_AFTER:
+                if ch == ',':
+                    self._state = _S_KEY
+                elif ch == '}':
+                    self._state = _S_DONE
+                    self.done = True
+            else:
+                break
+        if chars:
+            events.append(('chars', self._cur_key, ''.join(chars)))
+        return events
+
+    def partial(self, key):
+        """字段当前已解析的内容（字符串字段未闭合时返回已收到的部分）。"""
+        if key in self.fields:
+            return self.fields[key]
+        if self._state == _S_STR and self._cur_key == key:
+            return ''.join(self._str)
+        return None
+
+    # ---------------- 内部 ----------------
+    def _close_field(self, value, events):
+        self.fields[self._cur_key] = value
+        events.append(('field', self._cur_key, value))
+        self._state = _S_AFTER
+
+    def _string_char(self, ch):
+        """处理字符串内的一个字符；返回产出的字符（可能为空串），字符串结束返回 None。"""
+        if self._unicode is not None:
+            self._unicode.append(ch)
+            if len(self._unicode) < 4:
+                return ''
+            try:
+                code = int(''.join(self._unicode), 16)
+            except ValueError:
+                code = 0xFFFD
+            self._unicode = None
+            if 0xD800 <= code <= 0xDBFF:
+                self._high_surrogate = code
+                return ''
+            if 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+                code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+            self._high_surrogate = None
+            return chr(code)
+        if self._escape:
+            self._escape = False
+            if ch == 'u':
+                self._unicode = []
+                return ''
+            return _ESCAPES.get(ch, ch)
+        if ch == '\\':
+            self._escape = True
+            return ''
+        if ch == '"':
+            return None
+        return ch
+
+    def _raw_char(self, ch, events):
+        if self._raw_in_str:
+            self._raw.append(ch)
+            if self._raw_escape:
+                self._raw_escape = False
+            elif ch == '\\':
+                self._raw_escape = True
+            elif ch == '"':
+                self._raw_in_str = False
+            return
+        if self._raw_depth == 0 and ch in ',}':
+            text = ''.join(self._raw).strip()
+            try:
+                value = json.loads(text)
+            except Exception:
+                value = text
+            self._close_field(value, events)
+            if ch == '}':
+                self._state = _S_DONE
+                self.done = True
+            else:
+                self._state = _S_KEY
+            return
+        if ch == '"':
+            self._raw_in_str = True
+        elif ch in '{[':
+            self._raw_depth += 1
+        elif ch in '}]':
+            self._raw_depth -= 1
+        self._raw.append(ch)
@@ -0,0 +1,239 @@
+"""
+MotionClip
+
+紧凑的二进制动作片段格式（.rbmc），用于保存长时间的舞蹈/编排动作。
+
+文件布局（小端序）：
+- 头部 20 字节：magic b'RBMC' | version(uint16) | servo_count(uint16) | fps(float32) | frame_count(uint32) | reserved(uint32)
+- 舵机 ID 列表：servo_count 个 uint16
+- 位置矩阵：frame_count x servo_count 个 uint16（按帧连续存放）
+
+读取时通过 mmap（有 numpy 时用 numpy.memmap）按需映射，长片段无需整体加载即可立即开始播放。
+
+使用示例：
+    clip = MotionClip.open('data/motions/dance.rbmc')
+    for targets in clip.iter_frames():
+        ...
+    clip.close()
+
+    # 将内置动作转换为片段
+    python -m services.motion_clip --convert-builtin
+"""
+
+import os
+import mmap
+import struct
+from array import array
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+CLIP_MAGIC = b'RBMC'
+CLIP_VERSION = 1
+CLIP_EXT = '.rbmc'
+_HEADER = struct.Struct('<4sHHfII')
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CLIP_DIR = os.path.join(ROOT, 'data', 'motions')
+
+
+class MotionClip:
+    """只读的动作片段；位置矩阵通过内存映射访问。"""
+
+    def __init__(self, path, servo_ids, fps, frame_count, data_offset):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.servo_ids = list(servo_ids)
+        self.fps = float(fps)
+        self.frame_count = int(frame_count)
+        self._data_offset = int(data_offset)
+        self._fp = None
+        self._mm = None
+        self._matrix = None
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            head = f.read(_HEADER.size)
+            if len(head) < _HEADER.size:
+                raise ValueError(f'片段文件过短: {path}')
+            magic, version, count, fps, frames, _reserved = _HEADER.unpack(head)
+            if magic != CLIP_MAGIC:
+                raise ValueError(f'不是 RBMC 片段文件: {path}')
+            if version != CLIP_VERSION:
+                raise ValueError(f'不支持的片段版本 {version}: {path}')
+            ids = array('H')
+            ids.frombytes(f.read(2 * count))
+        clip = cls(path, ids.tolist(), fps, frames, _HEADER.size + 2 * count)
+        clip._map()
+        return clip
+
+    def _map(self):
+        if self.frame_count <= 0 or not self.servo_ids:
+            return
+        shape = (self.frame_count, len(self.servo_ids))
+        if np is not None:
+            self._matrix = np.memmap(self.path, dtype='<u2', mode='r', offset=self._data_offset, shape=shape)
+            return
+        # 无 numpy 时退回标准库 mmap + memoryview（零拷贝）
+        self._fp = open(self.path, 'rb')
+        self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        end = self._data_offset + 2 * shape[0] * shape[1]
+        self._matrix = memoryview(self._mm)[self._data_offset:end].cast('H')
+
+    def close(self):
+        if self._matrix is not None:
+            try:
+                if isinstance(self._matrix, memoryview):
+                    self._matrix.release()
+                else:
+                    mm = getattr(self._matrix, '_mmap', None)
+                    if mm is not None:
+                        mm.close()
+            except Exception:
+                pass
+        self._matrix = None
+        try:
+            if self._mm:
+                self._mm.close()
+        except Exception:
+            pass
+        self._mm = None
+        try:
+            if self._fp:
+                self._fp.close()
+        except Exception:
+            pass
+        self._fp = None
+
+    @property
+    def duration(self):
+        return self.frame_count / self.fps if self.fps > 0 else 0.0
+
+    def frame(self, index):
+        """返回第 index 帧的 {servo_id: position}。"""
+        n = len(self.servo_ids)
+        if self._matrix is None or not (0 <= index < self.frame_count):
+            return {}
+        if isinstance(self._matrix, memoryview):
+            row = self._matrix[index * n:(index + 1) * n].tolist()
+        else:
+            row = self._matrix[index].tolist()
+        return dict(zip(self.servo_ids, row))
+
+    def iter_frames(self, start=0):
+        for i in range(max(0, int(start)), self.frame_count):
+            yield self.frame(i)
+
+
+def write_clip(path, servo_ids, fps, frames):
+    """写入片段。frames 为逐帧位置序列（与 servo_ids 顺序一致），可为生成器。"""
+    ids = [int(sid) for sid in servo_ids]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    count = 0
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(CLIP_MAGIC, CLIP_VERSION, len(ids), float(fps), 0, 0))
+        f.write(array('H', ids).tobytes())
+        for row in frames:
+            vals = array('H', (max(0, min(4095, int(p))) for p in row))
+            if len(vals) != len(ids):
+                raise ValueError('帧长度与舵机数量不一致')
+            f.write(vals.tobytes())
+            count += 1
+        # 回填帧数
+        f.seek(0)
+        f.write(_HEADER.pack(CLIP_MAGIC, CLIP_VERSION, len(ids), float(fps), count, 0))
+    return count
+
+
+def find_clip(name, clip_dir=None):
+    """按名称在片段目录中查找 .rbmc 文件，未找到返回 None。"""
+    name = str(name or '').strip()
+    if not name or os.sep in name or '/' in name:
+        return None
+    path = os.path.join(clip_dir or CLIP_DIR, name + CLIP_EXT)
+    return path if os.path.exists(path) else None
+
+
+# ---------------- 内置动作转换 ----------------
+class _VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def sleep(self, sec):
+        self.now += max(0.0, float(sec))
+
+
+class _RecordingServo:
+    """记录 MotionController 发出的同步指令（时间取自虚拟时钟）。"""
+
+    def __init__(self, clock, servo_ids):
+        self._clock = clock
+        self.servo_info_dict = {int(sid): None for sid in servo_ids}
+        self.commands = []
+
+    def move_sync(self, targets, time_ms=100):
+        self.commands.append((self._clock.now, dict(targets), int(time_ms)))
+
+
+def _rasterize(commands, neutral, fps):
+    """将 (t, targets, runtime_ms) 指令序列按舵机线性插值采样为逐帧矩阵。"""
+    servo_ids = sorted(set(neutral.keys()) | {sid for _t, tg, _ms in commands for sid in tg})
+    # 每个舵机的当前运动段: (t0, p0, t1, p1)
+    seg = {sid: (0.0, float(neutral.get(sid, 2048)), 0.0, float(neutral.get(sid, 2048))) for sid in servo_ids}
+
+    def _pos_at(sid, t):
+        t0, p0, t1, p1 = seg[sid]
+        if t >= t1 or t1 <= t0:
+            return p1
+        return p0 + (p1 - p0) * (t - t0) / (t1 - t0)
+
+    end_t = max([t + ms / 1000.0 for t, _tg, ms in commands] or [0.0])
+    frame_count = int(end_t * fps) + 1
+    step = 1.0 / fps
+    frames = []
+    ci = 0
+    for k in range(frame_count):
+        t = k * step
+        while ci < len(commands) and commands[ci][0] <= t:
+            ct, targets, ms = commands[ci]
+            for sid, pos in targets.items():
+                seg[sid] = (ct, _pos_at(sid, ct), ct + max(1, ms) / 1000.0, float(pos))
+            ci += 1
+        frames.append([int(round(_pos_at(sid, t))) for sid in servo_ids])
+    return servo_ids, frames
+
+
+def convert_builtin_action(action, out_path=None, fps=50, neutral_positions=None, clip_dir=None):
+    """在虚拟时钟下运行内置动作，采样为片段文件，返回写入路径。"""
+    from .motion_controller import MotionController
+
+    neutral = dict(neutral_positions or {sid: 2048 for sid in range(1, 26)})
+    clock = _VirtualClock()
+    servo = _RecordingServo(clock, range(1, 26))
+    mc = MotionController(servo, neutral_positions=neutral)
+    mc.sleep_fn = clock.sleep
+    if not mc.run_action(action) or not servo.commands:
+        raise ValueError(f'内置动作无输出: {action}')
+    servo_ids, frames = _rasterize(servo.commands, neutral, float(fps))
+    path = out_path or os.path.join(clip_dir or CLIP_DIR, f'{action}{CLIP_EXT}')
+    write_clip(path, servo_ids, fps, frames)
+    return path
+
+
+BUILTIN_ACTIONS = ('walk', 'nod', 'shake_head', 'wave', 'sit', 'stand', 'twist')
+
+
+if __name__ == '__main__':
+    import sys
+
+    if '--convert-builtin' in sys.argv:
+        for name in BUILTIN_ACTIONS:
+            p = convert_builtin_action(name)
+            c = MotionClip.open(p)
+            print(f'{name}: {c.frame_count} frames x {len(c.servo_ids)} servos @ {c.fps:.0f}Hz -> {p}')
+            c.close()
+    else:
+        print('usage: python -m services.motion_clip --convert-builtin')
@@ -16,10 +16,13 @@ MotionController
 注意：本实现为工程级起点，具体 gait 参数和增益需在实机上调参。
 """
 
+import os
 import time
 import threading
 import math
 
+from .motion_clip import MotionClip, find_clip
+
 class MotionController:
     def __init__(self, servo_manager, balance_ctrl=None, imu_reader=None, neutral_positions=None):
         """
@@ -45,8 +48,38 @@ class MotionController:
 
         self._lock = threading.Lock()
         self._running = False
+        # 抢占标志：置位后等待立即返回、指令不再下发，使当前动作序列快速结束
+        self._cancel = threading.Event()
+        # 可替换的等待函数（动作转换/回放时注入虚拟时钟）
+        self.sleep_fn = time.sleep
+        # 动作片段目录与已打开片段缓存
+        self.clip_dir = None
+        self._clips = {}
+        # 连续步态引擎（由控制循环驱动）；挂接后 walk/turn 只下发速度指令，
+        # 其他动作执行前先 release_gait()，总线上不会同时有步态与动作两个写者
+        self.gait = None
 
     # ---------- 辅助方法 ----------
+    def _sleep(self, sec):
+        if self._cancel.is_set():
+            return
+        if self.sleep_fn is time.sleep:
+            self._cancel.wait(max(0.0, sec))
+        else:
+            self.sleep_fn(sec)
+
+    def cancel(self):
+        """抢占当前动作（不回中位，由后续 stop/动作接管）。"""
+        with self._lock:
+            self._running = False
+        self._cancel.set()
+
+    def reset_cancel(self):
+        self._cancel.clear()
+
+    def is_cancelled(self):
+        return self._cancel.is_set()
+
     def _clamp_pos(self, pos):
         try:
             if hasattr(self.servo, 'get_legal_position'):
@@ -66,20 +99,21 @@ class MotionController:
             ids.append(sid)
             poses.append(self._clamp_pos(p))
 
-        if not ids:
+        if not ids or self._cancel.is_set():
             return False
 
         # 若有 balance controller 与 imu，则获取实时补偿并合并
         if self.balance and self.imu:
             try:
                 pitch, roll, yaw = self.imu.get_orientation()
-                balance_offsets = self.balance.compute(pitch, roll, yaw)
-                # 合并：简单相加（仅对存在的 id）
+                balance_targets = self.balance.compute(pitch, roll, yaw)
+                # compute() 返回绝对位置：减去平衡器的中位得到补偿量，再叠加到动作目标上
+                balance_neutral = getattr(self.balance, 'neutral', None) or {}
                 for i, sid in enumerate(ids):
-                    off = balance_offsets.get(sid, 0)
-                    poses[i] = self._clamp_pos(poses[i] + off - self.neutral.get(sid, 0) )
-                    # convert back to absolute by adding neutral
-                    poses[i] = self._clamp_pos(self.neutral.get(sid, 0) + poses[i])
+                    if sid not in balance_targets:
+                        continue
+                    off = balance_targets[sid] - balance_neutral.get(sid, self.neutral.get(sid, 2048))
+                    poses[i] = self._clamp_pos(poses[i] + off)
             except Exception:
                 pass
 
@@ -155,7 +189,7 @@ class MotionController:
         targets[sid_lift] = targets.get(sid_lift, 2048) - 400
         targets[sid_elbow] = targets.get(sid_elbow, 2048) - 200
         self._send_targets(targets, runtime_ms=time_ms)
-        time.sleep(time_ms/1000.0 + 0.05)
+        self._sleep(time_ms/1000.0 + 0.05)
 
         # 挥手动作
         for i in range(times):
@@ -164,9 +198,9 @@ class MotionController:
             t1[sid_hand] = t1.get(sid_hand, 2048) + 350
             t2[sid_hand] = t2.get(sid_hand, 2048) - 350
             self._send_targets(t1, runtime_ms=220)
-            time.sleep(0.22)
+            self._sleep(0.22)
             self._send_targets(t2, runtime_ms=220)
-            time.sleep(0.22)
+            self._sleep(0.22)
 
         # 回位
         self._send_targets(self.neutral, runtime_ms=300)
@@ -213,7 +247,7 @@ class MotionController:
             # 右侧微调以保持平衡
             t[self.JOINT['r_ankle_lr']] = t.get(self.JOINT['r_ankle_lr'],2048) + int(60)
             self._send_targets(t, runtime_ms=int(time_per_step_ms/speed))
-            time.sleep(time_per_step_ms/1000.0/speed + 0.02)
+            self._sleep(time_per_step_ms/1000.0/speed + 0.02)
 
             # 收回左腿，换右腿抬起
             t2 = dict(self.neutral)
@@ -223,7 +257,7 @@ class MotionController:
             t2[self.JOINT['r_knee']] = t2.get(self.JOINT['r_knee'],2048) + int(step_height)
             t2[self.JOINT['l_ankle_lr']] = t2.get(self.JOINT['l_ankle_lr'],2048) - int(60)
             self._send_targets(t2, runtime_ms=int(time_per_step_ms/speed))
-            time.sleep(time_per_step_ms/1000.0/speed + 0.02)
+            self._sleep(time_per_step_ms/1000.0/speed + 0.02)
 
         # 结束回中
         self.goto_neutral(time_ms=300)
@@ -232,6 +266,7 @@ class MotionController:
     def stop(self):
         with self._lock:
             self._running = False
+        self._cancel.clear()
         # 立即回中以保证安全
         self.goto_neutral(time_ms=300)
 
@@ -242,9 +277,9 @@ class MotionController:
         base = int(self.neutral.get(sid, 2048))
         for _ in range(max(1, int(times))):
             self._send_targets({sid: base + int(amplitude)}, runtime_ms=time_ms)
-            time.sleep(max(0.05, time_ms / 1000.0))
+            self._sleep(max(0.05, time_ms / 1000.0))
             self._send_targets({sid: base - int(amplitude // 2)}, runtime_ms=time_ms)
-            time.sleep(max(0.05, time_ms / 1000.0))
+            self._sleep(max(0.05, time_ms / 1000.0))
         self._send_targets({sid: base}, runtime_ms=time_ms)
         return True
 
@@ -255,16 +290,64 @@ class MotionController:
         base = int(self.neutral.get(sid, 2048))
         for _ in range(max(1, int(times))):
             self._send_targets({sid: base + int(amplitude)}, runtime_ms=time_ms)
-            time.sleep(max(0.05, time_ms / 1000.0))
+            self._sleep(max(0.05, time_ms / 1000.0))
             self._send_targets({sid: base - int(amplitude)}, runtime_ms=time_ms)
-            time.sleep(max(0.05, time_ms / 1000.0))
+            self._sleep(max(0.05, time_ms / 1000.0))
         self._send_targets({sid: base}, runtime_ms=time_ms)
         return True
 
+    def head_targets(self, yaw_offset, pitch_offset):
+        """颈部 yaw/pitch 相对中位的偏移 -> {舵机ID: 绝对位置}。"""
+        sid_yaw = self.JOINT.get('neck_yaw')
+        sid_pitch = self.JOINT.get('neck_pitch')
+        targets = {}
+        if sid_yaw:
+            targets[sid_yaw] = self._clamp_pos(int(self.neutral.get(sid_yaw, 2048)) + int(yaw_offset))
+        if sid_pitch:
+            targets[sid_pitch] = self._clamp_pos(int(self.neutral.get(sid_pitch, 2048)) + int(pitch_offset))
+        return targets
+
+    def set_head(self, yaw_offset, pitch_offset, runtime_ms=60):
+        """以相对中位的偏移设置颈部 yaw/pitch（视觉跟随等高频小步指令）。"""
+        targets = self.head_targets(yaw_offset, pitch_offset)
+        if not targets:
+            return False
+        return self._send_targets(targets, runtime_ms=runtime_ms)
+
+    def release_gait(self, timeout=1.5):
+        """停止步态并等待主循环把幅值收敛回站姿，然后解除挂接。
+
+        超时（主循环暂停同步写等）时直接清零步态，避免之后与动作同时写总线。
+        """
+        gait = self.gait
+        if gait is None:
+            return
+        gait.stop()
+        for _ in range(max(1, int(timeout / 0.02))):
+            if not gait.is_active:
+                break
+            self.sleep_fn(0.02)
+        else:
+            gait.reset()
+        self.gait = None
+
     def run_action(self, action):
         action = str(action or '').strip().lower()
         if action in ('', 'none'):
             return True
+        if self.gait is not None:
+            # 与旧的 walk(steps=2) 一致：单次指令走两步后自动停下；持续行走用 GaitEngine.set_command
+            if action == 'walk':
+                self.gait.set_command(forward=1.0, steps=2)
+                return True
+            if action in ('turn_left', 'turn_right'):
+                self.gait.set_command(turn=0.6 if action == 'turn_left' else -0.6, steps=2)
+                return True
+            self.release_gait()
+            if action == 'stop':
+                self._cancel.clear()
+                self.goto_neutral(time_ms=300)
+                return True
         if action == 'walk':
             return self.walk(steps=2)
         if action == 'stop':
@@ -282,8 +365,65 @@ class MotionController:
             return self.stand()
         if action == 'twist':
             return self.twist(angle_deg=25)
+        # 非内置动作：按名称查找 data/motions 下的片段
+        if self._get_clip(action) is not None:
+            return self.play_clip(action)
         return False
 
+    # ---------- 动作片段 ----------
+    def _get_clip(self, name):
+        clip = self._clips.get(name)
+        if clip is not None:
+            return clip
+        path = find_clip(name, self.clip_dir)
+        if not path:
+            return None
+        try:
+            clip = MotionClip.open(path)
+        except Exception:
+            return None
+        self._clips[name] = clip
+        return clip
+
+    def load_clip(self, name, path):
+        """注册外部片段文件，之后可通过 run_action(name) 播放。"""
+        old = self._clips.pop(name, None)
+        if old is not None:
+            old.close()
+        self._clips[name] = MotionClip.open(os.fspath(path))
+        return self._clips[name]
+
+    def play_clip(self, clip, speed=1.0):
+        """按帧率流式播放片段（clip 可为名称或 MotionClip）。stop() 可中断。"""
+        if not isinstance(clip, MotionClip):
+            clip = self._get_clip(str(clip))
+        if clip is None or clip.frame_count <= 0 or clip.fps <= 0:
+            return False
+        speed = max(0.1, float(speed))
+        period = 1.0 / (clip.fps * speed)
+        runtime_ms = max(20, int(period * 1000))
+        with self._lock:
+            self._running = True
+        realtime = self.sleep_fn is time.sleep
+        t0 = time.monotonic()
+        i = 0
+        while i < clip.frame_count:
+            if not self._running or self._cancel.is_set():
+                return False
+            self._send_targets(clip.frame(i), runtime_ms=runtime_ms)
+            if realtime:
+                # 以片段时间轴为准：落后时跳帧而不是累积延迟
+                i = max(i + 1, int((time.monotonic() - t0) / period) + 1)
+                wait = t0 + i * period - time.monotonic()
+                if wait > 0:
+                    self._sleep(wait)
+            else:
+                i += 1
+                self._sleep(period)
+        with self._lock:
+            self._running = False
+        return True
+
 
 if __name__ == '__main__':
     print('MotionController module - integrate with your servo manager/IMU for testing')
@@ -0,0 +1,176 @@
+"""
+姿态融合滤波（互补滤波，重力向量形式）
+
+陀螺仪给出角速度（rad/s），短时精确但积分会漂移；加速度计给出重力方向，长期稳定但噪声大。
+滤波在设备坐标系中维护单位重力向量 g：
+    预测：g <- g + (g × ω) * dt          （机体转动 ω 时重力在机体系中反向转动）
+    校正：g <- normalize(a * g + (1 - a) * accel),   a = tau / (tau + dt)
+向量形式在任何安装姿态下都没有奇异点（欧拉角 atan2 在手机竖直横屏安装时会奇异）。
+
+输出为相对“安装参考姿态”的倾角（度，已限制在 ±180°）：
+- 启动后的前 ref_window_sec 秒对重力方向取平均作为参考姿态；calibrate() 可随时重新取参考
+- 以参考重力方向为 z'，取与其最不平行的两个设备轴（按 x/y/z 顺序）正交化为 x'、y'，
+  angle_x / angle_y 分别为绕 x' / y' 的倾角。手机平放时 x'、y' 即设备 x、y
+- 参考姿态下输出为 (0, 0)，只有相对安装姿态倾斜接近 90° 时才会接近奇异
+- angle_z 为陀螺积分的航向（无磁力计校正），calibrate() 时归零
+
+使用：
+    f = ComplementaryFilter(tau=0.5)
+    ax, ay, az = f.update((gx, gy, gz), (ax, ay, az), dt)
+    f.calibrate()      # 机器人摆正后重新取参考姿态
+"""
+
+import math
+
+_RAD2DEG = 180.0 / math.pi
+
+
+def _norm(v):
+    n = math.sqrt(v[0] * v[0] + v[1] * v[1] + v[2] * v[2])
+    if n <= 1e-9:
+        return None
+    return (v[0] / n, v[1] / n, v[2] / n)
+
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _cross(a, b):
+    return (
+        a[1] * b[2] - a[2] * b[1],
+        a[2] * b[0] - a[0] * b[2],
+        a[0] * b[1] - a[1] * b[0],
+    )
+
+
+def _wrap180(deg):
+    return (deg + 180.0) % 360.0 - 180.0
+
+
+def map_axes(mode, dx, dy, dz):
+    """设备倾角 (x', y', 航向) 到机器人 (pitch, roll, yaw) 的轴映射；mode 为 normal / swapped。"""
+    if mode == "swapped":
+        return -dx, dy, dz
+    return dy, -dx, dz
+
+
+class ComplementaryFilter:
+    def __init__(self, tau=0.5, gyro_leak_tau=8.0, max_dt=0.2, ref_window_sec=1.0):
+        """
+        tau: 加速度计校正时间常数（秒），越大越信任陀螺
+        gyro_leak_tau: 无加速度计时重力估计回到参考姿态的时间常数，抑制纯积分漂移
+        max_dt: 单步最大积分间隔，传感器停顿后避免一次性跳变
+        ref_window_sec: 启动/校准后对重力方向取平均作为参考姿态的时长
+        """
+        self.tau = float(tau)
+        self.gyro_leak_tau = float(gyro_leak_tau)
+        self.max_dt = float(max_dt)
+        self.ref_window_sec = float(ref_window_sec)
+        self.reset()
+
+    def reset(self):
+        self.angle_x = 0.0
+        self.angle_y = 0.0
+        self.angle_z = 0.0
+        self._g = None            # 当前重力方向估计（单位向量，设备坐标系）
+        self._ref = None          # 参考姿态的重力方向
+        self._basis = None        # (x', y', z')
+        self._ref_sum = None
+        self._ref_elapsed = 0.0
+        self._initialized = False
+
+    def calibrate(self):
+        """以当前（及随后 ref_window_sec 内）的重力方向为新的参考姿态，航向归零。"""
+        self._ref = None
+        self._basis = None
+        self._ref_sum = None
+        self._ref_elapsed = 0.0
+        self.angle_z = 0.0
+        if self._g is not None:
+            self._set_reference(self._g)
+            self._ref_sum = self._g
+
+    @property
+    def reference_ready(self):
+        """参考姿态是否已采集完成。"""
+        return self._ref is not None and self._ref_elapsed >= self.ref_window_sec
+
+    @staticmethod
+    def accel_vector(accel):
+        """归一化重力向量；数据无效或明显偏离 1g（剧烈运动/自由落体）时返回 None。"""
+        try:
+            ax, ay, az = float(accel[0]), float(accel[1]), float(accel[2])
+        except Exception:
+            return None
+        norm = math.sqrt(ax * ax + ay * ay + az * az)
+        if norm < 4.0 or norm > 16.0:
+            return None
+        return (ax / norm, ay / norm, az / norm)
+
+    def _set_reference(self, g):
+        ref = _norm(g)
+        if ref is None:
+            return
+        axes = ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0))
+        # 去掉与参考重力最平行的设备轴，剩余两轴按原顺序正交化
+        drop = max(range(3), key=lambda i: abs(ref[i]))
+        first = axes[[i for i in range(3) if i != drop][0]]
+        d = _dot(first, ref)
+        ex = _norm((first[0] - d * ref[0], first[1] - d * ref[1], first[2] - d * ref[2]))
+        ey = _cross(ref, ex)
+        self._ref = ref
+        self._basis = (ex, ey, ref)
+
+    def tilt_angles(self, g):
+        """重力方向 g 相对参考姿态的倾角 (angle_x, angle_y)，单位度。"""
+        if self._basis is None or g is None:
+            return 0.0, 0.0
+        ex, ey, ez = self._basis
+        c1, c2, c3 = _dot(g, ex), _dot(g, ey), _dot(g, ez)
+        angle_x = math.atan2(c2, c3) * _RAD2DEG
+        angle_y = math.atan2(-c1, math.sqrt(c2 * c2 + c3 * c3)) * _RAD2DEG
+        return _wrap180(angle_x), _wrap180(angle_y)
+
+    def update(self, gyro, accel, dt):
+        """gyro: (gx, gy, gz) rad/s；accel: (ax, ay, az) m/s² 或 None；dt: 秒。"""
+        dt = max(0.0, min(self.max_dt, float(dt)))
+        acc = self.accel_vector(accel) if accel is not None else None
+
+        if not self._initialized:
+            if acc is None:
+                return self.angle_x, self.angle_y, self.angle_z
+            # 首个有效样本直接初始化重力方向与参考姿态，避免启动时缓慢收敛
+            self._g = acc
+            self._set_reference(acc)
+            self._ref_sum = acc
+            self._initialized = True
+
+        try:
+            gx, gy, gz = float(gyro[0]), float(gyro[1]), float(gyro[2])
+        except Exception:
+            gx = gy = gz = 0.0
+
+        g = self._g
+        w = _cross(g, (gx, gy, gz))
+        g = (g[0] + w[0] * dt, g[1] + w[1] * dt, g[2] + w[2] * dt)
+        if acc is not None:
+            a = self.tau / (self.tau + dt) if (self.tau + dt) > 0 else 1.0
+            g = (a * g[0] + (1.0 - a) * acc[0], a * g[1] + (1.0 - a) * acc[1], a * g[2] + (1.0 - a) * acc[2])
+        elif self.gyro_leak_tau > 0 and self._ref is not None:
+            k = dt / (self.gyro_leak_tau + dt)
+            ref = self._ref
+            g = (g[0] + k * (ref[0] - g[0]), g[1] + k * (ref[1] - g[1]), g[2] + k * (ref[2] - g[2]))
+        self._g = _norm(g) or self._g
+
+        # 参考姿态采集窗口内对加速度计方向取平均
+        if self._ref_elapsed < self.ref_window_sec:
+            self._ref_elapsed += dt
+            if acc is not None:
+                s = self._ref_sum or (0.0, 0.0, 0.0)
+                self._ref_sum = (s[0] + acc[0], s[1] + acc[1], s[2] + acc[2])
+                self._set_reference(self._ref_sum)
+
+        self.angle_x, self.angle_y = self.tilt_angles(self._g)
+        self.angle_z = _wrap180(self.angle_z + gz * _RAD2DEG * dt)
+        return self.angle_x, self.angle_y, self.angle_z
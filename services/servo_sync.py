@@ -0,0 +1,114 @@
+"""
+ServoSyncThrottle
+
+主循环（_update_loop）的平衡补偿下发节流，离线回放（services/session_replay.py）共用同一实现：
+
+- 重算：姿态变化超过 compute_pose_threshold_deg 或距上次重算超过 compute_idle_period 才调用
+  BalanceController.compute()，否则复用上次结果（复用的是不含步态偏移的平衡目标）
+- 步态：传入 GaitEngine 时每个周期在平衡目标上叠加步态偏移，并按 active_period 持续下发
+- 覆盖：overlay（{舵机ID: 绝对位置}，如头部跟踪的颈部目标）最后替换对应舵机，保证这些舵机只有本循环一个写者
+- 下发：姿态或目标变化时按 active_period、无变化时按 idle_period 发送
+
+使用：
+    sync = ServoSyncThrottle()
+    targets = sync.update(now, pitch, roll, yaw, balance.compute, gait=gait, dt=dt, overlay=None)
+    if targets is not None:
+        servo_bus.move_sync(targets, time_ms=SYNC_TIME_MS)
+"""
+
+# 主循环同步写的舵机运行时间（ms），回放据此区分平衡同步写与动作指令
+SYNC_TIME_MS = 100
+
+
+def targets_changed(new_targets, old_targets, threshold=3):
+    try:
+        if not isinstance(new_targets, dict) or not isinstance(old_targets, dict):
+            return True
+        if new_targets.keys() != old_targets.keys():
+            return True
+        th = int(max(0, threshold))
+        for sid, new_pos in new_targets.items():
+            old_pos = old_targets.get(sid)
+            if old_pos is None:
+                return True
+            try:
+                if abs(int(new_pos) - int(old_pos)) > th:
+                    return True
+            except Exception:
+                return True
+        return False
+    except Exception:
+        return True
+
+
+class ServoSyncThrottle:
+    def __init__(self, active_period=0.1, idle_period=0.22, pose_threshold_deg=0.5, target_threshold=3,
+                 compute_pose_threshold_deg=0.2, compute_idle_period=None):
+        self.active_period = float(active_period)
+        self.idle_period = float(idle_period)
+        self.pose_threshold_deg = float(pose_threshold_deg)
+        self.target_threshold = int(target_threshold)
+        self.compute_pose_threshold_deg = float(compute_pose_threshold_deg)
+        self.compute_idle_period = float(compute_idle_period if compute_idle_period is not None else idle_period)
+        self.reset()
+
+    def reset(self):
+        self.last_targets = None      # 最近一次下发的目标（含步态偏移）
+        self.base_targets = None      # 最近一次 compute() 的结果
+        self.compute_time = 0.0
+        self.compute_pitch = 0.0
+        self.compute_roll = 0.0
+        self.send_time = 0.0
+        self.send_pitch = 0.0
+        self.send_roll = 0.0
+        self.computes = 0
+        self.sends = 0
+
+    def update(self, now, pitch, roll, yaw, compute, gait=None, dt=0.0, overlay=None):
+        """推进一个主循环周期；需要下发时返回目标 dict，否则返回 None。"""
+        pitch = float(pitch)
+        roll = float(roll)
+        compute_due = (now - self.compute_time) >= max(0.05, self.compute_idle_period)
+        compute_pose_changed = (
+            self.base_targets is None
+            or abs(pitch - self.compute_pitch) >= self.compute_pose_threshold_deg
+            or abs(roll - self.compute_roll) >= self.compute_pose_threshold_deg
+        )
+        if compute_pose_changed or compute_due:
+            targets = compute(pitch, roll, yaw)
+            self.base_targets = dict(targets or {})
+            self.compute_time = now
+            self.compute_pitch = pitch
+            self.compute_roll = roll
+            self.computes += 1
+        else:
+            targets = self.base_targets
+
+        if gait is not None and isinstance(targets, dict):
+            targets = gait.apply(dict(targets), dt)
+        if overlay and isinstance(targets, dict):
+            targets = dict(targets)
+            targets.update(overlay)
+
+        pose_changed = (
+            abs(pitch - self.send_pitch) >= self.pose_threshold_deg
+            or abs(roll - self.send_roll) >= self.pose_threshold_deg
+        )
+        target_changed = targets_changed(targets, self.last_targets, threshold=self.target_threshold)
+        elapsed = now - self.send_time
+
+        if self.last_targets is None:
+            should_send = True
+        elif gait is not None or pose_changed or target_changed:
+            should_send = elapsed >= self.active_period
+        else:
+            should_send = elapsed >= self.idle_period
+        if not should_send:
+            return None
+
+        self.send_time = now
+        self.last_targets = dict(targets or {})
+        self.send_pitch = pitch
+        self.send_roll = roll
+        self.sends += 1
+        return targets
@@ -0,0 +1,393 @@
+"""
+SessionRecorder
+
+运行会话录制：把机器人感知与下发的数据写入追加式二进制日志（.rbsr），用于离线分析与回放。
+
+录制内容：
+- IMU 样本（IMUReader 每次发布）
+- 舵机同步/单舵机目标（UartServoManager.sync_set_position / set_position_time）
+- 舵机遥测读取（UartServoManager.read_data_by_name）
+- AI 动作决策（ai_runtime.on_ai_action）
+- 低分辨率摄像头帧（视觉流水线的 recorder 阶段，JPEG）
+
+控制线程只调用 record_*() 把元组追加到内存队列（未开启录制时只做一次全局判空），
+编码与磁盘 I/O 全部在后台写线程中完成；单个文件超过 max_bytes 时自动滚动到下一段。
+
+文件布局（小端序）：
+- 头部 24 字节：magic b'RBSR' | version(uint16) | reserved(uint16) | wall_time(float64) | mono_time(float64)
+- 记录序列：type(uint8) | ts(float64, time.monotonic) | payload_len(uint16) | payload
+
+使用：
+    rec = start_recording('recordings')
+    ...
+    stop_recording()
+    for kind, ts, data in iter_records('recordings/session_20250101_120000_123_000.rbsr'):
+        ...
+"""
+
+import logging
+import os
+import struct
+import threading
+import time
+from collections import deque
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+SESSION_MAGIC = b'RBSR'
+SESSION_VERSION = 1
+SESSION_EXT = '.rbsr'
+
+REC_IMU = 1
+REC_TARGETS = 2
+REC_TELEMETRY = 3
+REC_ACTION = 4
+REC_FRAME = 5
+REC_NAMES = {REC_IMU: 'imu', REC_TARGETS: 'targets', REC_TELEMETRY: 'telemetry', REC_ACTION: 'action', REC_FRAME: 'frame'}
+
+_FILE_HEADER = struct.Struct('<4sHHdd')
+_REC_HEADER = struct.Struct('<BdH')
+_IMU = struct.Struct('<fffq')
+_COUNT = struct.Struct('<H')
+_TARGET = struct.Struct('<HHH')
+_TELEMETRY = struct.Struct('<Hd')
+_FRAME = struct.Struct('<HH')
+
+
+def _pack_str(s):
+    b = str(s or '').encode('utf-8')[:255]
+    return bytes((len(b),)) + b
+
+
+def _unpack_str(buf, off):
+    n = buf[off]
+    return buf[off + 1:off + 1 + n].decode('utf-8', errors='ignore'), off + 1 + n
+
+
+def _encode(kind, ts, args):
+    if kind == REC_IMU:
+        pitch, roll, yaw, seq = args
+        payload = _IMU.pack(pitch, roll, yaw, int(seq))
+    elif kind == REC_TARGETS:
+        ids, positions, runtimes = args
+        n = min(len(ids), len(positions), 0xFFFF)
+        parts = [_COUNT.pack(n)]
+        for i in range(n):
+            rt = runtimes[i] if runtimes is not None and i < len(runtimes) else 0
+            parts.append(_TARGET.pack(int(ids[i]) & 0xFFFF, max(0, min(0xFFFF, int(positions[i]))), max(0, min(0xFFFF, int(rt or 0)))))
+        payload = b''.join(parts)
+    elif kind == REC_TELEMETRY:
+        sid, name, value = args
+        val = float('nan') if value is None else float(value)
+        payload = _TELEMETRY.pack(int(sid) & 0xFFFF, val) + _pack_str(name)
+    elif kind == REC_ACTION:
+        action, source = args
+        payload = _pack_str(action) + _pack_str(source)
+    elif kind == REC_FRAME:
+        jpeg, width, height = args
+        if len(jpeg) > 0xFFFF - _FRAME.size:
+            return b''
+        payload = _FRAME.pack(int(width) & 0xFFFF, int(height) & 0xFFFF) + bytes(jpeg)
+    else:
+        return b''
+    return _REC_HEADER.pack(kind, ts, len(payload)) + payload
+
+
+class SessionRecorder:
+    def __init__(self, out_dir, prefix='session', max_bytes=32 * 1024 * 1024, flush_interval=0.2, max_pending=200000):
+        """
+        out_dir: 输出目录
+        max_bytes: 单个分段文件大小上限，超过后滚动到新文件
+        flush_interval: 后台写线程的批量写入间隔（秒）
+        max_pending: 内存队列上限，写盘跟不上时丢弃新记录并计数
+        """
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.max_bytes = max(64 * 1024, int(max_bytes))
+        self.flush_interval = float(flush_interval)
+        self.max_pending = int(max_pending)
+
+        self._queue = deque()
+        self._running = False
+        self._thread = None
+        self._fp = None
+        self._segment = 0
+        self._segment_bytes = 0
+        now = time.time()
+        self._session_tag = time.strftime('%Y%m%d_%H%M%S', time.localtime(now)) + f'_{int(now * 1000) % 1000:03d}'
+        self.files = []
+
+        self.started_at = 0.0
+        self.counts = {name: 0 for name in REC_NAMES.values()}
+        self.dropped = 0
+        self.bytes_written = 0
+
+    # ---------------- 生命周期 ----------------
+    def start(self):
+        if self._running:
+            return
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._open_segment()
+        self.started_at = time.monotonic()
+        self._running = True
+        self._thread = threading.Thread(target=self._writer, name='session-recorder', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self._drain()
+        self._close_segment()
+
+    @property
+    def running(self):
+        return self._running
+
+    # ---------------- 追加（控制线程调用） ----------------
+    def append(self, kind, args, ts=None):
+        if len(self._queue) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._queue.append((kind, time.monotonic() if ts is None else ts, args))
+
+    # ---------------- 后台写入 ----------------
+    def _writer(self):
+        while self._running:
+            time.sleep(self.flush_interval)
+            try:
+                self._drain()
+            except Exception as e:
+                logging.warning('Session recorder write failed: %s', e)
+
+    def _drain(self):
+        if self._fp is None:
+            return
+        q = self._queue
+        chunk = []
+        size = 0
+        while q:
+            try:
+                kind, ts, args = q.popleft()
+            except IndexError:
+                break
+            try:
+                rec = _encode(kind, ts, args)
+            except Exception:
+                self.dropped += 1
+                continue
+            if not rec:
+                continue
+            self.counts[REC_NAMES[kind]] += 1
+            chunk.append(rec)
+            size += len(rec)
+            if self._segment_bytes + size >= self.max_bytes:
+                self._write(chunk, size)
+                chunk, size = [], 0
+                self._close_segment()
+                self._segment += 1
+                self._open_segment()
+        if chunk:
+            self._write(chunk, size)
+        self._fp.flush()
+
+    def _write(self, chunk, size):
+        self._fp.write(b''.join(chunk))
+        self._segment_bytes += size
+        self.bytes_written += size
+
+    def _open_segment(self):
+        # 'xb' 独占创建：同一毫秒内启动的两次录制不会覆盖彼此的文件，冲突时改用下一个后缀
+        base = f'{self.prefix}_{self._session_tag}'
+        suffix = 0
+        while True:
+            tag = base if suffix == 0 else f'{base}-{suffix}'
+            path = os.path.join(self.out_dir, f'{tag}_{self._segment:03d}{SESSION_EXT}')
+            try:
+                self._fp = open(path, 'xb')
+                break
+            except FileExistsError:
+                suffix += 1
+        if suffix:
+            self._session_tag = tag[len(self.prefix) + 1:]
+        self._fp.write(_FILE_HEADER.pack(SESSION_MAGIC, SESSION_VERSION, 0, time.time(), time.monotonic()))
+        self._segment_bytes = _FILE_HEADER.size
+        self.files.append(path)
+
+    def _close_segment(self):
+        try:
+            if self._fp:
+                self._fp.close()
+        except Exception:
+            pass
+        self._fp = None
+
+    # ---------------- 统计 ----------------
+    def get_stats(self):
+        return {
+            'running': self._running,
+            'elapsed_s': round(time.monotonic() - self.started_at, 1) if self.started_at else 0.0,
+            'counts': dict(self.counts),
+            'pending': len(self._queue),
+            'dropped': self.dropped,
+            'bytes': self.bytes_written,
+            'segments': len(self.files),
+            'file': self.files[-1] if self.files else '',
+        }
+
+
+# ---------------- 全局录制器与低开销钩子 ----------------
+_active = None
+
+
+def start_recording(out_dir, **kwargs):
+    """开始录制（已在录制时直接返回当前录制器）。"""
+    global _active
+    if _active is not None:
+        return _active
+    rec = SessionRecorder(out_dir, **kwargs)
+    rec.start()
+    _active = rec
+    return rec
+
+
+def stop_recording():
+    """停止录制并返回已完成的录制器（未在录制时返回 None）。"""
+    global _active
+    rec = _active
+    _active = None
+    if rec is not None:
+        rec.stop()
+    return rec
+
+
+def get_active_recorder():
+    return _active
+
+
+def record_imu(ts, pitch, roll, yaw, seq=-1):
+    rec = _active
+    if rec is not None:
+        rec.append(REC_IMU, (pitch, roll, yaw, seq), ts=ts)
+
+
+def record_targets(servo_ids, positions, runtimes=None):
+    rec = _active
+    if rec is not None:
+        rec.append(REC_TARGETS, (tuple(servo_ids), tuple(positions), tuple(runtimes) if runtimes is not None else None))
+
+
+def record_telemetry(servo_id, name, value):
+    rec = _active
+    if rec is not None:
+        rec.append(REC_TELEMETRY, (servo_id, name, value))
+
+
+def record_action(action, source='ai'):
+    rec = _active
+    if rec is not None:
+        rec.append(REC_ACTION, (action, source))
+
+
+def record_frame(ts, jpeg, width, height):
+    rec = _active
+    if rec is not None and jpeg:
+        rec.append(REC_FRAME, (jpeg, width, height), ts=ts)
+
+
+# ---------------- 读取 ----------------
+def read_header(path):
+    with open(path, 'rb') as f:
+        head = f.read(_FILE_HEADER.size)
+    if len(head) < _FILE_HEADER.size:
+        raise ValueError(f'录制文件过短: {path}')
+    magic, version, _reserved, wall, mono = _FILE_HEADER.unpack(head)
+    if magic != SESSION_MAGIC:
+        raise ValueError(f'不是 RBSR 录制文件: {path}')
+    if version != SESSION_VERSION:
+        raise ValueError(f'不支持的录制版本 {version}: {path}')
+    return {'version': version, 'wall_time': wall, 'mono_time': mono}
+
+
+def iter_records(path):
+    """逐条解析录制文件，产出 (kind, ts, data)。末尾不完整的记录被忽略。"""
+    read_header(path)
+    with open(path, 'rb') as f:
+        buf = f.read()
+    off = _FILE_HEADER.size
+    end = len(buf)
+    while off + _REC_HEADER.size <= end:
+        kind, ts, n = _REC_HEADER.unpack_from(buf, off)
+        off += _REC_HEADER.size
+        if off + n > end:
+            break
+        payload = buf[off:off + n]
+        off += n
+        if kind == REC_IMU:
+            p, r, y, seq = _IMU.unpack(payload)
+            yield 'imu', ts, {'pitch': p, 'roll': r, 'yaw': y, 'seq': seq}
+        elif kind == REC_TARGETS:
+            (count,) = _COUNT.unpack_from(payload, 0)
+            targets = {}
+            runtimes = {}
+            for i in range(count):
+                sid, pos, rt = _TARGET.unpack_from(payload, _COUNT.size + i * _TARGET.size)
+                targets[sid] = pos
+                runtimes[sid] = rt
+            yield 'targets', ts, {'targets': targets, 'runtime_ms': runtimes}
+        elif kind == REC_TELEMETRY:
+            sid, val = _TELEMETRY.unpack_from(payload, 0)
+            name, _ = _unpack_str(payload, _TELEMETRY.size)
+            yield 'telemetry', ts, {'servo_id': sid, 'name': name, 'value': None if val != val else val}
+        elif kind == REC_ACTION:
+            action, o = _unpack_str(payload, 0)
+            source, _ = _unpack_str(payload, o)
+            yield 'action', ts, {'action': action, 'source': source}
+        elif kind == REC_FRAME:
+            w, h = _FRAME.unpack_from(payload, 0)
+            yield 'frame', ts, {'width': w, 'height': h, 'jpeg': payload[_FRAME.size:]}
+
+
+def load_session(paths):
+    """读取一个或多个分段，返回按类型分列的数据；IMU 列在有 numpy 时为数组。"""
+    if isinstance(paths, str):
+        paths = [paths]
+    imu = {'ts': [], 'pitch': [], 'roll': [], 'yaw': [], 'seq': []}
+    out = {'imu': imu, 'targets': [], 'telemetry': [], 'action': [], 'frame': []}
+    for path in sorted(paths):
+        for kind, ts, data in iter_records(path):
+            if kind == 'imu':
+                imu['ts'].append(ts)
+                imu['pitch'].append(data['pitch'])
+                imu['roll'].append(data['roll'])
+                imu['yaw'].append(data['yaw'])
+                imu['seq'].append(data['seq'])
+            else:
+                data['ts'] = ts
+                out[kind].append(data)
+    if np is not None:
+        for k in list(imu.keys()):
+            imu[k] = np.asarray(imu[k], dtype=np.int64 if k == 'seq' else np.float64)
+    return out
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2:
+        print('usage: python -m services.session_recorder <file.rbsr> [...]')
+        sys.exit(1)
+    for p in sys.argv[1:]:
+        hdr = read_header(p)
+        counts = {}
+        first = last = None
+        for kind, ts, _data in iter_records(p):
+            counts[kind] = counts.get(kind, 0) + 1
+            first = ts if first is None else first
+            last = ts
+        span = (last - first) if first is not None else 0.0
+        print(f'{p}: start={time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(hdr["wall_time"]))} span={span:.1f}s {counts}')
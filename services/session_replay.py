@@ -0,0 +1,373 @@
+"""
+SessionReplay
+
+确定性回放录制的会话（services/session_recorder.py 生成的 .rbsr）：
+把录制的 IMU 流按虚拟时钟喂给 BalanceController / MotionController，
+由 SimServoManager 接收舵机指令，再与录制中的目标逐条比对。
+
+- 不依赖硬件、不按真实时间等待，回放速度只受计算开销限制
+- 平衡同步写与现场主循环同一路径：在录制的每次同步写时刻（运行时间 SYNC_TIME_MS 的全量目标）
+  读取按 actuation_latency_s 外推的姿态、做轴映射，经 ServoSyncThrottle 的重算/节流后 move_sync
+- 录制中没有主循环同步写时，按 period 从首个 IMU 样本开始逐周期驱动
+- 动作序列使用 MotionController.sleep_fn 注入虚拟时钟
+- 报告每个控制周期的计算耗时（均值/p50/p95/最大）与相对录制时长的加速比
+- 指令比对：按时间最近原则配对（容差默认半个控制周期），统计逐舵机最大/平均偏差
+
+重算阈值、增益与轴映射需与录制时一致，通常直接传入应用的 balance_tuning.json（--tuning）。
+
+使用：
+    rep = SessionReplay.from_files(['recordings/session_xxx_000.rbsr'], period=0.05)
+    report = rep.run()
+
+    python -m services.session_replay recordings/session_xxx_*.rbsr --tuning balance_tuning.json --fail-threshold 2
+"""
+
+import bisect
+import json
+import time
+
+from .balance_ctrl import BalanceController
+from .imu_buffer import IMURingBuffer
+from .motion_controller import MotionController
+from .orientation_filter import map_axes
+from .servo_sync import SYNC_TIME_MS, ServoSyncThrottle
+from .session_recorder import load_session
+
+
+class VirtualClock:
+    def __init__(self, start=0.0):
+        self.now = float(start)
+
+    def sleep(self, sec):
+        self.now += max(0.0, float(sec))
+
+    def advance_to(self, t):
+        if t > self.now:
+            self.now = float(t)
+
+
+class ReplayIMU:
+    """按虚拟时钟逐步放出录制样本，接口与 IMUReader 一致（get_orientation/predict_orientation 等）。"""
+
+    def __init__(self, imu_columns, clock, buffer_size=256):
+        self._ts = list(imu_columns.get('ts', []))
+        self._p = list(imu_columns.get('pitch', []))
+        self._r = list(imu_columns.get('roll', []))
+        self._y = list(imu_columns.get('yaw', []))
+        self._clock = clock
+        self._cursor = 0
+        self._buffer = IMURingBuffer(capacity=buffer_size)
+
+    def _advance(self):
+        now = self._clock.now
+        n = len(self._ts)
+        while self._cursor < n and self._ts[self._cursor] <= now:
+            i = self._cursor
+            self._buffer.push(self._ts[i], self._p[i], self._r[i], self._y[i])
+            self._cursor += 1
+
+    def get_orientation(self):
+        self._advance()
+        s = self._buffer.get_latest()
+        return (s[1], s[2], s[3]) if s is not None else (0.0, 0.0, 0.0)
+
+    def get_sample(self):
+        self._advance()
+        return self._buffer.get_latest()
+
+    def get_orientation_at(self, t):
+        self._advance()
+        val = self._buffer.get_at(t)
+        return val if val is not None else (0.0, 0.0, 0.0)
+
+    def predict_orientation(self, horizon):
+        self._advance()
+        val = self._buffer.predict(horizon, now=self._clock.now)
+        return val if val is not None else (0.0, 0.0, 0.0)
+
+
+class SimServoManager:
+    """舵机仿真：兼容 UartServoManager 的写指令接口，记录带虚拟时间戳的指令并按运行时间线性插值位置。"""
+
+    def __init__(self, clock, servo_ids=range(1, 26), neutral=None):
+        self._clock = clock
+        self.servo_info_dict = {int(sid): None for sid in servo_ids}
+        neutral = neutral or {}
+        self._seg = {sid: (0.0, float(neutral.get(sid, 2048)), 0.0, float(neutral.get(sid, 2048))) for sid in self.servo_info_dict}
+        self.commands = []
+
+    def get_legal_position(self, position):
+        return max(0, min(4095, int(position)))
+
+    def _position(self, sid, t):
+        t0, p0, t1, p1 = self._seg[sid]
+        if t >= t1 or t1 <= t0:
+            return p1
+        return p0 + (p1 - p0) * (t - t0) / (t1 - t0)
+
+    def sync_set_position(self, servo_id_list, position_list, runtime_ms_list):
+        now = self._clock.now
+        targets = {}
+        for sid, pos, ms in zip(servo_id_list, position_list, runtime_ms_list):
+            sid = int(sid)
+            pos = self.get_legal_position(pos)
+            targets[sid] = pos
+            if sid in self._seg:
+                self._seg[sid] = (now, self._position(sid, now), now + max(1, int(ms)) / 1000.0, float(pos))
+        self.commands.append((now, targets))
+
+    def move_sync(self, targets, time_ms=300):
+        if not targets:
+            return
+        ids = [int(sid) for sid in targets]
+        self.sync_set_position(ids, [targets[sid] for sid in targets], [int(time_ms)] * len(ids))
+
+    def set_position_time(self, servo_id, position, runtime_ms=None, time_ms=None):
+        ms = runtime_ms if runtime_ms is not None else (time_ms if time_ms is not None else 300)
+        self.sync_set_position([servo_id], [position], [ms])
+        return True
+
+    def get_position(self, servo_id):
+        sid = int(servo_id)
+        if sid not in self._seg:
+            return None
+        return int(round(self._position(sid, self._clock.now)))
+
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, int(round(q * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+
+def diff_commands(produced, recorded, tolerance):
+    """按时间最近原则配对指令并比较共同舵机的目标位置。
+
+    produced / recorded: [(ts, {sid: pos}), ...]（按时间排序）
+    """
+    rec_ts = [t for t, _tg in recorded]
+    used = set()
+    matched = 0
+    unmatched = 0
+    total = 0
+    abs_sum = 0
+    max_diff = 0
+    per_servo = {}
+    first_mismatch = None
+    for t, targets in produced:
+        i = bisect.bisect_left(rec_ts, t)
+        best = None
+        for j in (i - 1, i):
+            if 0 <= j < len(rec_ts) and j not in used and abs(rec_ts[j] - t) <= tolerance:
+                if best is None or abs(rec_ts[j] - t) < abs(rec_ts[best] - t):
+                    best = j
+        if best is None:
+            unmatched += 1
+            continue
+        used.add(best)
+        matched += 1
+        expected = recorded[best][1]
+        for sid, pos in targets.items():
+            if sid not in expected:
+                continue
+            d = abs(int(pos) - int(expected[sid]))
+            total += 1
+            abs_sum += d
+            if d > per_servo.get(sid, 0):
+                per_servo[sid] = d
+            if d > max_diff:
+                max_diff = d
+            if d and first_mismatch is None:
+                first_mismatch = {'ts': t, 'servo_id': sid, 'expected': int(expected[sid]), 'got': int(pos)}
+    return {
+        'produced': len(produced),
+        'recorded': len(recorded),
+        'matched': matched,
+        'unmatched_produced': unmatched,
+        'unmatched_recorded': len(recorded) - len(used),
+        'max_abs_diff': max_diff,
+        'mean_abs_diff': round(abs_sum / total, 3) if total else 0.0,
+        'per_servo_max': dict(sorted(per_servo.items())),
+        'first_mismatch': first_mismatch,
+    }
+
+
+class SessionReplay:
+    def __init__(self, session, neutral=None, period=0.05, balance_ctrl=None, actuation_latency_s=None,
+                 replay_actions=True, tolerance=None, axis_mode='normal', sync=None):
+        """
+        session: load_session() 的返回值
+        neutral: 舵机中位（默认 1-25 号全部 2048）
+        period: 录制中没有主循环同步写时的驱动周期（秒）
+        balance_ctrl: 待验证的 BalanceController（默认按 neutral 新建）
+        actuation_latency_s: 覆盖 BalanceController 的延迟补偿
+        replay_actions: 是否按录制时刻重放 AI 动作
+        tolerance: 指令配对的时间容差（默认 period/2）
+        axis_mode: 录制时的陀螺轴映射（normal / swapped）
+        sync: ServoSyncThrottle（默认参数与主循环默认值一致）
+        """
+        self.session = session
+        self.neutral = dict(neutral or {sid: 2048 for sid in range(1, 26)})
+        self.period = float(period)
+        self.balance = balance_ctrl or BalanceController(self.neutral, is_landscape=True)
+        if actuation_latency_s is not None:
+            self.balance.actuation_latency_s = float(actuation_latency_s)
+        self.replay_actions = bool(replay_actions)
+        self.tolerance = float(tolerance) if tolerance is not None else self.period / 2.0
+        self.axis_mode = 'swapped' if axis_mode == 'swapped' else 'normal'
+        self.sync = sync or ServoSyncThrottle()
+
+    @classmethod
+    def from_files(cls, paths, **kwargs):
+        return cls(load_session(paths), **kwargs)
+
+    def _span(self):
+        ts = list(self.session['imu']['ts'])
+        if len(ts) < 2:
+            return None
+        return float(ts[0]), float(ts[-1])
+
+    def _sync_ticks(self, t_start, t_end):
+        """录制中主循环同步写的时刻；没有时按 period 均匀生成。"""
+        full = set(self.balance.neutral)
+        ticks = [
+            r['ts'] for r in self.session.get('targets', [])
+            if set(r['targets']) >= full and set(r.get('runtime_ms', {}).values()) == {SYNC_TIME_MS}
+        ]
+        if ticks:
+            return sorted(ticks)
+        ticks = []
+        t = t_start
+        while t <= t_end:
+            ticks.append(t)
+            t += self.period
+        return ticks
+
+    def _read_pose(self, imu):
+        """与主循环相同：按执行延迟外推设备倾角后做轴映射。"""
+        latency = float(getattr(self.balance, 'actuation_latency_s', 0.0) or 0.0)
+        if latency > 0:
+            ax, ay, az = imu.predict_orientation(latency)
+        else:
+            ax, ay, az = imu.get_orientation()
+        return map_axes(self.axis_mode, ax, ay, az)
+
+    def run(self):
+        span = self._span()
+        if span is None:
+            raise ValueError('录制中没有足够的 IMU 样本')
+        t_start, t_end = span
+        wall0 = time.perf_counter()
+
+        # 1) 平衡控制：在主循环同步写时刻经 compute/节流/move_sync 重放
+        clock = VirtualClock(t_start)
+        imu = ReplayIMU(self.session['imu'], clock)
+        servo = SimServoManager(clock, neutral=self.neutral)
+        self.sync.reset()
+        costs = []
+        for t in self._sync_ticks(t_start, t_end):
+            clock.advance_to(t)
+            c0 = time.perf_counter()
+            p, r, y = self._read_pose(imu)
+            targets = self.sync.update(clock.now, p, r, y, self.balance.compute)
+            if targets is not None:
+                servo.move_sync(targets, time_ms=SYNC_TIME_MS)
+            costs.append(time.perf_counter() - c0)
+        produced = list(servo.commands)
+
+        # 2) 动作序列：按录制时刻执行，等待由虚拟时钟推进
+        action_costs = {}
+        actions = [a for a in self.session.get('action', []) if a.get('action')] if self.replay_actions else []
+        if actions:
+            aclock = VirtualClock(t_start)
+            aimu = ReplayIMU(self.session['imu'], aclock)
+            aservo = SimServoManager(aclock, neutral=self.neutral)
+            mc = MotionController(aservo, balance_ctrl=self.balance, imu_reader=aimu, neutral_positions=self.neutral)
+            mc.sleep_fn = aclock.sleep
+            for a in actions:
+                aclock.advance_to(a['ts'])
+                c0 = time.perf_counter()
+                try:
+                    mc.run_action(a['action'])
+                except Exception:
+                    pass
+                action_costs.setdefault(a['action'], []).append(time.perf_counter() - c0)
+            produced.extend(aservo.commands)
+            produced.sort(key=lambda c: c[0])
+
+        wall = time.perf_counter() - wall0
+        recorded = [(r['ts'], r['targets']) for r in self.session.get('targets', [])]
+        recorded.sort(key=lambda c: c[0])
+
+        costs_sorted = sorted(costs)
+        n = len(costs)
+        return {
+            'session_s': round(t_end - t_start, 3),
+            'wall_s': round(wall, 4),
+            'speedup': round((t_end - t_start) / wall, 1) if wall > 0 else 0.0,
+            'ticks': n,
+            'tick_us': {
+                'mean': round(sum(costs) / n * 1e6, 1) if n else 0.0,
+                'p50': round(_percentile(costs_sorted, 0.5) * 1e6, 1),
+                'p95': round(_percentile(costs_sorted, 0.95) * 1e6, 1),
+                'max': round(costs_sorted[-1] * 1e6, 1) if n else 0.0,
+            },
+            'actions': {k: {'count': len(v), 'mean_us': round(sum(v) / len(v) * 1e6, 1)} for k, v in action_costs.items()},
+            'diff': diff_commands(produced, recorded, self.tolerance),
+        }
+
+
+def _load_neutral(path):
+    with open(path, 'r', encoding='utf8') as f:
+        raw = json.load(f)
+    return {int(k): int(v) for k, v in raw.items()}
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    ap = argparse.ArgumentParser(description='回放录制会话并比对舵机指令')
+    ap.add_argument('files', nargs='+', help='.rbsr 录制文件（可多段）')
+    ap.add_argument('--period', type=float, default=0.05, help='录制中没有主循环同步写时的驱动周期（秒）')
+    ap.add_argument('--latency', type=float, default=None, help='覆盖 actuation_latency_s')
+    ap.add_argument('--tuning', default=None,
+                    help='balance_tuning.json（读取增益、actuation_latency_s、轴映射与重算阈值）')
+    ap.add_argument('--axis-mode', choices=('normal', 'swapped'), default=None, help='覆盖陀螺轴映射')
+    ap.add_argument('--neutral', default=None, help='舵机中位 JSON {id: position}')
+    ap.add_argument('--no-actions', action='store_true', help='不重放 AI 动作')
+    ap.add_argument('--fail-threshold', type=int, default=None, help='最大偏差超过该值时返回非零')
+    args = ap.parse_args()
+
+    neutral = _load_neutral(args.neutral) if args.neutral else None
+    bc = BalanceController(neutral or {}, is_landscape=True)
+    sync = ServoSyncThrottle()
+    axis_mode = 'normal'
+    if args.tuning:
+        with open(args.tuning, 'r', encoding='utf8') as f:
+            tuning = json.load(f)
+        bc.gain_p = float(tuning.get('gain_p', bc.gain_p))
+        bc.gain_r = float(tuning.get('gain_r', bc.gain_r))
+        bc.actuation_latency_s = float(tuning.get('actuation_latency_s', bc.actuation_latency_s))
+        axis_mode = str(tuning.get('gyro_axis_mode', axis_mode))
+        sync.compute_pose_threshold_deg = float(
+            tuning.get('sync_compute_pose_threshold_deg', sync.compute_pose_threshold_deg))
+        sync.compute_idle_period = float(tuning.get('sync_compute_idle_period', sync.compute_idle_period))
+    if args.axis_mode:
+        axis_mode = args.axis_mode
+
+    rep = SessionReplay.from_files(
+        args.files,
+        neutral=neutral,
+        period=args.period,
+        balance_ctrl=bc,
+        actuation_latency_s=args.latency,
+        replay_actions=not args.no_actions,
+        axis_mode=axis_mode,
+        sync=sync,
+    )
+    report = rep.run()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.fail_threshold is not None and report['diff']['max_abs_diff'] > args.fail_threshold:
+        sys.exit(1)
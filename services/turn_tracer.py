@@ -0,0 +1,242 @@
+"""
+TurnTracer
+
+端到端对话轮次追踪：记录每轮各阶段的时间点，按 profile 维护各阶段的滚动 p50/p90/p99，
+用于判断该优化哪个阶段。
+
+阶段（均以本轮起点为 0 计算累计耗时 ms）：
+    speech_end        用户说完（VAD 判定语音结束）
+    stt_final         STT 最终结果
+    request_sent      LLM 请求发出
+    first_token       首 token 到达（对冲时为胜出方）
+    action_dispatched 动作在主线程下发（本地意图/缓存命中时很早）
+    first_audio       TTS 开始出声
+    turn_done         本轮 LLM 处理结束
+
+起点为 speech_end；拿不到语音结束时刻时退化为 stt_final，文本输入（无语音）时以提交输入的时刻为起点。
+first_audio 可能晚于 turn_done（TTS 在独立线程排队），轮次在两者都到达或超时后才计入直方图；
+被打断或合并掉的轮次丢弃，不计入。
+
+使用：
+    tracer = TurnTracer()
+    tracer.begin(gen, 'deepseek', speech_end_ts=..., stt_final_ts=...)
+    tracer.mark(gen, 'request_sent')
+    tracer.note_speech(gen)
+    tracer.mark_audio()           # TTS 线程开始播放时调用
+    tracer.mark(gen, 'turn_done')
+    tracer.get_stats()            # {profile: {stage: {n, p50, p90, p99}}}
+    tracer.export_json(path)
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+STAGES = (
+    "speech_end",
+    "stt_final",
+    "request_sent",
+    "first_token",
+    "action_dispatched",
+    "first_audio",
+    "turn_done",
+)
+
+
+class _Histogram:
+    """最近 N 个样本的滚动分位数。"""
+
+    def __init__(self, size):
+        self._values = deque(maxlen=max(1, int(size)))
+
+    def add(self, ms):
+        self._values.append(float(ms))
+
+    def summary(self):
+        values = sorted(self._values)
+        if not values:
+            return {"n": 0, "p50": 0, "p90": 0, "p99": 0}
+
+        def _q(q):
+            idx = min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))
+            return int(values[idx])
+
+        return {"n": len(values), "p50": _q(0.5), "p90": _q(0.9), "p99": _q(0.99)}
+
+
+class _Trace:
+    def __init__(self, gen, profile, origin):
+        self.gen = gen
+        self.profile = profile
+        self.origin = origin
+        self.marks = {}
+        self.has_speech = False
+        self.created = time.time()
+
+
+class TurnTracer:
+    def __init__(self, window=200, audio_timeout_sec=12.0, max_open=16):
+        """
+        window: 每个阶段保留的样本数
+        audio_timeout_sec: turn_done 之后等待 first_audio 的最长时间，超时按无声轮次计入
+        max_open: 同时追踪的轮次上限
+        """
+        self.window = int(window)
+        self.audio_timeout_sec = float(audio_timeout_sec)
+        self.max_open = max(1, int(max_open))
+        self._lock = threading.Lock()
+        self._open = {}         # gen -> _Trace
+        self._hist = {}         # profile -> {stage: _Histogram}
+        self.completed = 0
+        self.cancelled = 0
+        self.expired = 0
+        self.last = {}
+        # 可选回调 on_finish(profile, stages)，每轮计入直方图时在锁内调用，应尽量轻量
+        self.on_finish = None
+
+    # ---------------- 记录 ----------------
+    def begin(self, gen, profile, speech_end_ts=None, stt_final_ts=None, ts=None):
+        now = time.time() if ts is None else float(ts)
+        origin = float(speech_end_ts or stt_final_ts or now)
+        trace = _Trace(gen, str(profile or ""), origin)
+        if speech_end_ts:
+            trace.marks["speech_end"] = float(speech_end_ts)
+        if stt_final_ts:
+            trace.marks["stt_final"] = float(stt_final_ts)
+        with self._lock:
+            self._sweep_locked(now)
+            self._open[gen] = trace
+            while len(self._open) > self.max_open:
+                oldest = min(self._open, key=lambda g: self._open[g].created)
+                del self._open[oldest]
+                self.expired += 1
+
+    def set_profile(self, gen, profile):
+        with self._lock:
+            trace = self._open.get(gen)
+            if trace is not None and profile:
+                trace.profile = str(profile)
+
+    def mark(self, gen, stage, ts=None):
+        """记录阶段时间点；同一阶段只保留第一次。"""
+        if gen is None or stage not in STAGES:
+            return
+        ts = time.time() if ts is None else float(ts)
+        with self._lock:
+            trace = self._open.get(gen)
+            if trace is None or stage in trace.marks:
+                return
+            trace.marks[stage] = ts
+            self._maybe_finish_locked(trace)
+
+    def note_speech(self, gen):
+        """本轮有回答文字送往 TTS，需要等待 first_audio。"""
+        if gen is None:
+            return
+        with self._lock:
+            trace = self._open.get(gen)
+            if trace is not None:
+                trace.has_speech = True
+
+    def mark_audio(self, ts=None):
+        """TTS 开始出声：归到最近一个已有回答文字、尚未出声的轮次。"""
+        ts = time.time() if ts is None else float(ts)
+        with self._lock:
+            pending = [t for t in self._open.values() if t.has_speech and "first_audio" not in t.marks]
+            if not pending:
+                return
+            trace = max(pending, key=lambda t: t.created)
+            trace.marks["first_audio"] = ts
+            self._maybe_finish_locked(trace)
+
+    def cancel(self, gen):
+        with self._lock:
+            if self._open.pop(gen, None) is not None:
+                self.cancelled += 1
+
+    # ---------------- 结算 ----------------
+    def _maybe_finish_locked(self, trace):
+        if "turn_done" not in trace.marks:
+            return
+        if trace.has_speech and "first_audio" not in trace.marks:
+            return
+        self._finish_locked(trace)
+
+    def _finish_locked(self, trace):
+        self._open.pop(trace.gen, None)
+        hists = self._hist.setdefault(trace.profile, {})
+        result = {}
+        for stage in STAGES:
+            ts = trace.marks.get(stage)
+            if ts is None:
+                continue
+            ms = max(0.0, (ts - trace.origin) * 1000.0)
+            hist = hists.get(stage)
+            if hist is None:
+                hist = _Histogram(self.window)
+                hists[stage] = hist
+            hist.add(ms)
+            result[stage] = int(ms)
+        self.completed += 1
+        self.last = {"profile": trace.profile, "stages": result}
+        if self.on_finish is not None:
+            try:
+                self.on_finish(trace.profile, result)
+            except Exception:
+                pass
+
+    def _sweep_locked(self, now):
+        for trace in list(self._open.values()):
+            done_ts = trace.marks.get("turn_done")
+            if done_ts is not None:
+                # 等不到出声（TTS 失败或被去重）时按无声轮次计入
+                if now - done_ts > self.audio_timeout_sec:
+                    trace.has_speech = False
+                    self._finish_locked(trace)
+            elif now - trace.created > 60.0:
+                # 被合并或丢弃的输入不会再有 turn_done
+                self._open.pop(trace.gen, None)
+                self.expired += 1
+
+    # ---------------- 导出 ----------------
+    def get_stats(self, profile=None):
+        with self._lock:
+            self._sweep_locked(time.time())
+            names = [profile] if profile else list(self._hist.keys())
+            return {
+                name: {stage: h.summary() for stage, h in self._hist.get(name, {}).items()}
+                for name in names
+                if name in self._hist
+            }
+
+    def to_dict(self):
+        stats = self.get_stats()
+        with self._lock:
+            return {
+                "version": 1,
+                "generated_at": time.time(),
+                "stages": list(STAGES),
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "expired": self.expired,
+                "open": len(self._open),
+                "last": dict(self.last),
+                "profiles": stats,
+            }
+
+    def export_json(self, path):
+        """原子写入 JSON；返回是否成功。"""
+        data = self.to_dict()
+        tmp = f"{path}.tmp"
+        try:
+            parent = os.path.dirname(str(path))
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, path)
+            return True
+        except Exception:
+            return False
@@ -16,6 +16,7 @@ import threading
 from .packet import Packet
 from .packet_buffer import PacketBuffer
 from .data_table import *
+from . import session_recorder
 from widgets.runtime_status import RuntimeStatusLogger
 
 class UartServoInfo:
@@ -410,6 +411,7 @@ class UartServoManager:
 			return None
 		# 数据解析
 		value = struct.unpack(f">{dtype}", param_bytes)[0]
+		session_recorder.record_telemetry(servo_id, data_name, value)
 		return value
 
 	def write_data_by_name(self, servo_id, data_name, value):
@@ -460,6 +462,7 @@ class UartServoManager:
 			runtime_ms = runtime_ms_list[sidx]
 			runtime_ms = int(runtime_ms)
 			param_bytes += struct.pack('>BHH', servo_id, position, runtime_ms)
+		session_recorder.record_targets(servo_id_list, position_list, runtime_ms_list)
 		self.send_request(SERVO_ID_BRODCAST, self.CMD_TYPE_SYNC_WRITE, param_bytes)
 	
 	def reset(self, servo_id):
@@ -490,6 +493,7 @@ class UartServoManager:
 		runtime_ms = int(runtime_ms)
 		address, _ = UART_SERVO_DATA_TABLE['TARGET_POSITION']
 		param_bytes = struct.pack('>BHH', address,  position, runtime_ms)
+		session_recorder.record_targets((servo_id,), (position,), (runtime_ms,))
 		self.send_request(servo_id, self.CMD_TYPE_WRITE_DATA, param_bytes)
 		return True
 
@@ -4,17 +4,29 @@
 用法示例：
     from services.vision import ColorTracker
     tracker = ColorTracker(hsv_lower=(35, 80, 60), hsv_upper=(85, 255, 255))
-    # 将 tracker.process_frame(frame) 在 CameraView.frame_callback 中调用
+    # 通过视觉流水线以限频、低分辨率方式在工作线程运行（见 services/vision_pipeline.py）
+    pipeline.register('color', tracker.process_frame, rate_hz=10, width=320)
+    # 或直接处理单帧
     tracker.process_frame(frame)
     cx, cy, area = tracker.get_last()
 
+    # 跟踪模式：缩小帧搜索 + 锁定后只处理 ROI，坐标仍为原分辨率
+    tracker = ColorTracker(tracking=True)
+
+    # 多颜色：一次 HSV 转换评估多个范围
+    mt = MultiColorTracker(use_components=True)
+    mt.add_target('green', (35, 80, 60), (85, 255, 255))
+    result = mt.process_frame(frame)     # MultiColorResult(frame_id, timestamp, targets)
+
 返回：
     cx, cy: 相对于帧宽高的像素坐标（None 表示无目标）
     area: 目标面积像素数
 """
 
+import math
 import threading
 import time
+from dataclasses import dataclass, field
 
 try:
     import cv2
@@ -24,64 +36,308 @@ except Exception:
     np = None
 
 class ColorTracker:
-    def __init__(self, hsv_lower=(35, 80, 60), hsv_upper=(85, 255, 255), min_area=200):
+    def __init__(self, hsv_lower=(35, 80, 60), hsv_upper=(85, 255, 255), min_area=200,
+                 tracking=False, acquire_width=160, roi_scale=3.0, min_roi=48):
+        """
+        tracking: 跟踪模式。未锁定目标时在缩小帧上全图搜索，锁定后只处理上一质心附近的 ROI
+        acquire_width: 搜索阶段缩小后的宽度
+        roi_scale: ROI 边长相对目标等效边长 sqrt(area) 的倍数
+        min_roi: ROI 最小边长（像素）
+        """
         self.hsv_lower = hsv_lower
         self.hsv_upper = hsv_upper
         self.min_area = min_area
+        self.tracking = bool(tracking)
+        self.acquire_width = int(acquire_width)
+        self.roi_scale = float(roi_scale)
+        self.min_roi = int(min_roi)
 
         self._lock = threading.Lock()
         self._last_cx = None
         self._last_cy = None
         self._last_area = 0
 
+        # 跟踪状态（仅处理线程访问）
+        self._vx = 0.0
+        self._vy = 0.0
+        self._locked = False
+        self._kernel5 = None
+        self._kernel3 = None
+        self._stats = {
+            'frames': 0,
+            'full': 0,
+            'acquire': 0,
+            'roi': 0,
+            'lost': 0,
+            'full_ms': 0.0,
+            'acquire_ms': 0.0,
+            'roi_ms': 0.0,
+        }
+
+    def _kernel(self, small):
+        if self._kernel5 is None:
+            self._kernel5 = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+            self._kernel3 = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        return self._kernel3 if small else self._kernel5
+
+    def _detect(self, img, min_area, small=False):
+        """在图像上检测最大色块，返回 (cx, cy, area)（img 坐标，浮点）；面积不足返回 (None, None, area)。"""
+        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        lower = np.array(self.hsv_lower, dtype=np.uint8)
+        upper = np.array(self.hsv_upper, dtype=np.uint8)
+        mask = cv2.inRange(hsv, lower, upper)
+        # 去噪
+        kernel = self._kernel(small)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=1)
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return None, None, 0
+        # 找到最大轮廓
+        c = max(contours, key=lambda x: cv2.contourArea(x))
+        area = cv2.contourArea(c)
+        if area < min_area:
+            return None, None, area
+        M = cv2.moments(c)
+        if M['m00'] == 0:
+            return None, None, area
+        return M['m10'] / M['m00'], M['m01'] / M['m00'], area
+
+    def _publish(self, cx, cy, area):
+        with self._lock:
+            self._last_cx = None if cx is None else int(cx)
+            self._last_cy = None if cy is None else int(cy)
+            self._last_area = area
+
+    def _timed(self, key, t0):
+        ms = (time.perf_counter() - t0) * 1000.0
+        n = self._stats[key]
+        prev = self._stats[key + '_ms']
+        self._stats[key + '_ms'] = ms if n <= 1 else (0.9 * prev + 0.1 * ms)
+
     def process_frame(self, frame):
-        """处理一帧（BGR numpy array）并更新内部状态"""
+        """处理一帧（BGR numpy array）并更新内部状态；坐标始终为输入帧的分辨率。"""
         if cv2 is None:
             return
+        self._stats['frames'] += 1
         try:
-            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-            lower = np.array(self.hsv_lower, dtype=np.uint8)
-            upper = np.array(self.hsv_upper, dtype=np.uint8)
-            mask = cv2.inRange(hsv, lower, upper)
-            # 去噪
-            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5,5))
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=1)
-
-            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            if not contours:
-                with self._lock:
-                    self._last_cx = None
-                    self._last_cy = None
-                    self._last_area = 0
-                return
-
-            # 找到最大轮廓
-            c = max(contours, key=lambda x: cv2.contourArea(x))
-            area = cv2.contourArea(c)
-            if area < self.min_area:
-                with self._lock:
-                    self._last_cx = None
-                    self._last_cy = None
-                    self._last_area = area
-                return
-
-            M = cv2.moments(c)
-            if M['m00'] == 0:
+            if self.tracking:
+                self._process_tracking(frame)
                 return
-            cx = int(M['m10'] / M['m00'])
-            cy = int(M['m01'] / M['m00'])
-            with self._lock:
-                self._last_cx = cx
-                self._last_cy = cy
-                self._last_area = area
+            t0 = time.perf_counter()
+            self._stats['full'] += 1
+            cx, cy, area = self._detect(frame, self.min_area)
+            self._timed('full', t0)
+            self._publish(cx, cy, area)
         except Exception:
             return
 
+    def _process_tracking(self, frame):
+        h, w = frame.shape[:2]
+        if self._locked:
+            t0 = time.perf_counter()
+            self._stats['roi'] += 1
+            with self._lock:
+                lx, ly, larea = self._last_cx, self._last_cy, self._last_area
+            # ROI 以预测位置为中心，边长随目标大小与运动速度增大
+            px = lx + self._vx
+            py = ly + self._vy
+            half = max(self.min_roi, self.roi_scale * math.sqrt(max(1.0, larea))) / 2.0
+            half_x = half + abs(self._vx) * 2.0
+            half_y = half + abs(self._vy) * 2.0
+            x0 = max(0, int(px - half_x))
+            y0 = max(0, int(py - half_y))
+            x1 = min(w, int(px + half_x) + 1)
+            y1 = min(h, int(py + half_y) + 1)
+            if x1 - x0 >= 8 and y1 - y0 >= 8:
+                cx, cy, area = self._detect(frame[y0:y1, x0:x1], self.min_area)
+                if cx is not None:
+                    cx += x0
+                    cy += y0
+                    self._vx = 0.5 * self._vx + 0.5 * (cx - lx)
+                    self._vy = 0.5 * self._vy + 0.5 * (cy - ly)
+                    self._publish(cx, cy, area)
+                    self._timed('roi', t0)
+                    return
+            self._timed('roi', t0)
+            # 丢失：回到缩小帧全图搜索
+            self._stats['lost'] += 1
+            self._locked = False
+
+        t0 = time.perf_counter()
+        self._stats['acquire'] += 1
+        scale = min(1.0, self.acquire_width / float(w)) if w > 0 else 1.0
+        if scale < 1.0:
+            small = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        else:
+            small = frame
+        cx, cy, area = self._detect(small, self.min_area * scale * scale, small=scale < 1.0)
+        if cx is not None:
+            cx /= scale
+            cy /= scale
+            area /= scale * scale
+            self._locked = True
+            self._vx = 0.0
+            self._vy = 0.0
+        self._publish(cx, cy, area)
+        self._timed('acquire', t0)
+
     def get_last(self):
         with self._lock:
             return (self._last_cx, self._last_cy, self._last_area)
 
+    def get_stats(self):
+        """各模式处理次数与平均耗时（ms）；tracking 模式下 roi_ms 通常比 full_ms 小一个数量级。"""
+        out = dict(self._stats)
+        for k in ('full_ms', 'acquire_ms', 'roi_ms'):
+            out[k] = round(out[k], 3)
+        out['locked'] = self._locked
+        return out
+
+
+@dataclass
+class ColorTarget:
+    label: str
+    cx: float = None
+    cy: float = None
+    area: float = 0
+    bbox: tuple = None          # (x, y, w, h)
+
+    @property
+    def found(self):
+        return self.cx is not None
+
+
+@dataclass
+class MultiColorResult:
+    frame_id: int
+    timestamp: float
+    targets: dict = field(default_factory=dict)     # label -> ColorTarget
+    process_ms: float = 0.0
+
+    def get(self, label):
+        return self.targets.get(label)
+
+
+class MultiColorTracker:
+    """一次 HSV 转换同时评估多个颜色范围。
+
+    用法：
+        mt = MultiColorTracker()
+        mt.add_target('green', (35, 80, 60), (85, 255, 255))
+        mt.add_target('red', (170, 120, 70), (10, 255, 255))   # 色相下限大于上限表示跨 0 环绕
+        result = mt.process_frame(frame)
+        result.get('red').cx
+    """
+
+    def __init__(self, min_area=200, use_components=False, morph=True):
+        """
+        use_components: 使用 connectedComponentsWithStats 代替轮廓搜索，直接得到面积/外接框/质心
+        morph: 是否对每个掩码做开闭运算去噪
+        """
+        self.min_area = min_area
+        self.use_components = bool(use_components)
+        self.morph = bool(morph)
+        self._targets = {}
+        self._lock = threading.Lock()
+        self._kernel = None
+        self._frame_id = 0
+        self._last = None
+        self._process_ms = 0.0
+
+    def add_target(self, label, hsv_lower, hsv_upper, min_area=None):
+        lower = tuple(int(v) for v in hsv_lower)
+        upper = tuple(int(v) for v in hsv_upper)
+        with self._lock:
+            self._targets[label] = (lower, upper, self.min_area if min_area is None else min_area)
+
+    def remove_target(self, label):
+        with self._lock:
+            self._targets.pop(label, None)
+
+    def labels(self):
+        with self._lock:
+            return list(self._targets.keys())
+
+    def _mask(self, hsv, lower, upper):
+        if lower[0] <= upper[0]:
+            return cv2.inRange(hsv, np.array(lower, dtype=np.uint8), np.array(upper, dtype=np.uint8))
+        # 色相环绕（如红色 170..10）：拆成两段再合并
+        m1 = cv2.inRange(hsv, np.array(lower, dtype=np.uint8),
+                         np.array((179, upper[1], upper[2]), dtype=np.uint8))
+        m2 = cv2.inRange(hsv, np.array((0, lower[1], lower[2]), dtype=np.uint8),
+                         np.array(upper, dtype=np.uint8))
+        return cv2.bitwise_or(m1, m2)
+
+    def _largest_contour(self, label, mask, min_area):
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return ColorTarget(label)
+        c = max(contours, key=lambda x: cv2.contourArea(x))
+        area = cv2.contourArea(c)
+        M = cv2.moments(c)
+        if area < min_area or M['m00'] == 0:
+            return ColorTarget(label, area=area)
+        return ColorTarget(label, M['m10'] / M['m00'], M['m01'] / M['m00'], area, tuple(cv2.boundingRect(c)))
+
+    def _largest_component(self, label, mask, min_area):
+        n, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        if n <= 1:
+            return ColorTarget(label)
+        # 第 0 个为背景
+        idx = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+        area = int(stats[idx, cv2.CC_STAT_AREA])
+        if area < min_area:
+            return ColorTarget(label, area=area)
+        x, y, w, h = (int(v) for v in stats[idx, :4])
+        return ColorTarget(label, float(centroids[idx][0]), float(centroids[idx][1]), area, (x, y, w, h))
+
+    def process_frame(self, frame, timestamp=None):
+        """处理一帧（BGR），返回 MultiColorResult；cv2 不可用时返回空结果。"""
+        self._frame_id += 1
+        ts = time.time() if timestamp is None else timestamp
+        result = MultiColorResult(self._frame_id, ts)
+        if cv2 is None:
+            return result
+        with self._lock:
+            targets = list(self._targets.items())
+        t0 = time.perf_counter()
+        try:
+            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+            if self.morph and self._kernel is None:
+                self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+            for label, (lower, upper, min_area) in targets:
+                mask = self._mask(hsv, lower, upper)
+                if self.morph:
+                    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self._kernel, iterations=1)
+                    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self._kernel, iterations=1)
+                if self.use_components:
+                    result.targets[label] = self._largest_component(label, mask, min_area)
+                else:
+                    result.targets[label] = self._largest_contour(label, mask, min_area)
+        except Exception:
+            pass
+        ms = (time.perf_counter() - t0) * 1000.0
+        result.process_ms = ms
+        self._process_ms = ms if self._frame_id <= 1 else (0.9 * self._process_ms + 0.1 * ms)
+        with self._lock:
+            self._last = result
+        return result
+
+    def get_last(self):
+        """最近一次结果（MultiColorResult 或 None）。"""
+        with self._lock:
+            return self._last
+
+    def get_stats(self):
+        return {
+            'frames': self._frame_id,
+            'targets': len(self._targets),
+            'process_ms': round(self._process_ms, 3),
+            'use_components': self.use_components,
+        }
+
 
 if __name__ == '__main__':
     print('ColorTracker module - no demo here.')
@@ -0,0 +1,218 @@
+"""
+VisionPipeline
+
+多消费者视觉流水线：各消费者（颜色跟踪、AI 截图、录制等）以目标帧率与分辨率注册，
+采集线程每来一帧只做一次调度判断：
+
+- 同一帧对每种目标宽度只缩放一次，缩放结果以只读数组在消费者之间共享
+- 消费者在线程池中运行；上一帧仍在处理时本帧直接丢弃（drop-if-busy），不会排队积压
+- 统计每个阶段的处理延迟、吞吐与丢帧，以及缩放耗时
+
+使用：
+    pipe = VisionPipeline(max_workers=2)
+    pipe.register('color', tracker.process_frame, rate_hz=10, width=320)
+    camera_view.frame_callback = pipe.submit     # 在采集线程上调用
+    pipe.get_stats()
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import cv2
+except Exception:
+    cv2 = None
+
+
+class _Stage:
+    def __init__(self, name, fn, rate_hz, width, pass_ts=False):
+        self.name = name
+        self.fn = fn
+        self.pass_ts = bool(pass_ts)
+        self.period = 1.0 / rate_hz if rate_hz and rate_hz > 0 else 0.0
+        self.width = int(width) if width else None
+        self.busy = False
+        self.last_dispatch = 0.0
+        self.dispatched = 0
+        self.completed = 0
+        self.dropped_busy = 0
+        self.errors = 0
+        self.latency_ms = 0.0       # 帧到达 -> 处理完成
+        self.process_ms = 0.0       # 纯处理耗时
+        self.max_latency_ms = 0.0
+        self.fps = 0.0
+        self._last_done = 0.0
+
+
+class LatestFrameSink:
+    """保存最近一帧（只读共享数组），供 AI 截图等按需拉取的消费者使用。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = None
+        self._ts = 0.0
+
+    def __call__(self, frame):
+        with self._lock:
+            self._frame = frame
+            self._ts = time.monotonic()
+
+    def get(self):
+        """返回 (frame, monotonic_ts)；尚无帧时 frame 为 None。"""
+        with self._lock:
+            return self._frame, self._ts
+
+
+def encode_jpeg(frame, quality=80):
+    """把 BGR 帧编码为 JPEG bytes；没有 cv2 或编码失败时返回 None。"""
+    if frame is None or cv2 is None:
+        return None
+    try:
+        ok, buf = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+    except Exception:
+        return None
+    return buf.tobytes() if ok else None
+
+
+class VisionPipeline:
+    def __init__(self, max_workers=2):
+        self.max_workers = max(1, int(max_workers))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='vision')
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._frames_in = 0
+        self._resize_ms = 0.0
+        self._closed = False
+
+    # ---------------- 注册 ----------------
+    def register(self, name, fn, rate_hz=10.0, width=None, pass_ts=False):
+        """注册消费者。fn(frame) 在工作线程上调用，frame 为只读数组；width 为目标宽度（None 为原尺寸）。
+
+        pass_ts=True 时调用 fn(frame, ts)，ts 为帧到达时的 time.monotonic()，用于闭环延迟统计。
+        """
+        with self._lock:
+            self._stages[name] = _Stage(name, fn, rate_hz, width, pass_ts)
+
+    def unregister(self, name):
+        with self._lock:
+            self._stages.pop(name, None)
+
+    def has_consumers(self):
+        return bool(self._stages)
+
+    def shutdown(self):
+        self._closed = True
+        with self._lock:
+            self._stages.clear()
+        self._pool.shutdown(wait=False)
+
+    # ---------------- 调度（采集线程） ----------------
+    def submit(self, frame, ts=None):
+        """提交一帧（通常由 CameraView.frame_callback 在采集线程调用）。"""
+        if self._closed or not self._stages:
+            return
+        now = time.monotonic()
+        ts = now if ts is None else ts
+        self._frames_in += 1
+
+        with self._lock:
+            due = []
+            for st in self._stages.values():
+                if st.period and (now - st.last_dispatch) < st.period:
+                    continue
+                if st.busy:
+                    st.dropped_busy += 1
+                    continue
+                st.busy = True
+                st.last_dispatch = now
+                st.dispatched += 1
+                due.append(st)
+        if not due:
+            return
+
+        # 同一帧每种宽度只缩放一次；原尺寸帧来自采集缓冲池，会被复用，因此也复制一次
+        t0 = time.perf_counter()
+        shared = {}
+        for st in due:
+            if st.width in shared:
+                continue
+            try:
+                shared[st.width] = self._prepare(frame, st.width)
+            except Exception:
+                shared[st.width] = None
+        self._resize_ms = 0.9 * self._resize_ms + 0.1 * (time.perf_counter() - t0) * 1000.0
+
+        for st in due:
+            img = shared.get(st.width)
+            if img is None:
+                with self._lock:
+                    st.busy = False
+                    st.errors += 1
+                continue
+            try:
+                self._pool.submit(self._run, st, img, ts)
+            except RuntimeError:
+                st.busy = False
+
+    def _prepare(self, frame, width):
+        h, w = frame.shape[:2]
+        if width and width < w and cv2 is not None:
+            height = max(1, int(round(h * width / float(w))))
+            out = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        else:
+            out = frame.copy()
+        out.flags.writeable = False
+        return out
+
+    def _run(self, st, img, ts):
+        t0 = time.perf_counter()
+        ok = True
+        try:
+            if st.pass_ts:
+                st.fn(img, ts)
+            else:
+                st.fn(img)
+        except Exception:
+            ok = False
+        t1 = time.perf_counter()
+        done = time.monotonic()
+        with self._lock:
+            st.busy = False
+            if not ok:
+                st.errors += 1
+                return
+            st.completed += 1
+            latency = (done - ts) * 1000.0
+            st.latency_ms = latency if st.completed == 1 else (0.9 * st.latency_ms + 0.1 * latency)
+            proc = (t1 - t0) * 1000.0
+            st.process_ms = proc if st.completed == 1 else (0.9 * st.process_ms + 0.1 * proc)
+            st.max_latency_ms = max(st.max_latency_ms, latency)
+            if st._last_done > 0:
+                inst = 1.0 / max(1e-6, done - st._last_done)
+                st.fps = inst if st.fps <= 0 else (0.9 * st.fps + 0.1 * inst)
+            st._last_done = done
+
+    # ---------------- 统计 ----------------
+    def get_stats(self):
+        with self._lock:
+            stages = {}
+            for name, st in self._stages.items():
+                stages[name] = {
+                    'width': st.width,
+                    'target_hz': round(1.0 / st.period, 1) if st.period else 0.0,
+                    'fps': round(st.fps, 1),
+                    'dispatched': st.dispatched,
+                    'completed': st.completed,
+                    'dropped_busy': st.dropped_busy,
+                    'errors': st.errors,
+                    'latency_ms': round(st.latency_ms, 2),
+                    'process_ms': round(st.process_ms, 2),
+                    'max_latency_ms': round(st.max_latency_ms, 2),
+                }
+            return {
+                'frames_in': self._frames_in,
+                'resize_ms': round(self._resize_ms, 2),
+                'workers': self.max_workers,
+                'stages': stages,
+            }
@@ -1,5 +1,7 @@
 import math
 
+from .gait_engine import SIN_TABLE, TABLE_SIZE, TABLE_MASK
+
 class Walker:
     def __init__(self):
         self.is_walking = False
@@ -44,26 +46,28 @@ class Walker:
 
         self.t += dt * self.speed
         phase = self.t % (2 * math.pi)
+        # 查表代替逐帧多次 math.sin
+        s = SIN_TABLE[int(phase / (2 * math.pi) * TABLE_SIZE) & TABLE_MASK]
 
         # === 核心步态算法 (基于正弦波的逆运动学) ===
         
         # 1. 髋关节前后摆动 (左右腿相位差 180度)
         # 当 sin(phase) 为正时，左腿向前摆动
-        hip_swing = math.sin(phase) * self.step_size
+        hip_swing = s * self.step_size
         offsets[self.SERVOS["left_hip"]] = int(hip_swing)
         offsets[self.SERVOS["right_hip"]] = int(-hip_swing) # 右腿反向摆动
 
         # 2. 膝盖抬起 (只在腿向前摆动时抬起)
         # 左腿在 0 ~ pi 相位期间 (sin > 0) 抬起
-        if math.sin(phase) > 0:
+        if s > 0:
             # 使用 sin^2 或 |sin| 确保抬起值为正
-            offsets[self.SERVOS["left_knee"]] = int(math.sin(phase) * self.lift_height)
+            offsets[self.SERVOS["left_knee"]] = int(s * self.lift_height)
         else:
             offsets[self.SERVOS["left_knee"]] = 0 # 支撑阶段，膝盖伸直
             
         # 右腿在 pi ~ 2*pi 相位期间 (sin < 0) 抬起
-        if math.sin(phase) < 0:
-            offsets[self.SERVOS["right_knee"]] = int(-math.sin(phase) * self.lift_height)
+        if s < 0:
+            offsets[self.SERVOS["right_knee"]] = int(-s * self.lift_height)
         else:
             offsets[self.SERVOS["right_knee"]] = 0
 
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+ai_load_driver.py
+
+AICore 离线压测：启动本地 LLM 替身服务（llm_stub_server.py），创建 N 个使用 "local" profile 的
+AICore 实例并行对话，每个实例发送若干轮输入，统计：
+
+- 吞吐：完成轮次 / 墙钟时间
+- 各阶段耗时 p50/p90/p99（来自 TurnTracer：请求发出、首 token、动作下发、完成）
+- 流式增量处理开销（StreamingJSONParser 解析 + 主线程调度，每个增量的耗时）
+- 输入队列行为（合并、丢弃、最大深度）与服务端并发/排队/注入错误统计
+
+发送模式：
+- --interval 0（默认）：闭环，上一轮结束才发下一轮
+- --interval > 0：开环，按固定间隔发送，用于观察排队合并与 barge-in
+
+文字显示到主线程即视为“出声”（无 TTS），first_audio 阶段表示回答到达界面的时间。
+默认给每句话加序号，避免决策缓存命中；--allow-cache 时重复使用原句。
+
+示例：
+    python3 tools/testbench/ai_load_driver.py --conversations 4 --turns 10
+    python3 tools/testbench/ai_load_driver.py --conversations 8 --max-concurrency 2 --ttft-ms 600
+    python3 tools/testbench/ai_load_driver.py --interval 0.3 --barge-in --error-rate 0.1 --errors 402,timeout
+    python3 tools/testbench/ai_load_driver.py --external http://127.0.0.1:8765/v1 --out load.json
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+from kivy.clock import Clock
+
+from llm_stub_server import build_arg_parser, server_from_args
+from services.ai_core import AICore
+from services.turn_tracer import STAGES
+
+PROMPTS = [
+    '你好',
+    '请挥手',
+    '今天天气怎么样',
+    '坐下',
+    '给我讲个笑话',
+    '点点头',
+    '你叫什么名字',
+    '站起来',
+]
+
+
+def _percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {'n': 0, 'p50': 0, 'p90': 0, 'p99': 0}
+
+    def _q(q):
+        idx = min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))
+        return round(values[idx], 1)
+
+    return {'n': len(values), 'p50': _q(0.5), 'p90': _q(0.9), 'p99': _q(0.99)}
+
+
+class _Conversation:
+    def __init__(self, idx, ai, turns):
+        self.idx = idx
+        self.ai = ai
+        self.turns = int(turns)
+        self.sent = 0
+        self.next_at = 0.0
+        self.speech_events = 0
+
+
+def _make_ai(base_url, api_key, samples, delta_us, lock):
+    ai = AICore(api_key=api_key, profile_name='local', config_path=os.path.join(ROOT, 'data', 'ai_models.json'))
+    ai.profile.base_url = base_url
+    ai.prewarm()
+
+    def _on_finish(_profile, stages):
+        with lock:
+            samples.append(dict(stages))
+
+    ai.tracer.on_finish = _on_finish
+
+    # 统计每个流式增量的处理耗时（解析 + 调度到主线程）
+    orig_delta = ai._on_stream_delta
+
+    def _timed_delta(turn, parser, piece):
+        t0 = time.perf_counter()
+        orig_delta(turn, parser, piece)
+        us = (time.perf_counter() - t0) * 1e6
+        with lock:
+            delta_us.append(us)
+
+    ai._on_stream_delta = _timed_delta
+    return ai
+
+
+def run(args):
+    server = None
+    if args.external:
+        base_url = args.external.rstrip('/')
+    else:
+        server = server_from_args(args)
+        server.start()
+        base_url = server.base_url
+    api_key = args.api_key or os.environ.get('ROBOTBRAIN_LOCAL_API_KEY') or 'local-test'
+
+    lock = threading.Lock()
+    samples = []
+    delta_us = []
+    convs = []
+    for i in range(max(1, args.conversations)):
+        ai = _make_ai(base_url, api_key, samples, delta_us, lock)
+        ai.barge_in_enabled = bool(args.barge_in)
+        conv = _Conversation(i, ai, args.turns)
+
+        def _on_speech(_inst, text, conv=conv):
+            conv.speech_events += 1
+            # 无 TTS：回答文字到达主线程即记为出声
+            conv.ai.mark_audio_out()
+
+        ai.bind(on_speech_output=_on_speech)
+        convs.append(conv)
+
+    print(f'AI load: {len(convs)} conversations x {args.turns} turns -> {base_url} '
+          f'({"open-loop %.2fs" % args.interval if args.interval > 0 else "closed-loop"})')
+    t0 = time.time()
+    deadline = t0 + args.timeout
+    for conv in convs:
+        conv.next_at = t0
+    while time.time() < deadline:
+        now = time.time()
+        for conv in convs:
+            if conv.sent >= conv.turns:
+                continue
+            if args.interval > 0:
+                if now < conv.next_at:
+                    continue
+                conv.next_at += args.interval
+            elif conv.ai.is_thinking:
+                continue
+            prompt = PROMPTS[(conv.idx + conv.sent) % len(PROMPTS)]
+            text = prompt if args.allow_cache else f'{prompt} {conv.idx}-{conv.sent}'
+            conv.ai.process_input(user_text=text)
+            conv.sent += 1
+        Clock.tick()
+        if all(c.sent >= c.turns and not c.ai.is_thinking for c in convs):
+            break
+    # 等待最后的主线程分发与追踪结算
+    settle = time.time() + 0.5
+    while time.time() < settle:
+        Clock.tick()
+    wall = time.time() - t0
+
+    with lock:
+        samples_snapshot = list(samples)
+        delta_snapshot = list(delta_us)
+    completed = sum(c.ai.tracer.completed for c in convs)
+    cancelled = sum(c.ai.tracer.cancelled for c in convs)
+    queue = {'merged_text': 0, 'dropped_stale': 0, 'max_depth': 0}
+    for c in convs:
+        qs = c.ai.get_queue_stats()
+        queue['merged_text'] += int(qs.get('merged_text') or 0)
+        queue['dropped_stale'] += int(qs.get('dropped_stale') or 0)
+        queue['max_depth'] = max(queue['max_depth'], int(qs.get('max_depth') or 0))
+
+    report = {
+        'base_url': base_url,
+        'conversations': len(convs),
+        'turns_per_conversation': args.turns,
+        'mode': 'open-loop' if args.interval > 0 else 'closed-loop',
+        'interval_sec': args.interval,
+        'barge_in': bool(args.barge_in),
+        'wall_sec': round(wall, 2),
+        'submitted': sum(c.sent for c in convs),
+        'completed': completed,
+        'cancelled': cancelled,
+        'speech_events': sum(c.speech_events for c in convs),
+        'timed_out': time.time() >= deadline,
+        'throughput_turns_per_sec': round(completed / wall, 2) if wall > 0 else 0.0,
+        'stages_ms': {
+            stage: _percentiles([s[stage] for s in samples_snapshot if stage in s])
+            for stage in STAGES
+            if any(stage in s for s in samples_snapshot)
+        },
+        'delta_handling_us': _percentiles(delta_snapshot),
+        'queue': queue,
+        'last_errors': sorted({c.ai.last_chat_error for c in convs if c.ai.last_chat_error}),
+    }
+    if server is not None:
+        report['server'] = server.get_stats()
+
+    for c in convs:
+        c.ai.close()
+    if server is not None:
+        server.stop()
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description='AICore 离线压测', parents=[build_arg_parser(add_help=False)])
+    ap.add_argument('--conversations', type=int, default=4, help='并行 AICore 实例数')
+    ap.add_argument('--turns', type=int, default=8, help='每个实例发送的轮次')
+    ap.add_argument('--interval', type=float, default=0.0, help='开环发送间隔（秒），0 为闭环')
+    ap.add_argument('--barge-in', action='store_true', help='新输入打断进行中的轮次')
+    ap.add_argument('--allow-cache', action='store_true', help='重复使用原句（允许决策缓存命中）')
+    ap.add_argument('--external', default='', help='使用已运行的替身服务，如 http://127.0.0.1:8765/v1')
+    ap.add_argument('--timeout', type=float, default=120.0, help='整体超时（秒）')
+    ap.add_argument('--out', default='', help='报告写入 JSON 文件')
+    args = ap.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
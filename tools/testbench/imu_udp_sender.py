@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+imu_udp_sender.py
+
+向 IMUReader 的 UDP 端口发送模拟姿态，用于验证二进制批量协议与丢包/乱序统计。
+默认以 200Hz 采样、每包 4 个样本发送（50 包/秒）；也可发送旧的 JSON/CSV 文本格式对比。
+
+示例：
+    python3 tools/testbench/imu_udp_sender.py --host 127.0.0.1 --rate 200 --batch 4
+    python3 tools/testbench/imu_udp_sender.py --format json --rate 100
+    python3 tools/testbench/imu_udp_sender.py --drop 0.05 --reorder 0.02   # 模拟丢包与乱序
+"""
+import argparse
+import json
+import math
+import os
+import random
+import socket
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from services.imu_protocol import encode_packet, MAX_SAMPLES
+
+
+def main():
+    ap = argparse.ArgumentParser(description='IMU UDP 测试发送端')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=5005)
+    ap.add_argument('--rate', type=float, default=200.0, help='传感器采样率 Hz')
+    ap.add_argument('--batch', type=int, default=4, help='每包样本数（仅二进制格式）')
+    ap.add_argument('--format', choices=('binary', 'json', 'csv'), default='binary')
+    ap.add_argument('--duration', type=float, default=0.0, help='发送时长（秒），0 表示直到 Ctrl+C')
+    ap.add_argument('--drop', type=float, default=0.0, help='模拟丢包概率')
+    ap.add_argument('--reorder', type=float, default=0.0, help='模拟乱序概率（与下一包交换）')
+    args = ap.parse_args()
+
+    batch = max(1, min(MAX_SAMPLES, int(args.batch))) if args.format == 'binary' else 1
+    period = 1.0 / max(1.0, args.rate)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    addr = (args.host, args.port)
+
+    t0 = time.monotonic()
+    next_t = t0
+    seq = 0
+    pending = []
+    held = None
+    sent = dropped = swapped = 0
+    last_report = t0
+    try:
+        while True:
+            now = time.monotonic()
+            if args.duration > 0 and now - t0 >= args.duration:
+                break
+            t = now - t0
+            pitch = math.sin(t * 0.8) * 4.0
+            roll = math.sin(t * 0.6) * 3.0
+            yaw = (t * 10.0) % 360.0
+            ts_us = int(now * 1e6)
+
+            if args.format == 'json':
+                payloads = [json.dumps({'pitch': pitch, 'roll': roll, 'yaw': yaw}).encode()]
+            elif args.format == 'csv':
+                payloads = [f'{pitch:.3f},{roll:.3f},{yaw:.3f}'.encode()]
+            else:
+                pending.append((ts_us, pitch, roll, yaw))
+                payloads = []
+                if len(pending) >= batch:
+                    payloads.append(encode_packet(seq, pending[0][0], pending))
+                    seq += 1
+                    pending = []
+
+            for data in payloads:
+                if args.drop > 0 and random.random() < args.drop:
+                    dropped += 1
+                    continue
+                if held is None and args.reorder > 0 and random.random() < args.reorder:
+                    held = data
+                    swapped += 1
+                    continue
+                sock.sendto(data, addr)
+                sent += 1
+                if held is not None:
+                    sock.sendto(held, addr)
+                    sent += 1
+                    held = None
+
+            if now - last_report >= 2.0:
+                print(f'sent={sent} dropped={dropped} reordered={swapped} seq={seq}')
+                last_report = now
+
+            next_t += period
+            delay = next_t - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_t = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+    print(f'done: sent={sent} dropped={dropped} reordered={swapped}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+llm_stub_server.py
+
+本地 OpenAI 兼容的流式对话服务（替身），用于离线压测 AICore，不消耗付费额度：
+
+- POST /v1/chat/completions：支持 stream=true（SSE，chunked 传输，保持 keep-alive）与非流式
+- GET  /v1/models：供 SessionPool 预热/保活
+- 脚本化回答：按用户最后一句话匹配关键词，未命中时轮流使用默认回答
+- 可配置首 token 延迟（含抖动）、token 速率
+- 错误注入：按概率返回 401/402/404 或挂起连接直到客户端超时（timeout）
+- 并发上限：超过上限的请求排队，排队超时返回 429
+- 统计请求数、注入的错误、最大并发与排队时间（GET /stats）
+
+配合 data/ai_models.json 中的 "local" profile 使用（base_url=http://127.0.0.1:8765/v1）。
+AICore 需要非空 API Key 才会走在线模式，本服务默认不校验 Key（--api-key 指定时才校验）。
+
+示例：
+    python3 tools/testbench/llm_stub_server.py --ttft-ms 400 --tps 30
+    python3 tools/testbench/llm_stub_server.py --error-rate 0.1 --errors 401,timeout --max-concurrency 2
+    python3 tools/testbench/llm_stub_server.py --script my_script.json
+
+脚本文件格式：
+    {"responses": [
+        {"match": ["挥手", "再见"], "emotion": "happy", "action": "wave", "speech": "拜拜！"},
+        {"emotion": "normal", "action": "none", "speech": "好的，我在听。"}
+    ]}
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSES = [
+    {"match": ["挥手", "再见", "拜拜"], "emotion": "happy", "action": "wave", "speech": "拜拜，下次见！"},
+    {"match": ["坐下"], "emotion": "normal", "action": "sit", "speech": "好的，我坐下啦。"},
+    {"match": ["站起", "起来"], "emotion": "normal", "action": "stand", "speech": "我站起来了。"},
+    {"match": ["点头"], "emotion": "happy", "action": "nod", "speech": "嗯嗯，没问题。"},
+    {"match": ["停"], "emotion": "normal", "action": "stop", "speech": "好的，马上停下。"},
+    {"emotion": "happy", "action": "none", "speech": "你好呀，今天想和我聊点什么？"},
+    {"emotion": "thinking", "action": "none", "speech": "让我想一想，这个问题挺有意思。"},
+    {"emotion": "normal", "action": "none", "speech": "收到，我一直在听你说话。"},
+]
+
+ERROR_KINDS = ("401", "402", "404", "timeout")
+
+
+def _last_user_text(messages):
+    for msg in reversed(messages or []):
+        if msg.get("role") != "user":
+            continue
+        content = msg.get("content")
+        if isinstance(content, list):
+            return " ".join(str(p.get("text") or "") for p in content if p.get("type") == "text")
+        return str(content or "")
+    return ""
+
+
+class StubLLMServer:
+    def __init__(self, host="127.0.0.1", port=8765, ttft_ms=300, ttft_jitter_ms=100, tokens_per_sec=40.0,
+                 chars_per_token=2, error_rate=0.0, errors=ERROR_KINDS, timeout_hold_sec=30.0,
+                 max_concurrency=4, queue_timeout_sec=10.0, responses=None, api_key=None, seed=None):
+        self.host = host
+        self.port = int(port)
+        self.ttft_ms = float(ttft_ms)
+        self.ttft_jitter_ms = float(ttft_jitter_ms)
+        self.tokens_per_sec = max(0.0, float(tokens_per_sec))
+        self.chars_per_token = max(1, int(chars_per_token))
+        self.error_rate = float(error_rate)
+        self.errors = [e for e in (errors or ()) if e in ERROR_KINDS]
+        self.timeout_hold_sec = float(timeout_hold_sec)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.queue_timeout_sec = float(queue_timeout_sec)
+        self.responses = list(responses or DEFAULT_RESPONSES)
+        self.api_key = api_key or None
+        self._rng = random.Random(seed)
+
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._rotate = 0
+        self._active = 0
+        self._httpd = None
+        self._thread = None
+        self._stats = {
+            "requests": 0,
+            "streamed": 0,
+            "completed": 0,
+            "client_aborts": 0,
+            "rejected_429": 0,
+            "auth_failures": 0,
+            "injected": {k: 0 for k in ERROR_KINDS},
+            "max_active": 0,
+            "queue_wait_ms_total": 0.0,
+            "queue_wait_ms_max": 0.0,
+        }
+
+    # ---------------- 生命周期 ----------------
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self):
+        """在后台线程启动；port=0 时自动分配端口。"""
+        server = self
+
+        class _Handler(_StubHandler):
+            stub = server
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="llm-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    # ---------------- 行为 ----------------
+    def pick_response(self, text):
+        for item in self.responses:
+            keys = item.get("match") or []
+            if any(k and k in text for k in keys):
+                return item
+        fallback = [r for r in self.responses if not r.get("match")] or self.responses
+        with self._lock:
+            item = fallback[self._rotate % len(fallback)]
+            self._rotate += 1
+        return item
+
+    def pick_error(self):
+        if not self.errors or self.error_rate <= 0:
+            return None
+        with self._lock:
+            if self._rng.random() >= self.error_rate:
+                return None
+            kind = self._rng.choice(self.errors)
+            self._stats["injected"][kind] += 1
+        return kind
+
+    def ttft_sec(self):
+        with self._lock:
+            jitter = self._rng.uniform(-self.ttft_jitter_ms, self.ttft_jitter_ms) if self.ttft_jitter_ms > 0 else 0.0
+        return max(0.0, self.ttft_ms + jitter) / 1000.0
+
+    def acquire_slot(self):
+        t0 = time.perf_counter()
+        ok = self._slots.acquire(timeout=self.queue_timeout_sec)
+        wait_ms = (time.perf_counter() - t0) * 1000.0
+        with self._lock:
+            if not ok:
+                self._stats["rejected_429"] += 1
+                return False
+            self._active += 1
+            self._stats["max_active"] = max(self._stats["max_active"], self._active)
+            self._stats["queue_wait_ms_total"] += wait_ms
+            self._stats["queue_wait_ms_max"] = max(self._stats["queue_wait_ms_max"], wait_ms)
+        return True
+
+    def release_slot(self):
+        with self._lock:
+            self._active -= 1
+        self._slots.release()
+
+    def count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def get_stats(self):
+        with self._lock:
+            stats = json.loads(json.dumps(self._stats))
+            served = stats["requests"] - stats["rejected_429"]
+            stats["active"] = self._active
+            stats["queue_wait_ms_avg"] = round(stats["queue_wait_ms_total"] / served, 1) if served > 0 else 0.0
+            stats["queue_wait_ms_total"] = round(stats["queue_wait_ms_total"], 1)
+            stats["queue_wait_ms_max"] = round(stats["queue_wait_ms_max"], 1)
+        return stats
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    stub = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    # ---------------- 基础响应 ----------------
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send_json(status, {"error": {"message": message, "code": status}})
+
+    def _write_chunk(self, data):
+        payload = data.encode("utf-8")
+        self.wfile.write(f"{len(payload):X}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+    # ---------------- 路由 ----------------
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path.endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "stub-chat", "object": "model"}]})
+        elif path.endswith("/stats"):
+            self._send_json(200, self.stub.get_stats())
+        else:
+            self._send_error(404, "not found")
+
+    def do_POST(self):
+        stub = self.stub
+        path = self.path.split("?", 1)[0].rstrip("/")
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length > 0 else b""
+        if not path.endswith("/chat/completions"):
+            self._send_error(404, "not found")
+            return
+        stub.count("requests")
+        if stub.api_key and self.headers.get("Authorization") != f"Bearer {stub.api_key}":
+            stub.count("auth_failures")
+            self._send_error(401, "invalid api key")
+            return
+        try:
+            req = json.loads(raw.decode("utf-8") or "{}")
+        except Exception:
+            self._send_error(400, "invalid json")
+            return
+
+        if not stub.acquire_slot():
+            self._send_error(429, "too many concurrent requests")
+            return
+        try:
+            self._serve_completion(req)
+        finally:
+            stub.release_slot()
+
+    def _serve_completion(self, req):
+        stub = self.stub
+        error = stub.pick_error()
+        if error in ("401", "402", "404"):
+            self._send_error(int(error), f"injected {error}")
+            return
+        if error == "timeout":
+            # 不发送任何字节，直到客户端读超时
+            time.sleep(stub.timeout_hold_sec)
+            self.close_connection = True
+            return
+
+        item = stub.pick_response(_last_user_text(req.get("messages")))
+        decision = {
+            "emotion": item.get("emotion", "normal"),
+            "action": item.get("action", "none"),
+            "speech": item.get("speech", ""),
+            "thought": item.get("thought", "stub"),
+        }
+        text = json.dumps(decision, ensure_ascii=False)
+        model = str(req.get("model") or "stub-chat")
+        time.sleep(stub.ttft_sec())
+
+        if not req.get("stream"):
+            self._send_json(200, {
+                "id": "stub",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            })
+            stub.count("completed")
+            return
+
+        stub.count("streamed")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        interval = 1.0 / stub.tokens_per_sec if stub.tokens_per_sec > 0 else 0.0
+        step = stub.chars_per_token
+        try:
+            for i in range(0, len(text), step):
+                packet = {
+                    "id": "stub",
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": text[i : i + step]}, "finish_reason": None}],
+                }
+                self._write_chunk("data: " + json.dumps(packet, ensure_ascii=False) + "\n\n")
+                if interval > 0 and i + step < len(text):
+                    time.sleep(interval)
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+            stub.count("completed")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端取消（barge-in / 对冲落败）
+            stub.count("client_aborts")
+            self.close_connection = True
+
+
+def load_script(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("responses") or []
+    return [dict(item) for item in data if isinstance(item, dict)]
+
+
+def build_arg_parser(add_help=True):
+    ap = argparse.ArgumentParser(description="本地 OpenAI 兼容流式对话替身服务", add_help=add_help)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--ttft-ms", type=float, default=300.0, help="首 token 延迟（ms）")
+    ap.add_argument("--ttft-jitter-ms", type=float, default=100.0, help="首 token 延迟抖动（±ms）")
+    ap.add_argument("--tps", type=float, default=40.0, help="token 速率（每秒），0 表示不限速")
+    ap.add_argument("--chars-per-token", type=int, default=2)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="错误注入概率")
+    ap.add_argument("--errors", default="401,402,404,timeout", help="注入的错误类型，逗号分隔")
+    ap.add_argument("--timeout-hold", type=float, default=30.0, help="timeout 错误挂起连接的秒数")
+    ap.add_argument("--max-concurrency", type=int, default=4, help="同时处理的请求上限")
+    ap.add_argument("--queue-timeout", type=float, default=10.0, help="排队超时（秒），超时返回 429")
+    ap.add_argument("--script", default="", help="脚本化回答 JSON 文件")
+    ap.add_argument("--api-key", default="", help="指定时校验 Bearer Key")
+    ap.add_argument("--seed", type=int, default=None)
+    return ap
+
+
+def server_from_args(args):
+    return StubLLMServer(
+        host=args.host,
+        port=args.port,
+        ttft_ms=args.ttft_ms,
+        ttft_jitter_ms=args.ttft_jitter_ms,
+        tokens_per_sec=args.tps,
+        chars_per_token=args.chars_per_token,
+        error_rate=args.error_rate,
+        errors=[e.strip() for e in str(args.errors or "").split(",") if e.strip()],
+        timeout_hold_sec=args.timeout_hold,
+        max_concurrency=args.max_concurrency,
+        queue_timeout_sec=args.queue_timeout,
+        responses=load_script(args.script) if args.script else None,
+        api_key=args.api_key or None,
+        seed=args.seed,
+    )
+
+
+def main():
+    args = build_arg_parser().parse_args()
+    server = server_from_args(args)
+    server.start()
+    print(f"LLM stub listening on {server.base_url} (ttft={args.ttft_ms}ms tps={args.tps} "
+          f"errors={args.error_rate:.0%} max_concurrency={args.max_concurrency})")
+    try:
+        while True:
+            time.sleep(10.0)
+            print(json.dumps(server.get_stats(), ensure_ascii=False))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(json.dumps(server.get_stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
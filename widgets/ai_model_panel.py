@@ -10,6 +10,21 @@ from kivy.uix.textinput import TextInput
 from app.theme import FONT
 
 
+# 轮次追踪阶段（不含起点 speech_end）与面板上的简称
+_TRACE_STAGES = (
+    ("stt_final", "识别"),
+    ("request_sent", "请求"),
+    ("first_token", "首字"),
+    ("action_dispatched", "动作"),
+    ("first_audio", "出声"),
+    ("turn_done", "完成"),
+)
+
+
+# 备用模型下拉框中“自动选择第一个有 Key 的模型”
+_HEDGE_AUTO = "自动"
+
+
 class FontSpinnerOption(SpinnerOption):
     def __init__(self, **kwargs):
         kwargs.setdefault("font_name", FONT)
@@ -58,6 +73,20 @@ class AIModelPanel(BoxLayout):
         model_actions.add_widget(btn_test_conn)
         self.add_widget(model_actions)
 
+        # 对冲请求：主模型首 token 超过其 TTFT 分位数时向备用模型发同样请求
+        hedge_row = BoxLayout(size_hint_y=None, height=dp(38), spacing=dp(6))
+        self.hedge_btn = Button(text="对冲：关", font_name=FONT, size_hint_x=None, width=dp(96))
+        hedge_row.add_widget(self.hedge_btn)
+        hedge_row.add_widget(Label(text="备用模型", font_name=FONT, size_hint_x=None, width=dp(72)))
+        self.hedge_spinner = Spinner(
+            text=_HEDGE_AUTO,
+            values=(_HEDGE_AUTO,) + self._read_models(),
+            font_name=FONT,
+            option_cls=FontSpinnerOption,
+        )
+        hedge_row.add_widget(self.hedge_spinner)
+        self.add_widget(hedge_row)
+
         voice_actions = BoxLayout(size_hint_y=None, height=dp(38), spacing=dp(6))
         btn_voice_start = Button(text="开始对话", font_name=FONT)
         btn_voice_stop = Button(text="结束对话", font_name=FONT)
@@ -92,10 +121,10 @@ class AIModelPanel(BoxLayout):
         self.add_widget(self.tts_status)
 
         self.latency_status = Label(
-            text="延迟：STT 0+0ms | LLM 0/0ms | TTS 0ms",
+            text="延迟：STT 0+0ms | LLM 0/0ms | TTS 0ms\n本地指令 0%",
             font_name=FONT,
             size_hint_y=None,
-            height=dp(22),
+            height=dp(40),
             color=(0.64, 0.76, 0.88, 1),
             halign="left",
             valign="middle",
@@ -103,6 +132,20 @@ class AIModelPanel(BoxLayout):
         self.latency_status.bind(size=self.latency_status.setter("text_size"))
         self.add_widget(self.latency_status)
 
+        trace_row = BoxLayout(size_hint_y=None, height=dp(58), spacing=dp(6))
+        self.trace_status = Label(
+            text="轮次 p50/p90/p99：暂无数据",
+            font_name=FONT,
+            color=(0.62, 0.74, 0.86, 1),
+            halign="left",
+            valign="middle",
+        )
+        self.trace_status.bind(size=self.trace_status.setter("text_size"))
+        btn_trace_export = Button(text="导出时延", font_name=FONT, size_hint_x=None, width=dp(84))
+        trace_row.add_widget(self.trace_status)
+        trace_row.add_widget(btn_trace_export)
+        self.add_widget(trace_row)
+
         self.recording_indicator = Label(
             text="● 未对话",
             font_name=FONT,
@@ -122,6 +165,10 @@ class AIModelPanel(BoxLayout):
         btn_voice_start.bind(on_release=self._start_voice_chat)
         btn_voice_stop.bind(on_release=self._stop_voice_chat)
         btn_tts_test.bind(on_release=self._test_tts)
+        btn_trace_export.bind(on_release=self._export_trace)
+        self.hedge_btn.bind(on_release=self._toggle_hedge)
+        self.hedge_spinner.bind(text=lambda *_a: self._apply_hedge())
+        self.model_spinner.bind(text=self._on_model_selected)
 
         Clock.schedule_once(lambda dt: self._init_from_saved_settings(), 0)
         Clock.schedule_interval(self._sync_runtime_state, 0.8)
@@ -138,6 +185,9 @@ class AIModelPanel(BoxLayout):
         self.model_spinner.values = vals
         if self.model_spinner.text not in vals:
             self.model_spinner.text = vals[0]
+        self.hedge_spinner.values = (_HEDGE_AUTO,) + vals
+        if self.hedge_spinner.text not in self.hedge_spinner.values:
+            self.hedge_spinner.text = _HEDGE_AUTO
         self._refresh_current()
 
     def _init_from_saved_settings(self):
@@ -152,6 +202,44 @@ class AIModelPanel(BoxLayout):
         except Exception:
             pass
         self._refresh_current()
+        self._sync_hedge_state()
+
+    def _on_model_selected(self, _spinner, profile):
+        # 切换下拉框时显示该模型已保存的 Key，避免把上一个模型的 Key 存到新模型下
+        try:
+            keys = dict(dict(self.app.load_ai_settings() or {}).get("api_keys") or {})
+        except Exception:
+            keys = {}
+        if profile in keys:
+            self.key_input.text = str(keys.get(profile) or "")
+        elif profile != str(getattr(getattr(self.app, "ai_core", None), "profile_name", "")):
+            self.key_input.text = ""
+
+    def _hedge_secondary(self):
+        text = str(self.hedge_spinner.text or "")
+        return "" if text == _HEDGE_AUTO else text
+
+    def _sync_hedge_state(self):
+        st = dict(self.app.get_ai_hedge_stats() or {})
+        enabled = bool(st.get("enabled"))
+        self.hedge_btn.text = f"对冲：{'开' if enabled else '关'}"
+        secondary = str(st.get("secondary") or "")
+        self.hedge_spinner.text = secondary if secondary in self.hedge_spinner.values else _HEDGE_AUTO
+
+    def _toggle_hedge(self, *_args):
+        enabled = not bool(dict(self.app.get_ai_hedge_stats() or {}).get("enabled"))
+        self._apply_hedge(enabled)
+
+    def _apply_hedge(self, enabled=None):
+        if enabled is None:
+            enabled = bool(dict(self.app.get_ai_hedge_stats() or {}).get("enabled"))
+        try:
+            ok = bool(self.app.set_ai_hedging(enabled, secondary=self._hedge_secondary()))
+            if not ok:
+                self.status.text = "状态：对冲设置失败"
+        except Exception as e:
+            self.status.text = f"状态：对冲设置异常 {e}"
+        self._sync_hedge_state()
 
     def _refresh_current(self):
         try:
@@ -185,7 +273,15 @@ class AIModelPanel(BoxLayout):
         profile = str(self.model_spinner.text or "deepseek").strip()
         api_key = str(self.key_input.text or "").strip()
         try:
-            ok = bool(self.app.save_ai_settings(profile, api_key))
+            st = dict(self.app.get_ai_hedge_stats() or {})
+            ok = bool(
+                self.app.save_ai_settings(
+                    profile,
+                    api_key,
+                    hedge_enabled=bool(st.get("enabled")),
+                    hedge_secondary=self._hedge_secondary(),
+                )
+            )
             self.status.text = "状态：配置已持久化保存" if ok else "状态：配置保存失败"
         except Exception as e:
             self.status.text = f"状态：配置保存异常 {e}"
@@ -212,6 +308,13 @@ class AIModelPanel(BoxLayout):
         except Exception as e:
             self.status.text = f"状态：语音自检异常 {e}"
 
+    def _export_trace(self, *_args):
+        try:
+            ok, msg = self.app.export_ai_trace()
+            self.status.text = f"状态：{'时延已导出' if ok else '时延导出失败'}（{msg}）"
+        except Exception as e:
+            self.status.text = f"状态：时延导出异常 {e}"
+
     def _start_voice_chat(self, *_args):
         try:
             ok = bool(self.app.start_ai_voice_chat(language="zh-CN"))
@@ -295,11 +398,38 @@ class AIModelPanel(BoxLayout):
             p = dict(self.app.get_ai_latency_status() or {})
             stt_wait = int(p.get("stt_wait_ms") or 0)
             stt_rec = int(p.get("stt_rec_ms") or 0)
-            llm_first = int(p.get("llm_first_ms") or 0)
+            llm_connect = int(p.get("llm_connect_ms") or 0)
+            llm_ttft = int(p.get("llm_ttft_ms") or 0)
             llm_total = int(p.get("llm_total_ms") or 0)
             tts_ms = int(p.get("tts_ms") or 0)
+            hit_rate = float(p.get("intent_hit_rate") or 0.0)
+            saved_ms = int(p.get("intent_saved_ms") or 0)
+            cache_hits = int(p.get("cache_hits") or 0)
+            cache_total = cache_hits + int(p.get("cache_misses") or 0)
+            q_depth = int(p.get("queue_depth") or 0)
+            q_merged = int(p.get("queue_merged") or 0)
+            q_dropped = int(p.get("queue_dropped") or 0)
+            prompt_tokens = int(p.get("prompt_tokens") or 0)
             self.latency_status.text = (
-                f"延迟：STT {stt_wait}+{stt_rec}ms | LLM {llm_first}/{llm_total}ms | TTS {tts_ms}ms"
+                f"延迟：STT {stt_wait}+{stt_rec}ms | LLM 连接{llm_connect}+首字{llm_ttft}/{llm_total}ms | TTS {tts_ms}ms"
+                f"\n本地指令 {hit_rate * 100:.0f}% 省{saved_ms}ms | 缓存命中 {cache_hits}/{cache_total}"
+                f" | 队列 {q_depth} 合并{q_merged} 丢弃{q_dropped} | 提示 {prompt_tokens} tok"
             )
         except Exception:
             self.latency_status.text = "延迟：--"
+
+        try:
+            stats = dict(self.app.get_ai_trace_stats() or {})
+            parts = []
+            for stage, label in _TRACE_STAGES:
+                h = stats.get(stage)
+                if h and int(h.get("n") or 0) > 0:
+                    parts.append(f"{label} {h['p50']}/{h['p90']}/{h['p99']}")
+            if parts:
+                n = max(int(h.get("n") or 0) for h in stats.values())
+                lines = [" | ".join(parts[i : i + 3]) for i in range(0, len(parts), 3)]
+                self.trace_status.text = f"轮次 p50/p90/p99 ms（{n} 轮）：\n" + "\n".join(lines)
+            else:
+                self.trace_status.text = "轮次 p50/p90/p99：暂无数据"
+        except Exception:
+            self.trace_status.text = "轮次 p50/p90/p99：--"
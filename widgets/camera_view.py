@@ -5,7 +5,9 @@ from kivy.utils import platform
 from kivy.app import App
 from kivy.graphics import PushMatrix, PopMatrix, Rotate, Scale
 from widgets.runtime_status import RuntimeStatusLogger
+from services.frame_grabber import FrameGrabber
 import os
+import time
 
 
 class CameraView(Image):
@@ -18,7 +20,11 @@ class CameraView(Image):
 
         self.capture = None
         # 可注册回调以获取原始 OpenCV 帧：callback(frame: numpy.ndarray)
+        # 桌面端在采集线程上调用，帧为只读共享数据
         self.frame_callback = None
+        self._grabber = None
+        self._desktop_texture = None
+        self._upload_ms = 0.0
         self._event = None
         self._camera_index = None  # 记录使用的摄像头索引
         self._camera_init_phase = True  # 权限等待阶段标志
@@ -179,19 +185,27 @@ class CameraView(Image):
         except Exception:
             pass
 
-    def _apply_fix_mode_to_desktop_frame(self, frame):
-        """将与 Android 一致的翻转模式应用到桌面 OpenCV 帧。"""
+    # OpenCV 帧第 0 行在最上方，直接上传后第 0 行位于纹理 v=0（底部），基准需要竖直翻转；
+    # 各修正模式在此基础上叠加，全部通过 uv 实现，不做像素拷贝
+    _DESKTOP_UV = {
+        "rotate180": ((1.0, 0.0), (-1.0, 1.0)),
+        "vflip": ((0.0, 0.0), (1.0, 1.0)),
+        "hflip": ((1.0, 1.0), (-1.0, -1.0)),
+        "none": ((0.0, 1.0), (1.0, -1.0)),
+    }
+
+    def _apply_fix_mode_to_desktop_texture(self, texture):
+        """将与 Android 一致的翻转模式以 uv 方式应用到桌面纹理；返回 uv 是否发生变化。"""
         try:
             mode = self.get_android_front_fix_mode()
-            if mode in ("rotate180", "180", "default"):
-                return self.cv2.rotate(frame, self.cv2.ROTATE_180)
-            if mode in ("vflip", "vertical"):
-                return self.cv2.flip(frame, 0)
-            if mode in ("hflip", "horizontal"):
-                return self.cv2.flip(frame, 1)
-            return frame
+            pos, size = self._DESKTOP_UV.get(mode, self._DESKTOP_UV["none"])
+            if tuple(texture.uvpos) == pos and tuple(texture.uvsize) == size:
+                return False
+            texture.uvpos = pos
+            texture.uvsize = size
+            return True
         except Exception:
-            return frame
+            return False
 
     def _get_android_fix_mode_file(self):
         try:
@@ -248,8 +262,10 @@ class CameraView(Image):
     def _start_desktop(self):
         try:
             import cv2
+            import numpy as np
 
             self.cv2 = cv2
+            self._np = np
             RuntimeStatusLogger.log_info('OpenCV 导入成功，准备打开桌面摄像头')
         except ImportError:
             RuntimeStatusLogger.log_error('OpenCV 未安装，桌面摄像头不可用')
@@ -262,40 +278,82 @@ class CameraView(Image):
             print("❌ Camera open failed")
             return
 
+        # 阻塞读取放到采集线程，UI 线程只上传最新帧
+        self._grabber = FrameGrabber(self.capture, frame_callback=self._dispatch_frame)
+        self._grabber.start()
         self._event = Clock.schedule_interval(self._update_desktop, 1 / 30)
         RuntimeStatusLogger.log_info('桌面摄像头已启动，开始读取帧')
 
-    def _update_desktop(self, dt):
-        ret, frame = self.capture.read()
-        if not ret:
-            return
+    def _dispatch_frame(self, frame):
+        """采集线程：把原始帧交给外部回调。"""
+        cb = self.frame_callback
+        if cb is not None:
+            cb(frame)
 
-        # 在调用转换为 Kivy 纹理之前，先把原始帧传给回调（若有）
+    def _stop_desktop(self):
+        if self._event:
+            try:
+                self._event.cancel()
+            except Exception:
+                pass
+        self._event = None
+        if self._grabber:
+            try:
+                self._grabber.stop()
+            except Exception:
+                pass
+        self._grabber = None
         try:
-            if self.frame_callback is not None:
-                self.frame_callback(frame)
-            if not self._desktop_frame_logged:
-                try:
-                    h, w, _ = frame.shape
-                    RuntimeStatusLogger.log_info(f'桌面摄像头接收到首帧: {w}x{h}')
-                except Exception:
-                    RuntimeStatusLogger.log_info('桌面摄像头接收到首帧')
-                self._desktop_frame_logged = True
+            if self.capture:
+                self.capture.release()
         except Exception:
             pass
+        self.capture = None
 
-        try:
-            frame = self._apply_fix_mode_to_desktop_frame(frame)
-        except Exception:
-            pass
+    def get_capture_stats(self):
+        """桌面采集统计：采集帧率、丢帧数、读取/回调耗时与 UI 上传耗时（ms）。"""
+        stats = self._grabber.get_stats() if self._grabber else {}
+        stats["upload_ms"] = round(self._upload_ms, 2)
+        return stats
 
-        # OpenCV -> Kivy Texture
-        frame = self.cv2.cvtColor(frame, self.cv2.COLOR_BGR2RGB)
-        h, w, _ = frame.shape
-        texture = Texture.create(size=(w, h), colorfmt="rgb")
-        texture.blit_buffer(frame.tobytes(), colorfmt="rgb", bufferfmt="ubyte")
-        texture.flip_vertical()
-        self.texture = texture
+    def _update_desktop(self, dt):
+        grabber = self._grabber
+        item = grabber.take_latest() if grabber else None
+        if item is None:
+            return
+        _seq, frame, _ts = item
+
+        if not self._desktop_frame_logged:
+            try:
+                h, w, _ = frame.shape
+                RuntimeStatusLogger.log_info(f'桌面摄像头接收到首帧: {w}x{h}')
+            except Exception:
+                RuntimeStatusLogger.log_info('桌面摄像头接收到首帧')
+            self._desktop_frame_logged = True
+
+        t0 = time.perf_counter()
+        h, w = frame.shape[:2]
+        texture = self._desktop_texture
+        new_texture = texture is None or tuple(texture.size) != (w, h)
+        if new_texture:
+            # 每种分辨率只创建一次纹理，之后逐帧原地上传
+            texture = Texture.create(size=(w, h), colorfmt="bgr")
+            self._desktop_texture = texture
+        uv_changed = self._apply_fix_mode_to_desktop_texture(texture)
+
+        # OpenCV 帧本身是连续的 BGR 数据，按 bgr 直接上传，无需颜色转换与 tobytes 拷贝；
+        # blit_buffer 需要一维字节缓冲，reshape(-1) 对连续数组只是视图
+        if not frame.flags["C_CONTIGUOUS"]:
+            frame = self._np.ascontiguousarray(frame)
+        texture.blit_buffer(frame.reshape(-1), colorfmt="bgr", bufferfmt="ubyte")
+        if new_texture:
+            self.texture = texture
+        elif uv_changed:
+            # 同一纹理对象的 uv 变化不会触发属性事件，手动通知 Image 重建 tex_coords
+            self.property("texture").dispatch(self)
+        else:
+            self.canvas.ask_update()
+        self._upload_ms = 0.9 * self._upload_ms + 0.1 * (time.perf_counter() - t0) * 1000.0
 
     # ---------- Android (Kivy Camera) ----------
     def _start_android(self):
@@ -403,6 +461,9 @@ class CameraView(Image):
             self._save_android_fix_mode(m)
             self._apply_mode_to_current_android_texture()
             self._apply_android_display_transform()
+            tex = self._desktop_texture
+            if tex is not None and self._apply_fix_mode_to_desktop_texture(tex):
+                self.property("texture").dispatch(self)
             try:
                 RuntimeStatusLogger.log_info(f"视觉设置: 前置修正模式 -> {m}")
             except Exception:
@@ -440,18 +501,7 @@ class CameraView(Image):
         """重启相机以重新探测设备与索引。"""
         try:
             if platform in ("win", "linux", "macosx"):
-                try:
-                    if self.capture:
-                        self.capture.release()
-                except Exception:
-                    pass
-                self.capture = None
-                if self._event:
-                    try:
-                        self._event.cancel()
-                    except Exception:
-                        pass
-                self._event = None
+                self._stop_desktop()
                 self._desktop_frame_logged = False
                 self._start_desktop()
                 return True
@@ -474,12 +524,7 @@ class CameraView(Image):
     def on_parent(self, instance, parent):
         """清理资源：当widget从父级移除时"""
         if not parent:
-            if self.capture:
-                self.capture.release()
-                self.capture = None
-            if self._event:
-                self._event.cancel()
-                self._event = None
+            self._stop_desktop()
             # Android摄像头清理
             try:
                 if hasattr(self, 'camera') and self.camera:
@@ -147,7 +147,8 @@ class DebugPanel(Widget):
 
         def _run_motion(action_name):
             _dismiss_debug_popup()
-            threading.Thread(target=self._call_motion, args=(action_name,), daemon=True).start()
+            # 动作统一进入执行队列，这里只负责提交
+            self._call_motion(action_name)
         build_actions_tab_content(
             t_actions,
             button_cls=SquareTechButton,
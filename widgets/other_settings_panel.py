@@ -97,7 +97,7 @@ class OtherSettingsPanel(BoxLayout):
         self._status = Label(
             text="状态：待读取",
             size_hint_y=None,
-            height=dp(76),
+            height=dp(114),
             color=(0.84, 0.92, 1, 1),
             halign="left",
             valign="top",
@@ -139,6 +139,7 @@ class OtherSettingsPanel(BoxLayout):
         self._btn_axis_auto = self._make_button("轴:Auto", width=dp(96))
         self._btn_axis_normal = self._make_button("Normal", width=dp(96))
         self._btn_axis_swapped = self._make_button("Swapped", width=dp(96))
+        self._btn_imu_level = self._make_button("姿态归零", width=dp(96))
         self._axis_status = Label(
             text="",
             size_hint_y=None,
@@ -151,10 +152,26 @@ class OtherSettingsPanel(BoxLayout):
         row_axis.add_widget(self._btn_axis_auto)
         row_axis.add_widget(self._btn_axis_normal)
         row_axis.add_widget(self._btn_axis_swapped)
+        row_axis.add_widget(self._btn_imu_level)
         bal_body.add_widget(row_axis)
         bal_body.add_widget(self._axis_status)
         self.add_widget(bal_box)
 
+        rec_box, rec_body = self._create_section_box("会话录制")
+        row_rec = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(8))
+        self._btn_rec_toggle = self._make_button("开始录制", width=dp(110))
+        self._rec_status = Label(
+            text="未录制",
+            color=(0.72, 0.82, 0.92, 1),
+            halign="left",
+            valign="middle",
+        )
+        self._rec_status.bind(size=self._rec_status.setter("text_size"))
+        row_rec.add_widget(self._btn_rec_toggle)
+        row_rec.add_widget(self._rec_status)
+        rec_body.add_widget(row_rec)
+        self.add_widget(rec_box)
+
         level_box, level_body = self._create_section_box("姿态指示")
         self._level_body = level_body
         self._level_loading = Label(
@@ -191,6 +208,8 @@ class OtherSettingsPanel(BoxLayout):
         self._btn_axis_auto.bind(on_release=lambda *_: self._set_axis_mode("auto"))
         self._btn_axis_normal.bind(on_release=lambda *_: self._set_axis_mode("normal"))
         self._btn_axis_swapped.bind(on_release=lambda *_: self._set_axis_mode("swapped"))
+        self._btn_imu_level.bind(on_release=self._calibrate_imu)
+        self._btn_rec_toggle.bind(on_release=self._toggle_recording)
 
         Clock.schedule_once(lambda _dt: self.refresh_status(), 0)
         Clock.schedule_once(lambda _dt: self._refresh_balance(), 0)
@@ -361,6 +380,14 @@ class OtherSettingsPanel(BoxLayout):
         except Exception:
             pass
 
+    def _calibrate_imu(self, *_args):
+        app = App.get_running_app()
+        try:
+            ok = bool(app.calibrate_imu())
+        except Exception:
+            ok = False
+        self._notify("姿态已归零（以当前姿态为参考）" if ok else "姿态归零失败：未使用本机 IMU 融合")
+
     def _refresh_balance(self):
         app = App.get_running_app()
         bc = getattr(app, "balance_ctrl", None)
@@ -416,6 +443,33 @@ class OtherSettingsPanel(BoxLayout):
         except Exception:
             pass
 
+    def _toggle_recording(self, *_args):
+        app = App.get_running_app()
+        if not app or not hasattr(app, "toggle_session_recording"):
+            self._notify("未找到 App 实例，无法录制")
+            return
+        running = bool(app.toggle_session_recording())
+        self._notify("会话录制已开始" if running else "会话录制已停止")
+        self._refresh_recording()
+
+    def _refresh_recording(self):
+        app = App.get_running_app()
+        try:
+            st = dict(app.get_recording_status() or {}) if hasattr(app, "get_recording_status") else {}
+        except Exception:
+            st = {}
+        if not st.get("running"):
+            self._btn_rec_toggle.text = "开始录制"
+            self._rec_status.text = "未录制"
+            return
+        counts = st.get("counts", {})
+        self._btn_rec_toggle.text = "停止录制"
+        self._rec_status.text = (
+            f"{float(st.get('elapsed_s', 0.0)):.0f}s {int(st.get('bytes', 0)) / 1024:.0f}KB "
+            f"imu={int(counts.get('imu', 0))} cmd={int(counts.get('targets', 0))} frame={int(counts.get('frame', 0))} "
+            f"drop={int(st.get('dropped', 0))}"
+        )
+
     def refresh_status(self):
         app = App.get_running_app()
         panel = self._debug_panel
@@ -440,11 +494,47 @@ class OtherSettingsPanel(BoxLayout):
                 backoff_base = 0.8
                 backoff_max = 5.0
 
+            queue_line = "动作队列: -"
+            try:
+                q = dict(app.get_action_queue_status() or {}) if hasattr(app, "get_action_queue_status") else {}
+                if q:
+                    queue_line = (
+                        f"动作队列: depth={int(q.get('depth', 0))}/{int(q.get('max_depth', 0))} "
+                        f"done={int(q.get('executed', 0))} merged={int(q.get('merged', 0))} "
+                        f"drop={int(q.get('dropped_stale', 0)) + int(q.get('dropped_full', 0))} "
+                        f"preempt={int(q.get('preempted', 0))}"
+                    )
+            except Exception:
+                pass
+
+            vision_line = "视觉: -"
+            try:
+                vs = dict(app.get_vision_stats() or {}) if hasattr(app, "get_vision_stats") else {}
+                cap = dict(vs.get("capture") or {})
+                parts = []
+                if cap:
+                    parts.append(
+                        f"采集 {float(cap.get('fps', 0.0)):.0f}fps drop={int(cap.get('dropped', 0))} "
+                        f"上传 {float(cap.get('upload_ms', 0.0)):.1f}ms"
+                    )
+                for name, st in dict(vs.get("stages") or {}).items():
+                    parts.append(
+                        f"{name} {float(st.get('fps', 0.0)):.0f}fps {float(st.get('latency_ms', 0.0)):.0f}ms "
+                        f"drop={int(st.get('dropped_busy', 0))}"
+                    )
+                if parts:
+                    vision_line = "视觉: " + " | ".join(parts)
+            except Exception:
+                pass
+
             self._status.text = (
                 "状态：已读取\n"
                 f"主循环: active={sync_active:.2f}s idle={sync_idle:.2f}s threshold={pose_th:.2f}°/{target_th}\n"
                 f"计算/UI: compute={compute_idle:.2f}s@{compute_pose_th:.2f}° ui={gyro_ui:.2f}s\n"
-                f"状态读取: batch={batch_size} slow={slow_interval:.1f}s backoff={backoff_base:.1f}-{backoff_max:.1f}s"
+                f"状态读取: batch={batch_size} slow={slow_interval:.1f}s backoff={backoff_base:.1f}-{backoff_max:.1f}s\n"
+                f"{queue_line}\n"
+                f"{vision_line}"
             )
         except Exception:
             self._status.text = "状态：读取失败"
+        self._refresh_recording()
@@ -58,12 +58,25 @@ class VisionSettingsPanel(BoxLayout):
         row2.add_widget(self._btn_restart)
         self.add_widget(row2)
 
+        # 颜色跟踪在视觉流水线的工作线程运行；头部跟踪额外驱动颈部舵机与眼睛注视
+        row3 = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(8))
+        self._btn_track_color = Button(text="颜色跟踪")
+        self._btn_track_head = Button(text="头部跟踪")
+        self._btn_track_stop = Button(text="停止跟踪")
+        row3.add_widget(self._btn_track_color)
+        row3.add_widget(self._btn_track_head)
+        row3.add_widget(self._btn_track_stop)
+        self.add_widget(row3)
+
         self._btn_rotate180.bind(on_release=lambda *_: self._set_mode("rotate180"))
         self._btn_vflip.bind(on_release=lambda *_: self._set_mode("vflip"))
         self._btn_hflip.bind(on_release=lambda *_: self._set_mode("hflip"))
         self._btn_none.bind(on_release=lambda *_: self._set_mode("none"))
         self._btn_refresh.bind(on_release=lambda *_: self.refresh_status())
         self._btn_restart.bind(on_release=lambda *_: self._restart_camera())
+        self._btn_track_color.bind(on_release=lambda *_: self._start_tracking(head=False))
+        self._btn_track_head.bind(on_release=lambda *_: self._start_tracking(head=True))
+        self._btn_track_stop.bind(on_release=lambda *_: self._stop_tracking())
 
         Clock.schedule_once(lambda dt: self.refresh_status(), 0)
 
@@ -131,6 +144,46 @@ class VisionSettingsPanel(BoxLayout):
         except Exception as e:
             self._notify(f"相机重启异常: {e}")
 
+    def _start_tracking(self, head=False):
+        app = App.get_running_app()
+        if not app or not hasattr(app, "start_color_tracking"):
+            self._notify("未找到 App 实例，无法启动跟踪")
+            return
+        try:
+            if head:
+                ok = app.start_head_tracking() is not None
+                self._notify("头部跟踪已启动" if ok else "头部跟踪启动失败（运动控制未就绪）")
+            else:
+                if hasattr(app, "stop_head_tracking"):
+                    app.stop_head_tracking()
+                app.start_color_tracking()
+                self._notify("颜色跟踪已启动")
+        except Exception as e:
+            self._notify(f"跟踪启动异常: {e}")
+        self.refresh_status()
+
+    def _stop_tracking(self):
+        app = App.get_running_app()
+        try:
+            if app and hasattr(app, "stop_head_tracking"):
+                app.stop_head_tracking()
+            self._notify("跟踪已停止")
+        except Exception as e:
+            self._notify(f"跟踪停止异常: {e}")
+        self.refresh_status()
+
+    def _tracking_text(self):
+        try:
+            app = App.get_running_app()
+            stats = dict(app.get_vision_stats() or {})
+            stage = (stats.get("stages") or {}).get("color")
+            if not stage:
+                return "跟踪=关"
+            mode = "头部" if "head_tracker" in stats else "颜色"
+            return f"跟踪={mode} {float(stage.get('fps', 0.0)):.0f}fps"
+        except Exception:
+            return "跟踪=?"
+
     def refresh_status(self):
         cam = self._get_camera_view()
         if not cam:
@@ -141,6 +194,6 @@ class VisionSettingsPanel(BoxLayout):
             if hasattr(cam, "get_android_front_fix_mode"):
                 mode = str(cam.get_android_front_fix_mode())
             idx = getattr(cam, "_camera_index", None)
-            self._status.text = f"视觉设置: index={idx}, 模式={mode}"
+            self._status.text = f"视觉设置: index={idx}, 模式={mode}, {self._tracking_text()}"
         except Exception:
             self._status.text = "视觉设置: 状态读取失败"